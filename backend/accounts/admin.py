@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import CustomUser, Invitation, Tenant, UserTenant
+from .models import CustomUser, Invitation, Tenant, TenantShard, UserTenant
 
 
 @admin.register(CustomUser)
@@ -19,6 +19,15 @@ class TenantAdmin(admin.ModelAdmin):
     readonly_fields = ("created_at", "created_by")
 
 
+@admin.register(TenantShard)
+class TenantShardAdmin(admin.ModelAdmin):
+    list_display = ("tenant", "alias", "moving", "updated_at")
+    list_filter = ("alias", "moving")
+    search_fields = ("tenant__name", "tenant__domain")
+    raw_id_fields = ("tenant",)
+    readonly_fields = ("updated_at",)
+
+
 @admin.register(UserTenant)
 class UserTenantAdmin(admin.ModelAdmin):
     list_display = ("get_user_email", "tenant", "is_owner", "is_approved", "role")
@@ -84,6 +84,22 @@ class Tenant(models.Model):
         return self.name
 
 
+class TenantShard(models.Model):
+    """
+    Shard map: the database alias holding a tenant's project data (see
+    saasCRM/db_routers.py). Tenants without a row live on the home shard.
+    ``moving`` is set by ``move_tenant_shard`` while it copies the tenant;
+    writes are refused until the map flips.
+    """
+    tenant = models.OneToOneField('accounts.Tenant', on_delete=models.CASCADE, primary_key=True, related_name='shard')
+    alias = models.CharField(max_length=100)
+    moving = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.tenant} - {self.alias}"
+
+
 class UserTenant(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE)
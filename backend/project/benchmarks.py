@@ -0,0 +1,20 @@
+"""Timing helpers shared by the benchmark and load test management commands."""
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of ``values`` (which needn't be sorted)."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(timings):
+    """p50/p95/p99 and max of ``timings`` (milliseconds), rounded for reports."""
+    if not timings:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+    return {
+        'p50': round(percentile(timings, 50), 2),
+        'p95': round(percentile(timings, 95), 2),
+        'p99': round(percentile(timings, 99), 2),
+        'max': round(max(timings), 2),
+    }
@@ -0,0 +1,202 @@
+"""
+Caching helpers for the project app.
+
+TenantLookupCache resolves a subdomain to its Tenant without hitting the
+database on every request. Lookups go through two levels:
+
+1. An in-process LRU with a short TTL (per worker, no network round trip)
+2. The shared ``CACHES['default']`` backend (Redis in production)
+
+Unknown subdomains are cached as negative entries so floods of requests for
+non-existent tenants don't reach Postgres. Entries are invalidated from the
+Tenant post_save/post_delete receivers in ``project.signals``; other workers'
+local entries expire after ``TENANT_CACHE_LOCAL_TTL`` seconds.
+"""
+
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from accounts.models import Tenant
+
+# Marker stored in place of a Tenant for subdomains that don't exist
+MISSING = '__missing__'
+
+
+class TenantLookupCache:
+    """Two-level (local LRU + shared cache) tenant lookup by domain."""
+
+    key_prefix = 'tenant:domain:'
+
+    def __init__(self, maxsize=None, local_ttl=None, ttl=None, negative_ttl=None, cache_alias='default'):
+        self.maxsize = maxsize or getattr(settings, 'TENANT_CACHE_MAXSIZE', 1024)
+        self.local_ttl = local_ttl if local_ttl is not None else getattr(settings, 'TENANT_CACHE_LOCAL_TTL', 30)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'TENANT_CACHE_TTL', 300)
+        self.negative_ttl = negative_ttl if negative_ttl is not None else getattr(settings, 'TENANT_CACHE_NEGATIVE_TTL', 60)
+        self.cache_alias = cache_alias
+        self._local = OrderedDict()  # domain -> (expires_at, tenant or MISSING)
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def _key(self, domain):
+        return f'{self.key_prefix}{domain}'
+
+    def _get_local(self, domain):
+        with self._lock:
+            entry = self._local.get(domain)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[domain]
+                return None
+            self._local.move_to_end(domain)
+            return value
+
+    def _set_local(self, domain, value, ttl):
+        with self._lock:
+            self._local[domain] = (time.monotonic() + min(ttl, self.local_ttl), value)
+            self._local.move_to_end(domain)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def get(self, domain):
+        """
+        Return the Tenant for ``domain``.
+
+        Raises Tenant.DoesNotExist for unknown domains (negative lookups are cached too).
+        Each caller gets its own copy so request-level mutations never leak into the cache.
+        """
+        value = self._get_local(domain)
+        if value is not None:
+            self._stats['local_hits'] += 1
+        else:
+            value = self.shared.get(self._key(domain))
+            if value is not None:
+                self._stats['shared_hits'] += 1
+                self._set_local(domain, value, self.negative_ttl if value == MISSING else self.ttl)
+            else:
+                self._stats['misses'] += 1
+                value = self._load(domain)
+
+        if value == MISSING:
+            self._stats['negative_hits'] += 1
+            raise Tenant.DoesNotExist(f"Tenant with domain '{domain}' does not exist")
+        return copy.copy(value)
+
+    def _load(self, domain):
+        try:
+            # With its shard map entry, which routes the tenant's project data
+            value = Tenant.objects.select_related('shard').get(domain=domain)
+            ttl = self.ttl
+        except Tenant.DoesNotExist:
+            value = MISSING
+            ttl = self.negative_ttl
+        self.shared.set(self._key(domain), value, ttl)
+        self._set_local(domain, value, ttl)
+        return value
+
+    def invalidate(self, *domains):
+        """Drop cached entries (positive or negative) for the given domains."""
+        domains = [d for d in domains if d is not None]
+        if not domains:
+            return
+        with self._lock:
+            for domain in domains:
+                self._local.pop(domain, None)
+        self.shared.delete_many([self._key(d) for d in domains])
+        self._stats['invalidations'] += len(domains)
+
+    def clear(self):
+        """Drop all local entries. Shared entries expire on their own TTL."""
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        """Hit/miss counters for this worker, plus the current local cache size."""
+        lookups = sum(self._stats[k] for k in ('local_hits', 'shared_hits', 'misses'))
+        hits = self._stats['local_hits'] + self._stats['shared_hits']
+        return {
+            'local_hits': self._stats['local_hits'],
+            'shared_hits': self._stats['shared_hits'],
+            'misses': self._stats['misses'],
+            'negative_hits': self._stats['negative_hits'],
+            'invalidations': self._stats['invalidations'],
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'local_size': len(self._local),
+        }
+
+    def reset_stats(self):
+        self._stats.clear()
+
+
+tenant_cache = TenantLookupCache()
+
+
+# Generation counters
+#
+# A generation is an opaque value stored in the shared cache. Anything cached
+# under a key that embeds the current generation is invalidated in O(1) by
+# bumping the generation; stale entries are never read again and simply expire.
+# Generations are seeded from time.time_ns() so an evicted counter can never
+# roll back to a value that older entries were stored under.
+
+GENERATION_PREFIX = 'gen:'
+GENERATION_TIMEOUT = None  # Never expire on their own
+
+
+def get_generations(*names, cache_alias='default'):
+    """Return the current generation for each name, in order."""
+    shared = caches[cache_alias]
+    keys = [f'{GENERATION_PREFIX}{name}' for name in names]
+    found = shared.get_many(keys)
+    generations = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            shared.add(key, time.time_ns(), GENERATION_TIMEOUT)
+            value = shared.get(key) or 0
+        generations.append(value)
+    return generations
+
+
+def bump_generation(*names, cache_alias='default'):
+    """Invalidate everything cached under the given generations."""
+    value = time.time_ns()
+    caches[cache_alias].set_many(
+        {f'{GENERATION_PREFIX}{name}': value for name in names}, GENERATION_TIMEOUT
+    )
+
+
+def list_generation(model_name, tenant_id=None):
+    """
+    Generation name for cached list responses that depend on ``model_name``.
+
+    Each write bumps both the tenant's generation and the global one; the
+    global generation covers dev mode, where a list spans all of a user's tenants.
+    """
+    if tenant_id is None:
+        return f'list:{model_name}'
+    return f'list:{model_name}:{tenant_id}'
+
+
+def tenant_generation(tenant_id):
+    """Generation name bumped whenever the tenant itself is saved or deleted."""
+    return f'tenant:{tenant_id}'
+
+
+def invalidate_cached_lists(model, *tenant_ids):
+    """Invalidate cached list responses that depend on ``model`` for the given tenants."""
+    model_name = model._meta.model_name
+    bump_generation(
+        list_generation(model_name),
+        *[list_generation(model_name, tenant_id) for tenant_id in set(tenant_ids) if tenant_id is not None],
+    )
@@ -0,0 +1,158 @@
+"""
+Per-transaction dirty set for progress rollups and other write side effects.
+
+Inside a transaction, the receivers in ``project.signals`` don't act on each
+write. They record what it affects instead: sprints whose tasks changed,
+milestones and projects under writes that bypass ``save()`` (sprint saves
+and milestone saves apply their counter deltas directly, see
+``project.rollups``), cached lists to invalidate and notifications to send. A single
+``transaction.on_commit`` hook then flushes everything once. The flush does one
+grouped recalculation per level for the recorded IDs (see
+``project.rollups``), so N task writes in one request cost one rollup per
+parent, and nothing runs if the transaction rolls back.
+
+Sync change log entries (``project.sync``) are the exception: they're
+written as the writes are logged, in the same transaction as the data, so the
+log commits or rolls back with it. The flush only publishes them as live
+events (``project.events``).
+
+Outside a transaction (autocommit) a write is its own transaction and the
+dirty set is flushed immediately.
+"""
+
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .cache import bump_generation, list_generation
+
+
+class DirtySet:
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.sprints = set()
+        self.milestones = set()
+        self.projects = set()
+        self.lists = defaultdict(set)  # model name -> tenant ids
+        self.changes = {}  # (model name, pk) -> [tenant id, action, parent id], see project.sync
+        self.entries = {}  # (model name, pk) -> the row's latest ChangeLogEntry
+        self.callbacks = []
+        self.scheduled = False
+        self.flushed = False
+
+    @property
+    def in_transaction(self):
+        return connections[self.using].in_atomic_block
+
+    def is_pending(self):
+        """Still collecting: not flushed, and the commit hook wasn't discarded by a rollback."""
+        if self.flushed:
+            return False
+        if not self.scheduled:
+            return True
+        return any(func == self.flush for _, func, _ in connections[self.using].run_on_commit)
+
+    def _schedule(self):
+        if not self.in_transaction:
+            self.flush()
+        elif not self.scheduled:
+            self.scheduled = True
+            transaction.on_commit(self.flush, using=self.using, robust=True)
+
+    def mark_sprints(self, *ids):
+        """Re-evaluate automatic status transitions for these sprints."""
+        self.sprints.update(pk for pk in ids if pk is not None)
+        self._schedule()
+
+    def mark_milestones(self, *ids):
+        """Recompute sprint counters and progress for these milestones."""
+        self.milestones.update(pk for pk in ids if pk is not None)
+        self._schedule()
+
+    def mark_projects(self, *ids):
+        """Recompute milestone counters and progress for these projects."""
+        self.projects.update(pk for pk in ids if pk is not None)
+        self._schedule()
+
+    def invalidate_lists(self, model, *tenant_ids):
+        """Bump the cached-list generations of ``model`` for these tenants (and the global one)."""
+        self.lists[model._meta.model_name].update(tenant_ids)
+        self._schedule()
+
+    def log_changes(self, model, action, *rows):
+        """
+        Append ``(tenant_id, pk)`` rows of ``model`` to the sync change log, as
+        ``action``, in the current transaction (one INSERT per call). Task,
+        sprint and milestone rows may add a third item, the parent id that
+        routes their live event (see ``project.sync.record_change``).
+        """
+        if self._log(model._meta.model_name, action, rows):
+            self._schedule()
+
+    def _log(self, model_name, action, rows):
+        from .sync import record_change, write_change_log
+
+        rows = [row for row in rows if row[0] is not None and row[1] is not None]
+        if not rows:
+            return False
+        entries = write_change_log(model_name, action, [(tenant_id, pk) for tenant_id, pk, *_ in rows], self.using)
+        for (tenant_id, pk, *parent), entry in zip(rows, entries):
+            record_change(self.changes, model_name, tenant_id, pk, action, *parent)
+            self.entries[(model_name, pk)] = entry
+        return True
+
+    def defer(self, callback):
+        """Run ``callback`` after the rollups, e.g. to send a notification."""
+        self.callbacks.append(callback)
+        self._schedule()
+
+    def flush(self):
+        from . import events, notifications, rollups
+        from .models import Milestone, Project
+
+        self.flushed = True
+        connection = connections[self.using]
+        if getattr(connection, '_dirty_set', None) is self:
+            connection._dirty_set = None
+
+        # One grouped aggregate and one bulk_update per level, sprints first so
+        # their status changes reach the milestones in the same pass. The
+        # counters they change are logged in the same transaction.
+        with transaction.atomic(using=self.using):
+            if self.sprints:
+                sprints = rollups.sync_sprint_statuses(self.sprints)
+                for sprint in sprints:
+                    self.milestones.add(sprint.milestone_id)
+                    self.lists['sprint'].add(sprint.tenant_id)
+                    if sprint.status == 'completed':
+                        self.callbacks.append(notifications.sprint_completed(sprint))
+                self._log('sprint', 'updated', [(sprint.tenant_id, sprint.pk, sprint.milestone_id) for sprint in sprints])
+            if self.milestones:
+                changed = rollups.reconcile_milestones(Milestone.objects.filter(pk__in=self.milestones), fix=True)
+                self.projects.update(milestone.project_id for milestone in changed)
+                self._log('milestone', 'updated', [(milestone.tenant_id, milestone.pk, milestone.project_id) for milestone in changed])
+            if self.projects:
+                changed = rollups.reconcile_projects(Project.objects.filter(pk__in=self.projects), fix=True)
+                self._log('project', 'updated', [(project.tenant_id, project.pk) for project in changed])
+
+        if self.lists:
+            bump_generation(*{
+                name
+                for model_name, tenant_ids in self.lists.items()
+                for name in [list_generation(model_name)] + [
+                    list_generation(model_name, tenant_id) for tenant_id in tenant_ids if tenant_id is not None
+                ]
+            })
+        if self.changes:
+            events.publish_changes(self.changes, [self.entries[key] for key in self.changes])
+        for callback in self.callbacks:
+            callback()
+
+
+def get_dirty_set(using=DEFAULT_DB_ALIAS):
+    """The dirty set collecting for the current transaction on ``using``."""
+    connection = connections[using]
+    dirty = getattr(connection, '_dirty_set', None)
+    if dirty is None or not dirty.is_pending():
+        dirty = connection._dirty_set = DirtySet(using)
+    return dirty
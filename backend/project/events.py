@@ -0,0 +1,228 @@
+"""
+Live change events for task boards, streamed as Server-Sent Events.
+
+When a transaction commits, the dirty set (``project.dirty``) hands its sync
+changes (``project.sync``) to ``publish_changes``, which publishes one event
+per changed task, sprint and milestone on two channels: the tenant's and the
+project's. ``GET /api/events/`` (``project.views.event_stream_view``, ASGI
+only) subscribes to one of them and streams what arrives, so boards stop
+polling the list endpoints.
+
+Events carry ids, not row data: ``{"seq", "model", "id", "action",
+"project"}``. Clients fetch what they need through the regular endpoints (or
+``/api/sync/?since=<seq>``), which apply permissions and field selection.
+
+With ``EVENTS_REDIS_URL`` set, events fan out through Redis pub/sub to every
+worker process, each holding one pub/sub connection for all its streams;
+without it an in-process broker is used (tests, runserver, single-process
+deployments).
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EVENT_MODELS = ('task', 'sprint', 'milestone')
+
+
+def tenant_channel(tenant_id):
+    return f'events:tenant:{tenant_id}'
+
+
+def project_channel(tenant_id, project_id):
+    return f'events:tenant:{tenant_id}:project:{project_id}'
+
+
+def _receiver(queue):
+    """``receive(timeout)`` for a subscriber's queue: the next payload, or None on timeout."""
+    async def receive(timeout):
+        try:
+            return await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    return receive
+
+
+class LocalBroker:
+    """Fan-out to subscribers in this process; publish may be called from any thread."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)  # channel -> {(loop, queue)}
+        self._lock = threading.Lock()
+
+    def publish(self, messages):
+        with self._lock:
+            targets = [(subscriber, payload) for channel, payload in messages for subscriber in self._subscribers[channel]]
+        for (loop, queue), payload in targets:
+            loop.call_soon_threadsafe(queue.put_nowait, payload)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        """Yields ``receive(timeout)``, which returns the next payload or None on timeout."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        try:
+            yield _receiver(subscriber[1])
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class RedisSubscriptions:
+    """
+    One pub/sub connection shared by every stream on an event loop (one per
+    ASGI worker process). Channels are subscribed while they have
+    subscribers, and a reader task hands each message to their queues.
+    """
+
+    def __init__(self, url):
+        import redis.asyncio
+
+        self.loop = asyncio.get_running_loop()
+        self.client = redis.asyncio.Redis.from_url(url)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.queues = defaultdict(set)  # channel -> {queue}
+        self.lock = asyncio.Lock()
+        self.reader = None
+
+    async def add(self, channel, queue):
+        async with self.lock:
+            if not self.queues[channel]:
+                await self.pubsub.subscribe(channel)
+            self.queues[channel].add(queue)
+            if self.reader is None or self.reader.done():
+                self.reader = asyncio.create_task(self.read())
+
+    async def remove(self, channel, queue):
+        async with self.lock:
+            self.queues[channel].discard(queue)
+            if not self.queues[channel]:
+                del self.queues[channel]
+                await self.pubsub.unsubscribe(channel)
+
+    async def read(self):
+        # Runs while anyone is subscribed; add() starts it again after that
+        while self.queues:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception:
+                logger.exception('Reading change events from Redis failed')
+                await asyncio.sleep(1)
+                continue
+            if message and message['type'] == 'message':
+                payload = message['data'].decode()
+                for queue in self.queues.get(message['channel'].decode(), ()):
+                    queue.put_nowait(payload)
+
+
+class RedisBroker:
+    """Fan-out across processes through Redis pub/sub."""
+
+    def __init__(self, url):
+        import redis
+
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+        self._subscriptions = None
+
+    def publish(self, messages):
+        pipeline = self.client.pipeline(transaction=False)
+        for channel, payload in messages:
+            pipeline.publish(channel, payload)
+        pipeline.execute()
+
+    def subscriptions(self):
+        """The current event loop's shared subscriptions."""
+        if self._subscriptions is None or self._subscriptions.loop is not asyncio.get_running_loop():
+            self._subscriptions = RedisSubscriptions(self.url)
+        return self._subscriptions
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscriptions, queue = self.subscriptions(), asyncio.Queue()
+        await subscriptions.add(channel, queue)
+        try:
+            yield _receiver(queue)
+        finally:
+            await subscriptions.remove(channel, queue)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        url = getattr(settings, 'EVENTS_REDIS_URL', None)
+        _broker = RedisBroker(url) if url else LocalBroker()
+    return _broker
+
+
+def build_events(changes, entries):
+    """
+    ``(channel, payload)`` messages for the task, sprint and milestone writes in
+    ``changes`` (see ``project.sync.record_change``). ``entries`` are the
+    change log rows written for them, in the same order, for the sequence.
+    Tasks and sprints are routed to a project through their milestone, with
+    one query.
+    """
+    from .models import Milestone
+
+    milestone_ids = {
+        parent_id for (model_name, _), (_, _, parent_id) in changes.items()
+        if model_name in ('task', 'sprint') and parent_id is not None
+    }
+    projects = dict(Milestone.objects.filter(pk__in=milestone_ids).values_list('pk', 'project_id')) if milestone_ids else {}
+
+    messages = []
+    for ((model_name, pk), (tenant_id, action, parent_id)), entry in zip(changes.items(), entries):
+        if model_name not in EVENT_MODELS:
+            continue
+        project_id = parent_id if model_name == 'milestone' else projects.get(parent_id)
+        payload = json.dumps({'seq': entry.pk, 'model': model_name, 'id': pk, 'action': action, 'project': project_id})
+        messages.append((tenant_channel(tenant_id), payload))
+        if project_id is not None:
+            messages.append((project_channel(tenant_id, project_id), payload))
+    return messages
+
+
+def publish_changes(changes, entries):
+    """Publish events for committed ``changes``. A broker outage is logged, never raised into the write."""
+    if not any(model_name in EVENT_MODELS for model_name, _ in changes):
+        return
+    try:
+        messages = build_events(changes, entries)
+        if messages:
+            get_broker().publish(messages)
+    except Exception:
+        logger.exception('Failed to publish %d change events', len(changes))
+
+
+def format_event(payload):
+    """One SSE frame: the sequence as ``id`` (for Last-Event-ID), ``<model>.<action>`` as the event name."""
+    event = json.loads(payload)
+    frame = f"event: {event['model']}.{event['action']}\ndata: {payload}\n\n"
+    return f"id: {event['seq']}\n{frame}" if event['seq'] is not None else frame
+
+
+async def stream_events(channel, keepalive=None):
+    """
+    Async iterator of SSE frames for ``channel``, with a comment line every
+    ``keepalive`` seconds so proxies don't close an idle connection.
+    """
+    keepalive = keepalive or getattr(settings, 'EVENTS_KEEPALIVE_SECONDS', 15)
+    yield f'retry: {keepalive * 1000}\n\n'
+    async with get_broker().subscribe(channel) as receive:
+        while True:
+            payload = await receive(keepalive)
+            yield format_event(payload) if payload is not None else ': keepalive\n\n'
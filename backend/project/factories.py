@@ -70,7 +70,7 @@ class ProjectFactory(factory.django.DjangoModelFactory):
     start_date = factory.Faker('date_this_year')
     end_date = factory.LazyAttribute(lambda obj: obj.start_date + timedelta(days=30) if obj.start_date else None)
     budget = factory.Faker('random_int', min=10000, max=100000)
-    description = factory.LazyFunction(lambda: Faker().text()[:500])
+    description = factory.LazyFunction(lambda: fake.text()[:500])
     tags = factory.LazyFunction(lambda: ','.join(fake.words(nb=3))[:500])
 
 class MilestoneFactory(factory.django.DjangoModelFactory):
@@ -0,0 +1,131 @@
+"""
+Sparse fieldsets for the API serializers.
+
+On GET requests the top-level serializer honours three query parameters:
+
+    ?fields=id,name     emit only these fields
+    ?omit=description   emit every field but these
+    ?expand=client      replace a foreign key id with the related object
+                        (the names listed in the serializer's ``expandable_fields``)
+
+``SparseFieldsMixin`` (serializers) trims the fields; ``SparseQuerysetMixin``
+(``project.mixins``, viewsets) uses the same selection to defer the columns,
+prefetches and joins that only the dropped fields needed. Nested serializers,
+including expanded ones, always emit their own fields.
+"""
+
+import sys
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+EXPAND_PARAM = 'expand'
+
+
+def _names(request, param):
+    value = request.query_params.get(param) if request is not None else None
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def requested_fieldset(request):
+    """``(fields, omit, expand)`` from the query string; ``fields`` is None when not given."""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None, [], []
+    return _names(request, FIELDS_PARAM), _names(request, OMIT_PARAM) or [], _names(request, EXPAND_PARAM) or []
+
+
+class SparseFieldsMixin:
+    """
+    ModelSerializer mixin for ``?fields=``, ``?omit=`` and ``?expand=``.
+
+    ``expandable_fields`` maps a foreign key field to ``(serializer class name,
+    nested field names)``; the nested serializer is built with that fixed field
+    list so an expansion never adds per-row queries. ``field_dependencies``
+    names the model fields a SerializerMethodField reads, so they aren't
+    deferred while it's requested.
+
+    ``fields``/``omit`` may also be passed to the constructor, which is how
+    expansions pick their nested fields.
+    """
+    expandable_fields = {}
+    field_dependencies = {}
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        self.sparse_fields = fields
+        self.sparse_omit = omit or []
+        super().__init__(*args, **kwargs)
+
+    @property
+    def is_sparse_root(self):
+        """The serializer a request's ``?fields=`` refers to: the root, or the child of a root list."""
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_requested_fieldset(self):
+        if self.sparse_fields is not None or self.sparse_omit:
+            return self.sparse_fields, self.sparse_omit, []
+        if not self.is_sparse_root:
+            return None, [], []
+        return requested_fieldset(self.context.get('request'))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected, omit, expand = self.get_requested_fieldset()
+
+        unknown_expand = sorted(set(expand) - set(self.expandable_fields))
+        if unknown_expand:
+            raise ValidationError({EXPAND_PARAM: f'Cannot expand {unknown_expand}; choose from {sorted(self.expandable_fields)}.'})
+        for name in expand:
+            fields[name] = self.build_expanded_field(name)
+
+        unknown = sorted(set(selected or []).union(omit) - set(fields))
+        if unknown:
+            param = FIELDS_PARAM if set(unknown) & set(selected or []) else OMIT_PARAM
+            raise ValidationError({param: f'Unknown fields {unknown}; choose from {list(fields)}.'})
+
+        keep = [name for name in fields if (selected is None or name in selected) and name not in omit]
+        # Kept for SparseQuerysetMixin, which defers whatever only these needed
+        self.dropped_fields = {name: field for name, field in fields.items() if name not in keep}
+        return {name: fields[name] for name in keep}
+
+    def build_expanded_field(self, name):
+        serializer_name, nested_fields = self.expandable_fields[name]
+        # Resolved by name so serializers can expand into ones defined further down the module
+        serializer_class = getattr(sys.modules[type(self).__module__], serializer_name)
+        return serializer_class(read_only=True, fields=nested_fields)
+
+    def field_roots(self, name, field):
+        """
+        Model attributes a field reads, by first path component, e.g.
+        ``client_name`` (source ``client.name``) -> ``['client']``. None when
+        unknown (method fields without ``field_dependencies``).
+        """
+        if name in self.field_dependencies:
+            return list(self.field_dependencies[name])
+        source = field.source or name  # Unbound (dropped) fields have no source yet
+        if source == '*':
+            return None
+        return [source.split('.')[0]]
+
+
+def related_path(model, parts):
+    """
+    The select_related() path for attribute ``parts`` such as ``['client']``
+    (from ``client.name``): the leading run of forward foreign keys, or None.
+    """
+    path = []
+    for part in parts:
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            break
+        if not (field.is_relation and (field.many_to_one or field.one_to_one) and field.concrete):
+            break
+        path.append(part)
+        model = field.related_model
+    return '__'.join(path) or None
@@ -0,0 +1,238 @@
+import json
+import platform
+import random
+import resource
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import UserTenant
+from project.benchmarks import latency_summary
+from project.metrics import QueryRecorder
+from project.models import Client, Project, Task
+from project.seeding import Scale, TenantSeeder, benchmark_tenants, create_tenant, reseed, tenant_counts
+
+OWNER_PASSWORD = 'benchmark123'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed benchmark tenants at a configurable scale with project.factories, replay a scripted API '
+        'workload in-process and report latency, queries per request and peak RSS per scenario'
+    )
+
+    scenarios = ('tasks_list', 'tasks_filter', 'tasks_search', 'project_tree', 'tasks_bulk_update', 'invoice_summary')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=1, help='Benchmark tenants to seed and spread requests over')
+        parser.add_argument('--clients', type=int, default=Scale.clients, help='Clients per tenant')
+        parser.add_argument('--projects', type=int, default=Scale.projects, help='Projects per tenant')
+        parser.add_argument('--milestones-per-project', type=int, default=Scale.milestones_per_project)
+        parser.add_argument('--sprints-per-milestone', type=int, default=Scale.sprints_per_milestone)
+        parser.add_argument('--tasks', type=int, default=Scale.tasks, help='Tasks per tenant')
+        parser.add_argument('--batch-size', type=int, default=2000, help='bulk_create batch size when seeding')
+        parser.add_argument('--fast', action='store_true', help='Seed milestones, sprints and tasks without a factory call per row')
+        parser.add_argument('--iterations', type=int, default=50, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per scenario before measuring')
+        parser.add_argument('--scenario', action='append', dest='only', choices=self.scenarios, help='Run only this scenario (repeatable)')
+        parser.add_argument('--prefix', default='benchmark', help='Domain prefix of the benchmark tenants')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for seeded rows and the workload')
+        parser.add_argument('--warm-cache', action='store_true', help='Let list requests hit the list response cache')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+        parser.add_argument('--compare', help='Earlier --json results to print the change against')
+
+    def handle(self, *args, **options):
+        for name in ('tenants', 'clients', 'projects', 'iterations', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive")
+        baseline = self.load(options['compare']) if options['compare'] else None
+
+        reseed(options['seed'])
+        scale = Scale(
+            clients=options['clients'], projects=options['projects'], tasks=options['tasks'],
+            milestones_per_project=options['milestones_per_project'], sprints_per_milestone=options['sprints_per_milestone'],
+        )
+        tenants = self.seed(options['prefix'], options['tenants'], scale, options['batch_size'], options['fast'])
+
+        rng = random.Random(options['seed'])
+        workloads = [self.workload(tenant, rng) for tenant in tenants]
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['*'], MULTI_TENANCY_ENABLED=True):
+            for name in options['only'] or self.scenarios:
+                self.stdout.write(f'Running {name}...', ending='\r')
+                results[name] = self.run(name, workloads, options)
+
+        report = {
+            'meta': {
+                'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'tenants': len(tenants),
+                'scale': tenant_counts(tenants[0]),
+                'iterations': options['iterations'],
+                'warm_cache': options['warm_cache'],
+                'seed': options['seed'],
+            },
+            'scenarios': results,
+        }
+        self.print_report(report, baseline)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+    def load(self, path):
+        try:
+            with open(path) as handle:
+                return json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+    def seed(self, prefix, count, scale, batch_size, fast):
+        """The benchmark tenants, seeding the missing ones. Existing tenants are reused as they are."""
+        existing = {tenant.domain: tenant for tenant in benchmark_tenants(prefix)}
+        tenants = []
+        for index in range(1, count + 1):
+            domain = f'{prefix}-{index}'
+            tenant = existing.get(domain)
+            if tenant is None:
+                tenant, _ = create_tenant(domain, OWNER_PASSWORD)
+                elapsed = TenantSeeder(
+                    tenant, scale, batch_size, fast=fast,
+                    progress=lambda message: self.stdout.write(f'Seeding {message}', ending='\r'),
+                ).run()
+                self.stdout.write(f'Seeded {domain} in {elapsed:.1f}s: {tenant_counts(tenant)}')
+            else:
+                self.stdout.write(f'Reusing {domain}: {tenant_counts(tenant)}')
+            tenants.append(tenant)
+        return tenants
+
+    def workload(self, tenant, rng):
+        """A tenant's API client and the ids and words its scripted requests draw from."""
+        client = APIClient()
+        client.force_authenticate(user=UserTenant.objects.select_related('user').get(tenant=tenant, is_owner=True).user)
+        # Drawn by the seeded rng rather than ORDER BY random(), so runs pick the same rows
+        project_ids = list(Project.objects.filter(tenant=tenant).order_by('pk').values_list('pk', flat=True))
+        project_ids = rng.sample(project_ids, min(50, len(project_ids)))
+        milestone_tasks, words = {}, set()
+        tasks = Task.objects.filter(milestone__project__in=project_ids[:10]).order_by('pk').values_list('milestone_id', 'pk', 'title')
+        for milestone_id, task_id, title in tasks:
+            milestone_tasks.setdefault(milestone_id, []).append(task_id)
+            words.update(word.strip('.').lower() for word in title.split() if len(word) > 4)
+        client_ids = list(Client.objects.filter(tenant=tenant).order_by('pk').values_list('pk', flat=True))
+        if not project_ids or not milestone_tasks:
+            raise CommandError(f'{tenant.domain} has no projects or tasks to benchmark; drop it and reseed')
+        return {
+            'client': client,
+            'host': f'{tenant.domain}.example.com',
+            'rng': rng,
+            'project_ids': project_ids,
+            'milestone_tasks': [ids[:50] for ids in milestone_tasks.values()],
+            'client_ids': rng.sample(client_ids, min(50, len(client_ids))),
+            'words': sorted(words) or ['task'],
+        }
+
+    def request(self, name, work, turn):
+        """``(method, path, data)`` of request ``turn`` of scenario ``name``."""
+        rng = work['rng']
+        if name == 'tasks_list':
+            return 'get', '/api/tasks/', {}
+        if name == 'tasks_filter':
+            return 'get', '/api/tasks/', {'status': 'in_progress', 'milestone__project': rng.choice(work['project_ids'])}
+        if name == 'tasks_search':
+            return 'get', '/api/tasks/', {'search': rng.choice(work['words'])}
+        if name == 'project_tree':
+            return 'get', f"/api/projects/{rng.choice(work['project_ids'])}/tree/", {}
+        if name == 'tasks_bulk_update':
+            # Alternates so every request changes rows and moves counters
+            status = ('in_progress', 'done')[turn % 2]
+            return 'post', '/api/tasks/bulk_update_tasks/', {'task_ids': rng.choice(work['milestone_tasks']), 'status': status}
+        if name == 'invoice_summary':
+            # There's no summary endpoint; a client's unpaid invoices is what the dashboard loads
+            return 'get', '/api/invoices/', {'paid': 'false', 'client': rng.choice(work['client_ids'])}
+        raise CommandError(f'Unknown scenario {name!r}')
+
+    def run(self, name, workloads, options):
+        """Warm up, then time ``iterations`` requests round robin over the tenants."""
+        timings, queries, errors = [], [], 0
+        rss_before = self.peak_rss_mb()
+        for turn in range(-options['warmup'], options['iterations']):
+            work = workloads[turn % len(workloads)]
+            method, path, data = self.request(name, work, turn)
+            if method == 'get' and not options['warm_cache']:
+                # A distinct query string per request keeps the list response cache cold
+                data = {**data, '_benchmark': f'{time.time_ns()}'}
+            recorder = QueryRecorder()
+            started = time.perf_counter()
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                if method == 'get':
+                    response = work['client'].get(path, data, HTTP_HOST=work['host'])
+                else:
+                    response = work['client'].post(path, data, format='json', HTTP_HOST=work['host'])
+            elapsed = (time.perf_counter() - started) * 1000
+            if turn < 0:
+                continue
+            if response.status_code >= 400:
+                errors += 1
+                continue
+            timings.append(elapsed)
+            queries.append(recorder.count)
+        peak = self.peak_rss_mb()
+        return {
+            'requests': options['iterations'],
+            'errors': errors,
+            'latency_ms': latency_summary(timings),
+            'queries': {
+                'mean': round(sum(queries) / len(queries), 1) if queries else None,
+                'max': max(queries) if queries else None,
+            },
+            'peak_rss_mb': peak,
+            'rss_growth_mb': round(peak - rss_before, 1),
+        }
+
+    @staticmethod
+    def peak_rss_mb():
+        """The process's peak resident set so far (ru_maxrss is KiB on Linux, bytes on macOS)."""
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+    def print_report(self, report, baseline):
+        scale = ', '.join(f'{count} {name}' for name, count in report['meta']['scale'].items())
+        self.stdout.write(f"\n{report['meta']['database']}, {report['meta']['tenants']} tenant(s) of {scale}")
+        self.stdout.write(
+            f"{'scenario':<18} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'max q':>6} {'rss MB':>8}"
+            + (f" {'p95 vs base':>12} {'q vs base':>10}" if baseline else '')
+        )
+        for name, result in report['scenarios'].items():
+            latency, queries = result['latency_ms'], result['queries']
+            line = (
+                f"{name:<18} {result['errors']:>6} {self.number(latency['p50'])} {self.number(latency['p95'])} "
+                f"{self.number(latency['p99'])} {self.number(queries['mean'])} {self.number(queries['max'], 6, 0)} "
+                f"{result['peak_rss_mb']:>8.1f}"
+            )
+            before = (baseline or {}).get('scenarios', {}).get(name)
+            if before:
+                line += f" {self.change(before['latency_ms']['p95'], latency['p95']):>12} {self.change(before['queries']['mean'], queries['mean']):>10}"
+            self.stdout.write(line)
+
+    @staticmethod
+    def number(value, width=8, digits=1):
+        return f'{value:>{width}.{digits}f}' if value is not None else f"{'-':>{width}}"
+
+    @staticmethod
+    def change(before, after):
+        if before is None or after is None:
+            return '-'
+        if not before:
+            return f'{after - before:+g}'
+        return f'{(after - before) / before * 100:+.0f}%'
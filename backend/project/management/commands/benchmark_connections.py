@@ -0,0 +1,86 @@
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from project.benchmarks import latency_summary
+
+
+class Command(BaseCommand):
+    help = (
+        'Time request-sized database round trips with a new connection per request, '
+        'then with the configured connection reuse (DB_CONN_MAX_AGE / DB_POOL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Simulated requests per mode')
+        parser.add_argument('--database', default='default', help='Database alias to measure')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+        if options['database'] not in connections:
+            raise CommandError(f"Unknown database alias {options['database']!r}")
+        connection = connections[options['database']]
+        configured = connection.settings_dict
+        pooled = bool(configured['OPTIONS'].get('pool'))
+        self.stdout.write(
+            f"{connection.alias} ({connection.vendor}): "
+            + ('psycopg pool' if pooled else f"CONN_MAX_AGE={configured['CONN_MAX_AGE']}")
+            + f", health checks {'on' if configured['CONN_HEALTH_CHECKS'] else 'off'}"
+        )
+
+        results = {}
+        for label, overrides in (
+            ('new connection', {'CONN_MAX_AGE': 0, 'OPTIONS': {k: v for k, v in configured['OPTIONS'].items() if k != 'pool'}}),
+            ('configured', {}),
+        ):
+            with self.overridden(connection, overrides):
+                results[label] = self.measure(connection, options['requests'])
+
+        self.stdout.write(f"\n{'mode':<16} {'connections':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for label, (latency, opened) in results.items():
+            self.stdout.write(f"{label:<16} {opened:>12} {latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f}")
+        saved = results['new connection'][0]['p50'] - results['configured'][0]['p50']
+        self.stdout.write(self.style.SUCCESS(f'Connection reuse saves {saved:.2f} ms at p50'))
+
+    def measure(self, connection, requests):
+        """
+        Run ``requests`` request cycles: request_started, one query,
+        request_finished (where Django closes or recycles connections).
+        Returns the latency summary and how many connections were opened.
+        """
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count)
+        try:
+            timings = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                request_finished.send(sender=self.__class__)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection_created.disconnect(count)
+        return latency_summary(timings), opened.count(connection.alias)
+
+    @contextmanager
+    def overridden(self, connection, overrides):
+        """Apply settings_dict overrides, starting and ending with a closed connection."""
+        saved = {key: connection.settings_dict[key] for key in overrides}
+        connection.close()
+        connection.settings_dict.update(overrides)
+        try:
+            yield
+        finally:
+            connection.close()
+            connection.settings_dict.update(saved)
@@ -0,0 +1,129 @@
+import io
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from faker import Faker
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from project.benchmarks import percentile
+from project.models import Client, Invoice, Milestone, Project, Sprint, Task
+from project.renderers import MessagePackRenderer, ORJSONParser, ORJSONRenderer
+from project.serializers import InvoiceSerializer, TaskSerializer
+
+RENDERERS = (
+    ('json', JSONRenderer),
+    ('orjson', ORJSONRenderer),
+    ('msgpack', MessagePackRenderer),
+)
+
+PARSERS = (
+    ('json', JSONParser),
+    ('orjson', ORJSONParser),
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare the stdlib JSON, orjson and MessagePack renderers on serialized task and invoice lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Rows per payload')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per renderer')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for generated rows')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        fake = Faker()
+        fake.seed_instance(options['seed'])
+
+        # Unsaved instances: the benchmark needs no database and measures rendering only
+        payloads = {}
+        for label, serializer_class, rows in (
+            ('tasks', TaskSerializer, self.build_tasks(options['rows'], rng, fake)),
+            ('invoices', InvoiceSerializer, self.build_invoices(options['rows'], rng, fake)),
+        ):
+            started = time.perf_counter()
+            payloads[label] = {'results': serializer_class(rows, many=True).data, 'next': None, 'previous': None}
+            self.stdout.write(f'Serialized {len(rows)} {label} in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+        self.stdout.write(f"\n{'payload':<10} {'renderer':<9} {'bytes':>11} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8}")
+        for label, data in payloads.items():
+            baseline = None
+            for name, renderer_class in RENDERERS:
+                renderer = renderer_class()
+                body = renderer.render(data, renderer.media_type, {})
+                timings = self.time_calls(lambda: renderer.render(data, renderer.media_type, {}), options['repeat'])
+                median = statistics.median(timings)
+                baseline = baseline or median
+                self.stdout.write(
+                    f'{label:<10} {name:<9} {len(body):>11,} {median:>9.2f} '
+                    f'{percentile(timings, 95):>9.2f} {baseline / median:>7.1f}x'
+                )
+
+        self.stdout.write(f"\n{'payload':<10} {'parser':<9} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8}")
+        for label, data in payloads.items():
+            body = ORJSONRenderer().render(data)
+            baseline = None
+            for name, parser_class in PARSERS:
+                parser = parser_class()
+                timings = self.time_calls(lambda: parser.parse(io.BytesIO(body), parser.media_type, {}), options['repeat'])
+                median = statistics.median(timings)
+                baseline = baseline or median
+                self.stdout.write(
+                    f'{label:<10} {name:<9} {median:>9.2f} {percentile(timings, 95):>9.2f} {baseline / median:>7.1f}x'
+                )
+
+    def build_tasks(self, count, rng, fake):
+        now = timezone.now()
+        milestones = [Milestone(id=i, name=fake.sentence(nb_words=2)) for i in range(1, 51)]
+        sprints = [Sprint(id=i, name=f'Sprint {i}', milestone=rng.choice(milestones)) for i in range(1, 201)]
+        statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+        tasks = []
+        for i in range(1, count + 1):
+            sprint = rng.choice(sprints + [None])
+            start = now.date() + timedelta(days=rng.randint(0, 60))
+            tasks.append(Task(
+                id=i,
+                title=fake.sentence(nb_words=5),
+                description=fake.text(max_nb_chars=300),
+                status=rng.choice(statuses),
+                milestone=sprint.milestone if sprint else rng.choice(milestones),
+                sprint=sprint,
+                assignee_id=rng.choice([None, 1, 2, 3]),
+                start_date=start,
+                end_date=start + timedelta(days=rng.randint(1, 14)),
+                estimated_hours=rng.randint(1, 40),
+                tenant_id=1,
+                created_at=now - timedelta(minutes=i),
+                updated_at=now,
+            ))
+        return tasks
+
+    def build_invoices(self, count, rng, fake):
+        now = timezone.now()
+        clients = [Client(id=i, name=fake.name()) for i in range(1, 201)]
+        projects = [Project(id=i) for i in range(1, 101)]
+        return [
+            Invoice(
+                id=i,
+                client=rng.choice(clients),
+                project=rng.choice(projects + [None]),
+                amount=Decimal(rng.randint(10_000, 10_000_000)) / 100,
+                issued_at=now - timedelta(hours=i),
+                paid=rng.random() < 0.5,
+            )
+            for i in range(1, count + 1)
+        ]
+
+    def time_calls(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
@@ -0,0 +1,137 @@
+import random
+import statistics
+import time
+from functools import reduce
+from operator import and_, or_
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from faker import Faker
+
+from accounts.models import Tenant
+from project.factories import ClientFactory, MilestoneFactory, ProjectFactory, TenantFactory
+from project.models import Task
+from project.search import SEARCH_DOCUMENTS, SEARCH_RANK, fulltext_search, search_tokens
+
+BENCHMARK_DOMAIN = 'search-benchmark.local'
+
+
+class Command(BaseCommand):
+    help = 'Compare indexed full-text task search with the icontains SearchFilter (Postgres only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1_000_000, help='Number of tasks to search over')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per query')
+        parser.add_argument('--page-size', type=int, default=50, help='Rows fetched per query')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='bulk_create batch size when seeding')
+        parser.add_argument('--query', action='append', dest='queries', help='Search text (repeatable)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for generated text and queries')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_search needs PostgreSQL; the SQLite fallback has no indexes to compare.')
+
+        rng = random.Random(options['seed'])
+        vocabulary = self.build_vocabulary(options['seed'])
+        tenant = self.seed_tasks(options['tasks'], options['batch_size'], vocabulary, rng)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE project_task')
+
+        queries = options['queries'] or self.default_queries(vocabulary, rng)
+        base = Task.objects.filter(tenant=tenant)
+        self.stdout.write(f"{'query':<24} {'backend':<10} {'matches':>9} {'p50 ms':>9} {'p95 ms':>9}  plan")
+        for text in queries:
+            for label, queryset in (
+                ('icontains', self.icontains_search(base, text).order_by('-created_at', '-id')),
+                ('fulltext', fulltext_search(base, text).order_by(f'-{SEARCH_RANK}', '-id')),
+            ):
+                timings = self.time_query(queryset, options['page_size'], options['repeat'])
+                self.stdout.write(
+                    f"{text[:24]:<24} {label:<10} {queryset.count():>9} "
+                    f"{statistics.median(timings):>9.2f} {self.percentile(timings, 95):>9.2f}  "
+                    f"{self.plan_summary(queryset[:options['page_size']])}"
+                )
+
+    def build_vocabulary(self, seed):
+        fake = Faker()
+        fake.seed_instance(seed)
+        words = {fake.word() for _ in range(2000)}
+        words |= {fake.last_name().lower() for _ in range(2000)}
+        words |= {token for _ in range(500) for token in search_tokens(fake.job())}
+        return sorted(words)
+
+    def seed_tasks(self, total, batch_size, vocabulary, rng):
+        """Create (or top up) a dedicated tenant with ``total`` tasks using bulk_create."""
+        tenant = Tenant.objects.filter(domain=BENCHMARK_DOMAIN).first()
+        if tenant is None:
+            tenant = TenantFactory(domain=BENCHMARK_DOMAIN, name='Search Benchmark')
+            client = ClientFactory(tenant=tenant)
+            project = ProjectFactory(client=client, tenant=tenant)
+            MilestoneFactory(project=project, tenant=tenant, assignee=None)
+        milestone = tenant.milestones.first()
+
+        existing = Task.objects.filter(tenant=tenant).count()
+        statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+        created = 0
+        started = time.perf_counter()
+        while existing + created < total:
+            size = min(batch_size, total - existing - created)
+            Task.objects.bulk_create([
+                Task(
+                    tenant=tenant,
+                    milestone=milestone,
+                    title=' '.join(rng.choices(vocabulary, k=rng.randint(3, 6))).capitalize(),
+                    description=' '.join(rng.choices(vocabulary, k=rng.randint(10, 30))),
+                    status=rng.choice(statuses),
+                )
+                for _ in range(size)
+            ], batch_size=size)
+            created += size
+            self.stdout.write(f'Seeded {existing + created}/{total} tasks', ending='\r')
+        if created:
+            self.stdout.write(f'Seeded {created} tasks in {time.perf_counter() - started:.1f}s')
+        return tenant
+
+    def default_queries(self, vocabulary, rng):
+        words = [word for word in vocabulary if len(word) >= 6]
+        word, other = rng.choice(words), rng.choice(words)
+        return [
+            word[:2],                  # first keystrokes: trigram prefix path
+            word[:4],                  # partial word: tsquery prefix
+            word,
+            f'{word} {other}',
+            other[:-2],                # truncated word: prefix on the last token
+        ]
+
+    def icontains_search(self, queryset, text):
+        """What DRF's SearchFilter does with search_fields = title, description."""
+        document = SEARCH_DOCUMENTS['project.Task']
+        return queryset.filter(reduce(and_, [
+            reduce(or_, [Q(**{f'{field}__icontains': term}) for field in document.weights])
+            for term in text.split()
+        ]))
+
+    def time_query(self, queryset, page_size, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset[:page_size])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    @staticmethod
+    def percentile(values, percent):
+        ordered = sorted(values)
+        index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def plan_summary(self, queryset):
+        """Scan nodes of the query plan, e.g. 'Bitmap Index Scan on task_search_idx'."""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            lines = [row[0].strip(' ->') for row in cursor.fetchall()]
+        scans = [line.split('  ')[0] for line in lines if 'Scan' in line]
+        return ', '.join(scans) or lines[0]
@@ -1,7 +1,13 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import django
 from django.contrib.auth.models import Group
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
-from accounts.models import CustomUser, Tenant
+from accounts.models import CustomUser, Tenant, TenantShard
 from project.factories import (
     ClientFactory,
     InvoiceFactory,
@@ -13,12 +19,44 @@ from project.factories import (
     TenantFactory,
 )
 from project.models import Client, Invoice, Milestone, Payment, Project, Sprint, Task
+from project.seeding import Scale, benchmark_tenants, create_tenant, reseed, seed_tenant
+from project.sharding import configured_shard, home_shard, replicate_shared_rows
+
+BULK_PREFIX = 'sample'
+OWNER_PASSWORD = 'password123'
+
+
+def _init_worker():
+    # Spawned workers start from a bare interpreter; DJANGO_SETTINGS_MODULE is inherited
+    django.setup()
 
 
 class Command(BaseCommand):
     help = 'Generate sample data for CRM using factory-boy'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fast', action='store_true',
+            help='Bulk mode: build rows in memory and bulk_create them per tenant, without per-row signals',
+        )
+        parser.add_argument(
+            '--scale', type=float, default=None,
+            help=f'Bulk mode rows per tenant as a multiple of {Scale.clients} clients, {Scale.projects} projects and '
+                 f'{Scale.tasks} tasks (implies --fast)',
+        )
+        parser.add_argument('--tenants', type=int, default=3, help='Tenants to seed in bulk mode')
+        parser.add_argument('--workers', type=int, default=1, help='Processes seeding tenants in parallel in bulk mode')
+        parser.add_argument('--batch-size', type=int, default=5000, help='bulk_create batch size in bulk mode')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for reproducible bulk data')
+        parser.add_argument(
+            '--shard', type=configured_shard, default=None,
+            help='Shard alias to place the new bulk mode tenants on (default: the home shard)',
+        )
+
     def handle(self, *args, **options):
+        if options['fast'] or options['scale'] is not None:
+            return self.generate_bulk(options)
+
         self.stdout.write('Generating sample data...')
 
         # Create or get groups (let signal handle assignment)
@@ -131,4 +169,74 @@ class Command(BaseCommand):
         else:
             self.stdout.write('Payments already exist')
 
-        self.stdout.write(self.style.SUCCESS('Sample data generated successfully!'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Sample data generated successfully!'))
+
+    def generate_bulk(self, options):
+        """
+        Seed tenants ``sample-1``... with project.seeding, one tenant per
+        worker. Tenants that already exist are left alone. New tenants are
+        mapped to ``--shard`` and seeded there. Stored progress is recomputed
+        per tenant in set-based passes once its rows are in.
+        """
+        scale = options['scale'] if options['scale'] is not None else 1
+        for name in ('tenants', 'workers', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive")
+        if scale <= 0:
+            raise CommandError('--scale must be positive')
+        per_tenant = Scale(
+            clients=max(1, round(Scale.clients * scale)),
+            projects=max(1, round(Scale.projects * scale)),
+            tasks=round(Scale.tasks * scale),
+        )
+        seed = options['seed'] if options['seed'] is not None else time.time_ns() % 2**32
+        reseed(seed)
+
+        shard = options['shard'] or home_shard()
+        existing = {tenant.domain for tenant in benchmark_tenants(f'{BULK_PREFIX}-')}
+        tenant_ids = []
+        for index in range(1, options['tenants'] + 1):
+            domain = f'{BULK_PREFIX}-{index}'
+            if domain in existing:
+                self.stdout.write(f'{domain} already exists, skipping')
+                continue
+            tenant, owner = create_tenant(domain, OWNER_PASSWORD)
+            if shard != home_shard():
+                TenantShard.objects.create(tenant=tenant, alias=shard)
+            self.stdout.write(f'Created {domain} on {shard}, owner {owner.email} / {OWNER_PASSWORD}')
+            tenant_ids.append(tenant.pk)
+        if not tenant_ids:
+            self.stdout.write(self.style.SUCCESS('Nothing to generate'))
+            return
+        if shard != home_shard():
+            # The new tenants and owners were saved before the shard hosted a tenant
+            replicate_shared_rows(shard, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            f'Seeding {len(tenant_ids)} tenant(s) of {per_tenant.clients} clients, {per_tenant.projects} projects, '
+            f'{per_tenant.tasks} tasks with {min(options["workers"], len(tenant_ids))} worker(s) (seed {seed})...'
+        )
+        started = time.perf_counter()
+        rows = 0
+        for domain, counts, elapsed in self.seed_tenants(tenant_ids, per_tenant, options['batch_size'], seed, options['workers']):
+            rows += sum(counts.values())
+            self.stdout.write(f'  {domain}: {", ".join(f"{count} {name}" for name, count in counts.items())} in {elapsed:.1f}s')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s)'
+        ))
+
+    def seed_tenants(self, tenant_ids, scale, batch_size, seed, workers):
+        """Yield seed_tenant's result per tenant as it finishes, in-process or on a pool."""
+        args = [(tenant_id, scale.as_dict(), batch_size, True, seed) for tenant_id in tenant_ids]
+        if workers == 1 or len(tenant_ids) == 1:
+            for arg in args:
+                yield seed_tenant(*arg)
+            return
+
+        # Workers open their own connections; don't hand them ours
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=min(workers, len(tenant_ids)), mp_context=get_context('spawn'), initializer=_init_worker) as pool:
+            futures = [pool.submit(seed_tenant, *arg) for arg in args]
+            for future in as_completed(futures):
+                yield future.result()
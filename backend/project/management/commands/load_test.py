@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from project.benchmarks import latency_summary
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive concurrent GET requests at running servers and compare throughput and latency, '
+        'e.g. the WSGI and ASGI deployments of the same endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs to load, one after the other; the first is the baseline')
+        parser.add_argument('--concurrency', type=int, default=200, help='Simultaneous clients')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds measured per URL')
+        parser.add_argument('--warmup', type=float, default=3, help='Seconds of load before measuring')
+        parser.add_argument('--token', help='API token sent as "Authorization: Token ..."')
+        parser.add_argument('--header', action='append', default=[], help='Extra "Name: value" header (repeatable), e.g. the tenant Host')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError('--concurrency and --duration must be positive')
+        headers = {}
+        for header in options['header']:
+            name, sep, value = header.partition(':')
+            if not sep:
+                raise CommandError(f'Invalid header {header!r}; use "Name: value"')
+            headers[name.strip()] = value.strip()
+        if options['token']:
+            headers['Authorization'] = f"Token {options['token']}"
+
+        results = []
+        for url in options['urls']:
+            self.stdout.write(f"Loading {url} with {options['concurrency']} clients for {options['duration']:g}s...")
+            results.append(self.run(url, headers, options))
+
+        self.stdout.write(
+            f"\n{'url':<45} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'vs first':>9}"
+        )
+        baseline = results[0]['requests_per_second']
+        for result in results:
+            latency = result['latency_ms']
+            ratio = f"{result['requests_per_second'] / baseline:.2f}x" if baseline else '-'
+            self.stdout.write(
+                f"{result['url'][-45:]:<45} {result['requests']:>9} {result['errors']:>7} "
+                f"{result['requests_per_second']:>8.1f} {self.ms(latency['p50'])} {self.ms(latency['p95'])} "
+                f"{self.ms(latency['p99'])} {ratio:>9}"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as handle:
+                json.dump({'concurrency': options['concurrency'], 'duration': options['duration'], 'results': results}, handle, indent=2)
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+    def run(self, url, headers, options):
+        """Keep ``concurrency`` clients requesting ``url`` back to back; only requests started after the warmup count."""
+        started = time.perf_counter()
+        measure_from = started + options['warmup']
+        stop_at = measure_from + options['duration']
+        timings, errors, lock = [], [0], threading.Lock()
+
+        def client():
+            session = requests.Session()
+            session.headers.update(headers)
+            while True:
+                request_started = time.perf_counter()
+                if request_started >= stop_at:
+                    return
+                try:
+                    response = session.get(url, timeout=options['timeout'])
+                    failed = response.status_code >= 400
+                except requests.RequestException:
+                    failed = True
+                elapsed = (time.perf_counter() - request_started) * 1000
+                if request_started >= measure_from:
+                    with lock:
+                        if failed:
+                            errors[0] += 1
+                        else:
+                            timings.append(elapsed)
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for _ in range(options['concurrency']):
+                pool.submit(client)
+
+        measured = time.perf_counter() - measure_from
+        return {
+            'url': url,
+            'requests': len(timings) + errors[0],
+            'errors': errors[0],
+            'requests_per_second': round(len(timings) / measured, 1) if measured > 0 else 0,
+            'latency_ms': latency_summary(timings),
+        }
+
+    @staticmethod
+    def ms(value):
+        return f'{value:>8.1f}' if value is not None else f"{'-':>8}"
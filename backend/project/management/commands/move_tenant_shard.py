@@ -0,0 +1,147 @@
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from accounts.models import Tenant, TenantShard
+from project.models import ChangeLogEntry
+from project.sharding import (
+    COPY_ORDER,
+    batch_insert,
+    configured_shard,
+    home_shard,
+    leftover_models,
+    purge_tenant_rows,
+    replicate_shared_rows,
+)
+from saasCRM.db_routers import shard_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy a tenant's project data to another shard in streaming batches, "
+        'point the shard map at it, then delete the rows left on the source'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', help='Tenant domain or id')
+        parser.add_argument('target', help='Database alias of the destination shard')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read and inserted per batch')
+        parser.add_argument(
+            '--settle', type=float, default=None,
+            help='Seconds to wait after blocking writes and after the flip, for cached tenants to expire '
+                 '(default TENANT_CACHE_LOCAL_TTL)',
+        )
+        parser.add_argument(
+            '--keep-source', action='store_true',
+            help='Leave the rows on the source shard (remove them later with purge_tenant_rows)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        tenant = self.get_tenant(options['tenant'])
+        source = shard_for(tenant) or home_shard()
+        target = configured_shard(options['target'])
+        if target == source:
+            raise CommandError(f'{tenant.domain} is already on {target}')
+        self.check_target(tenant, target)
+
+        # Block writes first: TenantMiddleware answers 503 to unsafe requests
+        # for a moving tenant, once every worker's cached tenant has expired
+        entry, _ = TenantShard.objects.update_or_create(tenant=tenant, defaults={'alias': source, 'moving': True})
+        settle = options['settle'] if options['settle'] is not None else getattr(settings, 'TENANT_CACHE_LOCAL_TTL', 30)
+        self.stdout.write(f'Writes to {tenant.domain} blocked; waiting {settle:g}s for cached tenants to expire...')
+        time.sleep(settle)
+
+        started = time.perf_counter()
+        try:
+            # The target isn't in the shard map yet, so saves of shared rows
+            # aren't mirrored to it: replicate them now, and what was added
+            # meanwhile again after the flip
+            replicated = replicate_shared_rows(target, batch_size=options['batch_size'])
+            with transaction.atomic(using=target):
+                copied = self.copy(tenant, source, target, options['batch_size'])
+        except (IntegrityError, CommandError) as exc:
+            entry.moving = False
+            entry.save(update_fields=['moving', 'updated_at'])
+            raise CommandError(f'Move aborted, {tenant.domain} stays on {source}: {exc}') from exc
+
+        # The copy is committed; the flip is a single row update on default
+        entry.alias, entry.moving = target, False
+        entry.save(update_fields=['alias', 'moving', 'updated_at'])
+        replicate_shared_rows(target, after=replicated, batch_size=options['batch_size'])
+
+        elapsed = time.perf_counter() - started
+        rows = sum(count for count, _ in copied.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {tenant.domain} from {source} to {target}: {rows} rows in {elapsed:.1f}s.'
+        ))
+        if options['keep_source']:
+            self.stdout.write(f'Its rows on {source} are left in place; remove them with purge_tenant_rows.')
+            return
+
+        # Workers that cached the tenant before the flip still read the source until it expires
+        self.stdout.write(f'Waiting {settle:g}s for cached tenants to expire before deleting the rows on {source}...')
+        time.sleep(settle)
+        deleted = purge_tenant_rows(tenant, source, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {sum(deleted.values())} rows of {tenant.domain} from {source}.'))
+
+    def get_tenant(self, value):
+        lookup = {'pk': int(value)} if value.isdigit() else {'domain': value}
+        try:
+            return Tenant.objects.select_related('shard').get(**lookup)
+        except Tenant.DoesNotExist:
+            raise CommandError(f'Tenant {value!r} does not exist')
+
+    def check_target(self, tenant, target):
+        """The target must not hold rows of the tenant, from an earlier move or an aborted copy."""
+        leftovers = leftover_models(tenant, target)
+        if leftovers:
+            raise CommandError(
+                f'{target} already holds {", ".join(leftovers)} rows of {tenant.domain}; '
+                f'remove them first with purge_tenant_rows {tenant.domain} {target}'
+            )
+
+    def copy(self, tenant, source, target, batch_size):
+        """
+        Stream each model's rows from ``source`` and insert them on
+        ``target`` with their primary keys. Every shard hands out ids from
+        its own block (``project.sharding.id_range``), so the target's
+        sequences never reach the copied ids and are left alone. Rows made
+        before the shards had blocks can still collide: each batch is
+        checked against the target first, and a taken id aborts the move.
+        Returns ``{model: (rows, max pk)}``.
+        """
+        copied = {}
+        for model, lookup in COPY_ORDER:
+            queryset = model._base_manager.using(source).filter(**{lookup: tenant})
+            rows = queryset.order_by('pk').iterator(chunk_size=batch_size)
+            count = max_pk = 0
+            while batch := list(islice(rows, batch_size)):
+                taken = list(
+                    model._base_manager.using(target).filter(pk__in=[obj.pk for obj in batch])
+                    .order_by('pk').values_list('pk', flat=True)[:5]
+                )
+                if taken:
+                    raise CommandError(
+                        f'{model._meta.label} ids {", ".join(map(str, taken))} are already taken on {target} by another tenant'
+                    )
+                if model is ChangeLogEntry:
+                    # Transaction ids belong to the source; on the target the
+                    # copied log is settled history, ahead of anything new there
+                    for entry in batch:
+                        entry.txid = 0
+                # Raw inserts, as loaddata does: stored values (auto_now
+                # timestamps included) are copied as they are, with no signals
+                batch_insert(model, batch, target)
+                count += len(batch)
+                max_pk = batch[-1].pk
+            # Writes are blocked; a different count means something bypassed that
+            if queryset.count() != count:
+                raise CommandError(f'{model._meta.label} changed on {source} during the copy')
+            copied[model] = (count, max_pk)
+            self.stdout.write(f'  {model._meta.label}: {count} rows')
+        return copied
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Tenant
+from project.sharding import COPY_ORDER, configured_shard, home_shard, purge_tenant_rows
+from saasCRM.db_routers import shard_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete a tenant's project data from a shard it doesn't live on: rows left on the source "
+        'by move_tenant_shard --keep-source, or a copy an aborted move left on its target'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', help='Tenant domain or id')
+        parser.add_argument('alias', help='Database alias of the shard to delete the rows from')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        value = options['tenant']
+        lookup = {'pk': int(value)} if value.isdigit() else {'domain': value}
+        try:
+            tenant = Tenant.objects.select_related('shard').get(**lookup)
+        except Tenant.DoesNotExist:
+            raise CommandError(f'Tenant {value!r} does not exist')
+        alias = configured_shard(options['alias'])
+        if alias == (shard_for(tenant) or home_shard()):
+            raise CommandError(f'{tenant.domain} lives on {alias}; its rows there are not a leftover copy')
+
+        if options['dry_run']:
+            for model, lookup in COPY_ORDER:
+                count = model._base_manager.using(alias).filter(**{lookup: tenant}).count()
+                self.stdout.write(f'  {model._meta.label}: {count} rows')
+            return
+
+        deleted = purge_tenant_rows(tenant, alias, options['batch_size'])
+        for model, count in deleted.items():
+            self.stdout.write(f'  {model._meta.label}: {count} rows')
+        self.stdout.write(self.style.SUCCESS(f'Deleted {sum(deleted.values())} rows of {tenant.domain} from {alias}'))
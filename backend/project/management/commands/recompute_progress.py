@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from project.models import Milestone, Project
+from project.rollups import pk_chunks, recompute_chunk
+from project.sharding import configured_shard, home_shard, hosting_shards, shard_aliases, tenant_filter
+
+
+def _init_worker():
+    # Spawned workers start from a bare interpreter; DJANGO_SETTINGS_MODULE is inherited
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Recompute milestone and project progress from their sprints, for some or all tenants, on every shard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, action='append', dest='tenants', help='Tenant id (repeatable); default all')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows recomputed per grouped aggregate')
+        parser.add_argument('--parallel', type=int, default=1, help='Worker processes (each with its own connection)')
+        parser.add_argument('--shard', action='append', dest='shards', type=configured_shard, help='Shard alias (repeatable); default all')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['parallel'] < 1:
+            raise CommandError('--chunk-size and --parallel must be positive')
+
+        started = time.perf_counter()
+        total_checked = total_changed = 0
+        # A shard no tenant is mapped to holds no live rows
+        live = {home_shard()} | hosting_shards()
+        for alias in options['shards'] or shard_aliases():
+            if alias not in live:
+                continue
+            checked, changed = self.recompute_shard(alias, options)
+            total_checked += checked
+            total_changed += changed
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {total_checked} rows, {total_changed} changed, '
+            f'in {elapsed:.1f}s ({self.rate(total_checked, elapsed)} rows/s)'
+        ))
+
+    def recompute_shard(self, alias, options):
+        """The tenants living on ``alias``; rows a move left behind aren't theirs. Returns (checked, changed)."""
+        shard_checked = shard_changed = 0
+        # Milestones first: project progress is built from milestone progress,
+        # so the project pass only starts once every milestone chunk is done
+        for model in (Milestone, Project):
+            queryset = model.objects.using(alias).filter(tenant_filter(alias))
+            if options['tenants']:
+                queryset = queryset.filter(tenant_id__in=options['tenants'])
+
+            level_started = time.perf_counter()
+            checked, changed = self.recompute(model._meta.model_name, pk_chunks(queryset, options['chunk_size']), options['parallel'], alias)
+            elapsed = time.perf_counter() - level_started
+            self.stdout.write(
+                f'{alias}: {model._meta.verbose_name_plural}: {checked} checked, {changed} changed '
+                f'in {elapsed:.1f}s ({self.rate(checked, elapsed)} rows/s)'
+            )
+            shard_checked += checked
+            shard_changed += changed
+        return shard_checked, shard_changed
+
+    def recompute(self, model_name, chunks, parallel, alias):
+        """Run recompute_chunk over ``chunks`` of shard ``alias``, in-process or on a pool. Returns (checked, changed)."""
+        checked = changed = 0
+        if parallel == 1:
+            for chunk in chunks:
+                chunk_checked, chunk_changed = recompute_chunk(model_name, chunk, alias)
+                checked += chunk_checked
+                changed += chunk_changed
+            return checked, changed
+
+        # Workers open their own connections; don't hand them ours
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=parallel, mp_context=get_context('spawn'), initializer=_init_worker) as pool:
+            futures = [pool.submit(recompute_chunk, model_name, chunk, alias) for chunk in chunks]
+            for future in as_completed(futures):
+                chunk_checked, chunk_changed = future.result()
+                checked += chunk_checked
+                changed += chunk_changed
+        return checked, changed
+
+    @staticmethod
+    def rate(rows, elapsed):
+        return f'{rows / elapsed:,.0f}' if elapsed else '-'
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from project.models import Milestone, Project
+from project.rollups import pk_chunks, reconcile_milestones, reconcile_projects
+from project.sharding import configured_shard, home_shard, hosting_shards, shard_aliases, tenant_filter
+from saasCRM.db_routers import using_shard
+
+
+class Command(BaseCommand):
+    help = 'Check (and with --fix, repair) the denormalized progress rollup counters on every shard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, action='append', dest='tenants', help='Tenant id (repeatable); default all')
+        parser.add_argument('--fix', action='store_true', help='Write corrected counters and progress back')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows reconciled per query')
+        parser.add_argument('--show', type=int, default=10, help='Drifted rows to list per model')
+        parser.add_argument('--shard', action='append', dest='shards', type=configured_shard, help='Shard alias (repeatable); default all')
+
+    def handle(self, *args, **options):
+        drift = 0
+        # A shard no tenant is mapped to holds no live rows
+        live = {home_shard()} | hosting_shards()
+        for alias in options['shards'] or shard_aliases():
+            if alias in live:
+                drift += self.verify_shard(alias, options)
+
+        if drift and not options['fix']:
+            raise CommandError(f'{drift} rows drifted; rerun with --fix to repair them')
+        if drift:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {drift} rows'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Rollups are consistent'))
+
+    def verify_shard(self, alias, options):
+        """Check the tenants living on ``alias``; rows a move left behind aren't theirs. Returns the drift."""
+        drift = 0
+        # Milestones first: project sums are built from milestone progress
+        for model, reconcile in ((Milestone, reconcile_milestones), (Project, reconcile_projects)):
+            queryset = model.objects.using(alias).filter(tenant_filter(alias))
+            if options['tenants']:
+                queryset = queryset.filter(tenant_id__in=options['tenants'])
+
+            checked, drifted = 0, []
+            with using_shard(alias):
+                for chunk in pk_chunks(queryset, options['chunk_size']):
+                    checked += len(chunk)
+                    drifted.extend(reconcile(model.objects.filter(pk__in=chunk), fix=options['fix']))
+
+            label = model._meta.verbose_name_plural
+            self.stdout.write(f'{alias}: {label}: {checked} checked, {len(drifted)} drifted')
+            for obj in drifted[:options['show']]:
+                self.stdout.write(f'  #{obj.pk}: expected progress {obj.progress}')
+            drift += len(drifted)
+        return drift
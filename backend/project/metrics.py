@@ -0,0 +1,205 @@
+"""
+Per-endpoint request and SQL metrics, exposed in Prometheus text format.
+
+``project.middleware.QueryMetricsMiddleware`` installs a
+``connection.execute_wrapper`` on every database alias for the duration of a
+request. ``QueryRecorder`` counts the queries, sums their time and counts each
+distinct SQL string. At the end of the request, ``record_request`` files the
+totals under the view that handled it (``TaskViewSet.list``,
+``sync_view``...) in fixed-bucket histograms. SQL strings run more than once
+in a request are counted as duplicates, usually an N+1 loop. They are
+normalised (``IN`` lists collapsed), hashed to a short fingerprint and kept,
+at most ``MAX_FINGERPRINTS`` per endpoint.
+
+Per request the recording costs a clock read and a dict increment per
+query, plus one lock per endpoint at the end. It is cheap enough to leave on;
+``QUERY_METRICS_ENABLED=False`` turns it off.
+
+Metrics are per process: with several workers each scrape of
+``GET /api/_metrics/`` sees one worker's numbers, labelled with its ``pid``.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from .cache import tenant_cache
+
+# Seconds; covers a cached hit (~1ms) to a pathological request
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+MAX_FINGERPRINTS = 10
+
+IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+# Django's savepoint ids, "s<thread>_x<n>", differ on every atomic block
+SAVEPOINT_RE = re.compile(r'"s\d+_x\d+"')
+
+
+def fingerprint(sql):
+    """``(fingerprint, normalised SQL)``: statements differing only in ``IN`` list length or savepoint id share one."""
+    sql = SAVEPOINT_RE.sub('"%s"', IN_LIST_RE.sub('(%s, ...)', sql))
+    return hashlib.md5(sql.encode()).hexdigest()[:12], sql
+
+
+class QueryRecorder:
+    """``execute_wrapper`` callable collecting one request's queries, on any number of aliases."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        """``{fingerprint: (sql, extra executions)}`` for statements run more than once."""
+        normalised = defaultdict(lambda: [None, 0])
+        for sql, runs in self.statements.items():
+            key, sql = fingerprint(sql)
+            normalised[key][0] = sql
+            normalised[key][1] += runs
+        return {key: (sql, runs - 1) for key, (sql, runs) in normalised.items() if runs > 1}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot: +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """``(le, cumulative count)`` pairs, +Inf last."""
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.db_duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.responses = Counter()  # status class ('2xx'...) -> requests
+        self.duplicates = Counter()  # fingerprint -> extra executions
+        self.duplicate_sql = {}  # fingerprint -> normalised SQL
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, name):
+        stats = self._endpoints.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._endpoints.setdefault(name, EndpointStats())
+        return stats
+
+    def record_request(self, endpoint, status_code, seconds, recorder):
+        stats = self.endpoint(endpoint)
+        duplicates = recorder.duplicates()
+        with stats.lock:
+            stats.duration.observe(seconds)
+            stats.db_duration.observe(recorder.seconds)
+            stats.queries.observe(recorder.count)
+            stats.responses[f'{status_code // 100}xx'] += 1
+            for fingerprint, (sql, extra) in duplicates.items():
+                if fingerprint in stats.duplicates or len(stats.duplicates) < MAX_FINGERPRINTS:
+                    stats.duplicates[fingerprint] += extra
+                    stats.duplicate_sql[fingerprint] = sql
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        """All metrics in Prometheus text exposition format (0.0.4)."""
+        pid = os.getpid()
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for name, attribute, help_text in (
+            ('crm_request_duration_seconds', 'duration', 'Wall time per request.'),
+            ('crm_request_db_duration_seconds', 'db_duration', 'Time spent in SQL per request.'),
+            ('crm_request_queries', 'queries', 'SQL queries per request.'),
+        ):
+            header(name, 'histogram', help_text)
+            for endpoint, stats in endpoints:
+                labels = f'endpoint="{escape(endpoint)}",pid="{pid}"'
+                with stats.lock:
+                    histogram = getattr(stats, attribute)
+                    for bound, total in histogram.samples():
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+        header('crm_requests_total', 'counter', 'Requests by response status class.')
+        for endpoint, stats in endpoints:
+            with stats.lock:
+                responses = sorted(stats.responses.items())
+            for status_class, count in responses:
+                lines.append(f'crm_requests_total{{endpoint="{escape(endpoint)}",status="{status_class}",pid="{pid}"}} {count}')
+
+        header('crm_duplicate_queries_total', 'counter', 'Repeated executions of the same SQL within one request.')
+        for endpoint, stats in endpoints:
+            with stats.lock:
+                duplicates = [(fingerprint, stats.duplicate_sql[fingerprint], count) for fingerprint, count in stats.duplicates.most_common()]
+            for fingerprint, sql, count in duplicates:
+                lines.append(
+                    f'crm_duplicate_queries_total{{endpoint="{escape(endpoint)}",fingerprint="{fingerprint}",'
+                    f'sql="{escape(sql[:200])}",pid="{pid}"}} {count}'
+                )
+
+        header('crm_tenant_cache_lookups_total', 'counter', 'Tenant lookups by cache level (see project/cache.py).')
+        cache_stats = tenant_cache.stats()
+        for result in ('local_hits', 'shared_hits', 'misses'):
+            lines.append(f'crm_tenant_cache_lookups_total{{result="{result}",pid="{pid}"}} {cache_stats[result]}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def endpoint_name(request):
+    """The view that handled ``request``: ``ViewSet.action`` for viewsets, the view's name otherwise."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    func = match.func
+    # DRF views carry their class (@api_view functions get one named after them)
+    cls = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if cls is None:
+        return getattr(func, '__name__', type(func).__name__)
+    actions = getattr(func, 'actions', None)
+    if actions:
+        return f'{cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+    return cls.__name__
+
+
+registry = MetricsRegistry()
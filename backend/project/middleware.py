@@ -1,10 +1,19 @@
+import time
+from contextlib import ExitStack
+
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
-from django.http import Http404
+from django.db import connections
+from django.http import Http404, JsonResponse
 from django.shortcuts import redirect
 from django.utils.deprecation import MiddlewareMixin
 
 from accounts.models import Tenant, UserTenant
+from saasCRM import db_routers
+
+from . import metrics
+from .cache import tenant_cache
 
 
 class TenantMiddleware(MiddlewareMixin):
@@ -13,6 +22,9 @@ class TenantMiddleware(MiddlewareMixin):
         if not hasattr(request, 'get_host'):
             return
 
+        # Project data goes to the home shard unless the tenant is mapped elsewhere
+        db_routers.set_shard(None)
+
         # If multi-tenancy is disabled, set tenant to None
         if not getattr(settings, 'MULTI_TENANCY_ENABLED', False):
             request.tenant = None
@@ -29,11 +41,101 @@ class TenantMiddleware(MiddlewareMixin):
 
         if subdomain:
             try:
-                tenant = Tenant.objects.get(domain=subdomain)
+                tenant = tenant_cache.get(subdomain)
                 request.tenant = tenant
             except Tenant.DoesNotExist:
                 # Invalid subdomain, redirect to main site or error
                 raise Http404("Tenant not found")
+            shard = getattr(tenant, 'shard', None)
+            if shard is not None:
+                if shard.moving and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                    # move_tenant_shard is copying the tenant: reads still work
+                    return JsonResponse(
+                        {'detail': 'This workspace is being moved. Try again shortly.'},
+                        status=503, headers={'Retry-After': '30'},
+                    )
+                db_routers.set_shard(shard.alias)
         else:
             # No subdomain, perhaps public pages or login
-            request.tenant = None
\ No newline at end of file
+            request.tenant = None
+
+    def process_response(self, request, response):
+        db_routers.set_shard(None)
+        return response
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes on top of the replica routing in ``saasCRM.db_routers``.
+
+    A request may read from replicas unless it is a write (unsafe method) or
+    its client or tenant wrote in the last ``REPLICA_PIN_SECONDS``: browsers
+    carry that in a cookie, API clients without cookies through a cache
+    marker per tenant. A request that writes sets both. Does nothing when no
+    replicas are configured.
+    """
+
+    cookie_name = 'db_primary_until'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    @staticmethod
+    def marker_key(tenant):
+        return f'dbpin:tenant:{tenant.pk}'
+
+    def process_request(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            return
+        request.db_routing = db_routers.start_request(pinned=self.pinned(request))
+
+    def pinned(self, request):
+        if request.method not in self.safe_methods:
+            return True
+        try:
+            if float(request.COOKIES.get(self.cookie_name, 0)) > time.time():
+                return True
+        except ValueError:
+            pass
+        tenant = getattr(request, 'tenant', None)
+        return tenant is not None and cache.get(self.marker_key(tenant)) is not None
+
+    def process_response(self, request, response):
+        state = getattr(request, 'db_routing', None)
+        if state is None:
+            return response
+        db_routers.end_request()
+        if state.wrote:
+            seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 15)
+            response.set_cookie(
+                self.cookie_name, str(int(time.time() + seconds)), max_age=seconds,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+            tenant = getattr(request, 'tenant', None)
+            if tenant is not None:
+                cache.set(self.marker_key(tenant), 1, seconds)
+        return response
+
+
+class QueryMetricsMiddleware:
+    """
+    Records each request's query count, SQL time, duplicate queries and wall
+    time under the view that handled it (see ``project.metrics``), for
+    ``GET /api/_metrics/``. Queries on every database alias are counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        recorder = metrics.QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        metrics.registry.record_request(
+            metrics.endpoint_name(request), response.status_code, time.perf_counter() - started, recorder
+        )
+        return response
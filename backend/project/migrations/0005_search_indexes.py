@@ -0,0 +1,62 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models.functions import Upper
+
+
+def search_vector(**weights):
+    vectors = [SearchVector(field, config='english', weight=weight) for field, weight in weights.items()]
+    combined = vectors[0]
+    for vector in vectors[1:]:
+        combined = combined + vector
+    return combined
+
+
+def trigram(field):
+    # icontains/istartswith compile to UPPER(col) LIKE UPPER(...) on Postgres
+    return OpClass(Upper(field), name='gin_trgm_ops')
+
+
+SEARCH_INDEXES = [
+    ('client', GinIndex(search_vector(name='A', email='B'), name='client_search_idx')),
+    ('client', GinIndex(trigram('name'), name='client_name_trgm_idx')),
+    ('project', GinIndex(search_vector(name='A', description='B'), name='project_search_idx')),
+    ('project', GinIndex(trigram('name'), name='project_name_trgm_idx')),
+    ('milestone', GinIndex(search_vector(name='A', description='B'), name='milestone_search_idx')),
+    ('milestone', GinIndex(trigram('name'), name='milestone_name_trgm_idx')),
+    ('task', GinIndex(search_vector(title='A', description='B'), name='task_search_idx')),
+    ('task', GinIndex(trigram('title'), name='task_title_trgm_idx')),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model('project', model_name), index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model('project', model_name), index)
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text and trigram GIN indexes backing project.search (Postgres only).
+
+    The indexed expressions must match project.search.SEARCH_DOCUMENTS exactly.
+    Invoices are searched through their client, so they use the client indexes.
+    """
+
+    dependencies = [
+        ('project', '0004_alter_client_phone_alter_client_status_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
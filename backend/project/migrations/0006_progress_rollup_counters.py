@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:17
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def grouped(queryset, key, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{key: OuterRef('pk')}).order_by().values(key)
+            .annotate(value=aggregate).values('value'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Sprint = apps.get_model('project', 'Sprint')
+    Milestone = apps.get_model('project', 'Milestone')
+    Project = apps.get_model('project', 'Project')
+    Milestone.objects.update(
+        sprint_count=grouped(Sprint.objects, 'milestone', Count('id')),
+        completed_sprint_count=grouped(Sprint.objects, 'milestone', Count('id', filter=Q(status='completed'))),
+    )
+    Project.objects.update(
+        milestone_count=grouped(Milestone.objects, 'project', Count('id')),
+        milestone_progress_sum=grouped(Milestone.objects, 'project', Sum('progress')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0005_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='milestone',
+            name='completed_sprint_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='milestone',
+            name='sprint_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='milestone_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='milestone_progress_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_populate_tenant_created_by'),
+        ('project', '0006_progress_rollup_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('tenant', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='change_log', to='accounts.tenant')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['tenant', 'id'], name='changelog_tenant_seq_idx')],
+            },
+        ),
+    ]
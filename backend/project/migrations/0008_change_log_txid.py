@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_tenant_shard_map'),
+        ('project', '0007_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelogentry',
+            name='txid',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['tenant', 'txid', 'id'], name='changelog_tenant_txid_idx'),
+        ),
+    ]
@@ -0,0 +1,241 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+
+from .cache import get_generations, list_generation, tenant_generation
+from .fieldsets import related_path
+from .permissions import get_access_snapshot
+
+
+class ListDependenciesMixin:
+    """
+    Shared by CachedListMixin and ConditionalGetMixin: the models (by
+    model_name) whose data appears in the serialized output, and the scope and
+    generation counters that identify the current version of that data.
+    """
+    cache_list_dependencies = ()
+
+    def get_list_cache_scope(self, request):
+        """
+        Scope of the cached data: tenant plus the user's permission set.
+
+        Users with identical permissions in the same tenant share entries. In
+        dev mode (no tenant) the queryset depends on the user's tenants, so
+        the scope is the user.
+        """
+        tenant = getattr(request, 'tenant', None)
+        if tenant is None:
+            return f'user:{request.user.pk}', None
+        snapshot = get_access_snapshot(request)
+        perms = ','.join(sorted(snapshot.perms))
+        scope = f'{snapshot.is_owner}:{request.user.is_superuser}:{perms}'
+        return f'tenant:{tenant.pk}:{hashlib.md5(scope.encode()).hexdigest()}', tenant.pk
+
+    def get_generation_names(self, tenant_id):
+        return [list_generation(model_name, tenant_id) for model_name in self.cache_list_dependencies]
+
+    def get_list_generations(self, request):
+        """Current generations of ``get_generation_names()`` in the request's tenant (one cache round trip per request)."""
+        if getattr(self, '_list_generations', None) is None:
+            _, tenant_id = self.get_list_cache_scope(request)
+            self._list_generations = get_generations(*self.get_generation_names(tenant_id))
+        return self._list_generations
+
+    def get_data_fingerprint(self, request):
+        """
+        Hash of everything the response data depends on: view, URL kwargs,
+        host (pagination links are absolute), scope, dependency generations
+        and the normalized query string.
+        """
+        scope, _ = self.get_list_cache_scope(request)
+        params = urlencode(sorted(
+            (key, value) for key, values in request.query_params.lists() for value in sorted(values)
+        ))
+        raw = ':'.join([
+            self.__class__.__name__,
+            request.get_host(),
+            str(self.kwargs),
+            str(request.version),
+            scope,
+            ':'.join(str(generation) for generation in self.get_list_generations(request)),
+            params,
+        ])
+        return hashlib.md5(raw.encode()).hexdigest()
+
+
+class CachedListMixin(ListDependenciesMixin):
+    """
+    Cache ``list`` responses per tenant, permission scope and query string.
+
+    Cache keys embed generation counters for every model in
+    ``cache_list_dependencies``; the post_save/post_delete receivers in
+    ``project.signals`` bump those generations, so any write to a dependency
+    invalidates the cached lists immediately without scanning keys.
+
+    Opt in by adding the mixin before ``ModelViewSet`` and listing the models
+    (by model_name) whose data appears in the serialized list:
+
+        class ClientViewSet(CachedListMixin, viewsets.ModelViewSet):
+            cache_list_dependencies = ('client', 'project')
+    """
+    cache_list_timeout = None  # Defaults to settings.LIST_CACHE_TIMEOUT
+
+    def get_list_cache_key(self, request):
+        return f'listcache:{self.get_data_fingerprint(request)}'
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = self.cache_list_timeout or getattr(settings, 'LIST_CACHE_TIMEOUT', 60 * 15)
+            cache.set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class ConditionalGetMixin(ListDependenciesMixin):
+    """
+    ETag and Last-Modified validators for ``list`` and ``retrieve``.
+
+    Both come from the generation counters of ``cache_list_dependencies``, so
+    checking them costs one cache read and no query: the ETag hashes the same
+    inputs as the list cache key plus the response format, and Last-Modified is
+    the newest generation (generations are time_ns() timestamps of the last
+    write). A matching ``If-None-Match`` (or, without one, an
+    ``If-Modified-Since`` no older than the last write) returns 304 before
+    anything is serialized. Lists skip the queryset too; ``retrieve`` still
+    looks the object up and checks its object permissions first, so a 304 is
+    never sent for a row that is gone or no longer readable.
+
+    Generations are per tenant and model, so any write to a dependency in the
+    tenant changes the validators of every list and detail response built on it.
+    The tenant's own generation and the permission generations of the user's
+    access snapshot count too: a tenant update, or a membership, group or
+    permission change that alters what the user may see, also changes them.
+    """
+
+    def get_generation_names(self, tenant_id):
+        names = super().get_generation_names(tenant_id)
+        return names + [tenant_generation(tenant_id)] if tenant_id is not None else names
+
+    def get_validator_generations(self, request):
+        """Data generations plus the access snapshot's (already read to check permissions)."""
+        return [*self.get_list_generations(request), *get_access_snapshot(request).generations]
+
+    def get_etag(self, request):
+        format = getattr(request, 'accepted_renderer', None) and request.accepted_renderer.format
+        _, tenant_id = self.get_list_cache_scope(request)
+        raw = ':'.join([
+            self.get_data_fingerprint(request),
+            str(tenant_id),
+            ':'.join(str(generation) for generation in get_access_snapshot(request).generations),
+        ])
+        return f'W/"{hashlib.md5(raw.encode()).hexdigest()}-{format}"'
+
+    def get_last_modified(self, request):
+        """Unix time of the newest generation, in whole seconds (HTTP dates have no fraction)."""
+        generations = self.get_validator_generations(request)
+        return max(generations) // 1_000_000_000 + 1 if generations else None
+
+    def dispatch_conditional(self, request, handler, *args, **kwargs):
+        if not self.cache_list_dependencies:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = self.get_etag(request), self.get_last_modified(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Responses vary by user: cache privately, revalidate every time
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.dispatch_conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.dispatch_conditional(
+            request, lambda request, *args, **kwargs: Response(self.get_serializer(instance).data), *args, **kwargs
+        )
+
+
+class SparseQuerysetMixin:
+    """
+    Load only what a sparse fieldset needs (see ``project.fieldsets``).
+
+    For ``list`` and ``retrieve``, columns read only by fields dropped with
+    ``?fields=``/``?omit=`` are deferred, and select_related() joins and
+    prefetches whose relation no requested field reads are skipped. Requested
+    fields that follow a foreign key (``client_name``, ``?expand=client``) get
+    the join added, so they don't query per row.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.sparse_actions:
+            queryset = self.sparse_queryset(queryset)
+        return queryset
+
+    def sparse_queryset(self, queryset):
+        serializer = self.get_serializer()
+        kept = serializer.fields
+        dropped = getattr(serializer, 'dropped_fields', None)
+        if dropped is None:
+            return queryset
+        model = queryset.model
+
+        needed, joins = set(), set()
+        for name, field in kept.items():
+            roots = serializer.field_roots(name, field)
+            if roots is None:
+                continue
+            needed.update(roots)
+            parts = field.source.split('.')
+            # A nested serializer reads the related object itself, a dotted source its attribute
+            path = related_path(model, parts if isinstance(field, BaseSerializer) else parts[:-1])
+            if path:
+                joins.add(path)
+        unneeded = set()
+        for name, field in dropped.items():
+            unneeded.update(serializer.field_roots(name, field) or ())
+        unneeded -= needed
+
+        select_related = queryset.query.select_related
+        if isinstance(select_related, dict):
+            joins.update(path for path in self._related_paths(select_related) if path.split('__')[0] not in unneeded)
+        if select_related is not True and (joins or select_related):
+            queryset = queryset.select_related(None).select_related(*sorted(joins))
+
+        prefetches = queryset._prefetch_related_lookups
+        kept_prefetches = [
+            lookup for lookup in prefetches
+            if getattr(lookup, 'prefetch_through', lookup).split('__')[0] not in unneeded
+        ]
+        if len(kept_prefetches) != len(prefetches):
+            queryset = queryset.prefetch_related(None).prefetch_related(*kept_prefetches)
+
+        deferred = [field.name for field in model._meta.concrete_fields if field.name in unneeded and not field.primary_key]
+        return queryset.defer(*deferred) if deferred else queryset
+
+    @classmethod
+    def _related_paths(cls, tree, prefix=''):
+        """Flatten query.select_related ({'milestone': {'project': {}}}) into lookups."""
+        for name, subtree in tree.items():
+            path = f'{prefix}{name}'
+            yield path
+            yield from cls._related_paths(subtree, f'{path}__')
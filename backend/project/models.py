@@ -12,6 +12,60 @@ from django.core.validators import (
     URLValidator,
 )
 from django.db import models
+from django.db.models import Avg, Count, Q
+
+
+def written(name, update_fields):
+    """Whether a save with ``update_fields`` wrote the field with this name or attname."""
+    return update_fields is None or name in update_fields or name.removesuffix('_id') in update_fields
+
+
+class TrackedFieldsMixin:
+    """
+    Remember the stored values of ``tracked_fields`` (attnames) when an instance
+    is loaded or saved, so the rollup receivers in ``project.signals`` can tell
+    which fields actually changed.
+
+    ``rollup_fields`` are maintained in the database by ``project.rollups`` with
+    F() deltas. A plain ``save()`` of a loaded instance only writes them when
+    they were changed in memory, so a stale instance can't overwrite them.
+    """
+    tracked_fields = ()
+    rollup_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_tracked_values()
+        return instance
+
+    def remember_tracked_values(self, update_fields=None):
+        # Deferred fields are skipped rather than loaded
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **{
+                name: self.__dict__[name] for name in self.tracked_fields
+                if name in self.__dict__ and written(name, update_fields)
+            },
+        }
+
+    def loaded_value(self, name, default=None):
+        return getattr(self, '_loaded_values', {}).get(name, default)
+
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not self._state.adding and self.rollup_fields:
+            loaded = getattr(self, '_loaded_values', {})
+            unchanged = {
+                name for name in self.rollup_fields
+                if name in loaded and loaded[name] == getattr(self, name)
+            }
+            if unchanged:
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in unchanged
+                ]
+        super().save(*args, **kwargs)
+        self.remember_tracked_values(kwargs.get('update_fields'))
 
 
 class Client(models.Model):
@@ -37,7 +91,7 @@ class Client(models.Model):
         return self.name
 
 
-class Project(models.Model):
+class Project(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ("planning", "Planning"),
         ("active", "Active"),
@@ -73,17 +127,19 @@ class Project(models.Model):
     progress = models.PositiveIntegerField(
         default=0, validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
+    # Rollup counters maintained by project.rollups
+    milestone_count = models.PositiveIntegerField(default=0, editable=False)
+    milestone_progress_sum = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    tracked_fields = rollup_fields = ('progress', 'milestone_count', 'milestone_progress_sum')
+
     def clean(self):
         if self.start_date and self.end_date and self.start_date >= self.end_date:
             raise ValidationError('End date must be after start date.')
 
     def calculate_progress(self):
         """Calculate progress as average of milestone progress using database aggregation"""
-        from django.db.models import Avg
-
-        # Use database aggregation for better performance
         result = self.milestones.aggregate(avg_progress=Avg('progress'))
         return int(result['avg_progress'] or 0)
 
@@ -91,7 +147,7 @@ class Project(models.Model):
         return self.name
 
 
-class Milestone(models.Model):
+class Milestone(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ("planning", "Planning"),
         ("active", "Active"),
@@ -119,8 +175,14 @@ class Milestone(models.Model):
     project = models.ForeignKey(
         Project, on_delete=models.CASCADE, related_name="milestones", db_index=True
     )
+    # Rollup counters maintained by project.rollups
+    sprint_count = models.PositiveIntegerField(default=0, editable=False)
+    completed_sprint_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    rollup_fields = ('progress', 'sprint_count', 'completed_sprint_count')
+    tracked_fields = rollup_fields + ('project_id',)
+
     def clean(self):
         if self.planned_start and self.due_date and self.planned_start >= self.due_date:
             raise ValidationError('Due date must be after planned start date.')
@@ -132,8 +194,6 @@ class Milestone(models.Model):
 
     def calculate_progress(self):
         """Calculate progress based on completed sprints ratio using database aggregation"""
-        from django.db.models import Count, Q
-
         # Use single query with aggregation for better performance
         result = self.sprints.aggregate(
             total=Count('id'),
@@ -149,7 +209,7 @@ class Milestone(models.Model):
         return f"{self.name} ({self.project.name})"
 
 
-class Sprint(models.Model):
+class Sprint(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ("planned", "Planned"),
         ("active", "Active"),
@@ -171,6 +231,8 @@ class Sprint(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    tracked_fields = ('status', 'milestone_id')
+
     def clean(self):
         if self.start_date and self.end_date and self.start_date >= self.end_date:
             raise ValidationError('End date must be after start date.')
@@ -297,3 +359,37 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment {self.id or 'Unsaved'} for Invoice {self.invoice.id or 'Unsaved'}"
 
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only feed of writes to the synced models, read by ``/api/sync/``.
+
+    The primary key is the sync sequence: clients pass the last one they saw
+    as ``?since=`` and receive only what changed after it. Deletes are kept as
+    tombstones. Written by the dirty set in the same transaction as the write
+    (see ``project.sync``). On PostgreSQL ``txid`` is that transaction's id,
+    which decides when an entry is safe to hand out.
+    """
+    ACTION_CHOICES = [
+        ("created", "Created"),
+        ("updated", "Updated"),
+        ("deleted", "Deleted"),
+    ]
+    id = models.BigAutoField(primary_key=True)
+    tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE, related_name="change_log", db_index=False)
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    txid = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["tenant", "id"], name="changelog_tenant_seq_idx"),
+            models.Index(fields=["tenant", "txid", "id"], name="changelog_tenant_txid_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.action} {self.model} {self.object_id}"
@@ -0,0 +1,46 @@
+"""
+Notification side effects.
+
+Each helper returns a callback rather than sending anything itself; the
+callbacks are queued on the dirty set (``project.dirty``) and run once the
+transaction commits, so rolled-back changes never notify anyone.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+
+logger = logging.getLogger(__name__)
+
+
+def sprint_completed(sprint):
+    """Callback that mails the milestone assignee that ``sprint`` was completed."""
+    name = sprint.name
+    assignee = sprint.milestone.assignee
+    recipient = assignee.email if assignee else 'admin@example.com'
+
+    def notify():
+        # Send email notification (if email configured)
+        if hasattr(settings, 'EMAIL_HOST'):
+            send_mail(
+                'Sprint Completed',
+                f'Sprint "{name}" has been completed.',
+                settings.DEFAULT_FROM_EMAIL,
+                [recipient],
+                fail_silently=True,
+            )
+        else:
+            logger.info("Notification: Sprint '%s' completed.", name)  # Fallback for dev
+
+    return notify
+
+
+def milestone_due(milestone):
+    """Callback that reports ``milestone`` as due soon."""
+    name = milestone.name
+
+    def notify():
+        logger.info("Notification: Milestone '%s' is due soon.", name)  # Or send email
+
+    return notify
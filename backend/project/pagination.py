@@ -0,0 +1,333 @@
+"""
+Keyset (cursor) pagination for the API list endpoints.
+
+Pages are addressed by the position of the last row seen rather than by an
+offset, so fetching page N costs the same as fetching page 1 and rows
+inserted concurrently never shift or duplicate results. The default ordering
+is ``(-created_at, -id)``; ``id`` is always appended as a tie-breaker so the
+ordering is total and stable.
+"""
+
+import base64
+import datetime
+import decimal
+import json
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .search import SEARCH_RANK
+
+
+def _encode_value(value):
+    # isoformat keeps microseconds, which the keyset comparison needs to be exact
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite key, e.g. ``(created_at, id)``.
+
+    Query parameters:
+        cursor     opaque position returned in ``next``/``previous``
+        page_size  rows per page, capped at ``API_MAX_PAGE_SIZE``
+        count      ``true`` to include a total; large Postgres tables get a
+                   planner estimate instead of ``COUNT(*)``
+
+    The ordering comes from the view's OrderingFilter when ``?ordering=`` is
+    given, otherwise by relevance for full-text searches (``search_rank``),
+    otherwise from ``view.cursor_ordering``, otherwise ``(-created_at, -id)``
+    (or ``(-id,)`` for models without ``created_at``).
+    Ascending fields sort NULLs last and descending fields NULLs first on every
+    backend, so reversing the ordering (for ``previous`` pages) is exact.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    default_ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE') or 50
+        self.max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+        self.exact_count_threshold = getattr(settings, 'PAGINATION_EXACT_COUNT_THRESHOLD', 100000)
+
+    # Ordering
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        if request.query_params.get('ordering'):
+            for backend in getattr(view, 'filter_backends', []):
+                if hasattr(backend, 'get_ordering'):
+                    ordering = backend().get_ordering(request, queryset, view)
+                    break
+        if not ordering and SEARCH_RANK in queryset.query.annotations:
+            ordering = (f'-{SEARCH_RANK}', '-id')
+        if not ordering:
+            ordering = getattr(view, 'cursor_ordering', None)
+        if not ordering:
+            field_names = {field.name for field in queryset.model._meta.concrete_fields}
+            ordering = self.default_ordering if 'created_at' in field_names else ('-id',)
+
+        ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+        related = [field for field in ordering if '__' in field]
+        if related:
+            message = f'Keyset pagination does not support related-field orderings ({", ".join(related)}).'
+            if request.query_params.get('ordering'):
+                raise ValidationError({'ordering': message})
+            raise ImproperlyConfigured(f'{view.__class__.__name__}: {message}')
+        # Always end with the primary key so the ordering is total
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return tuple(ordering)
+
+    @staticmethod
+    def _order_expressions(ordering, reverse):
+        expressions = []
+        for field in ordering:
+            descending = field.startswith('-') != reverse
+            expression = F(field.lstrip('-'))
+            expressions.append(
+                expression.desc(nulls_first=True) if descending else expression.asc(nulls_last=True)
+            )
+        return expressions
+
+    @staticmethod
+    def _after(ordering, position, reverse):
+        """Q matching rows strictly after ``position`` in ``ordering`` (reversed if ``reverse``)."""
+        clauses = []
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            if value is None:
+                # NULLs sort last ascending / first descending
+                after = ~Q(**{f'{name}__isnull': True}) if descending else None
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+                if not descending:
+                    after |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            if after is not None:
+                clauses.append(equal & after)
+            equal &= same
+        return reduce(or_, clauses) if clauses else Q(pk__in=[])
+
+    def _load_fields(self, queryset, ordering):
+        """Undo any defer()/only() of the ordering columns, which every cursor reads."""
+        names = {field.lstrip('-') for field in ordering} - self.annotations - {'pk'}
+        deferred, is_defer = queryset.query.deferred_loading
+        if is_defer and names & deferred:
+            return queryset.defer(None).defer(*(deferred - names))
+        if not is_defer and deferred and names - deferred:
+            return queryset.only(*(deferred | names))
+        return queryset
+
+    # Cursor encoding
+
+    def decode_cursor(self, request):
+        """
+        ``(position, reverse)`` from the request's cursor, or ``(None, False)``.
+
+        The cursor names the ordering it was made for; one replayed with
+        another ``?ordering=``, or whose values don't fit the ordering fields,
+        is a 404 rather than a query error.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, ordering = data['p'], data['o']
+            if not isinstance(position, list) or ordering != list(self.ordering):
+                raise ValueError
+            return self._parse_position(position), bool(data.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _parse_position(self, position):
+        """The cursor's values as the ordering fields hold them; raises on any that don't fit."""
+        if len(position) != len(self.ordering):
+            raise ValueError('Cursor does not match the ordering')
+        values = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            if value is None:
+                values.append(None)
+            elif name in self.annotations:
+                # search_rank, the only annotation orderings use
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(f'Invalid {name}')
+                values.append(value)
+            else:
+                model_field = self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+                values.append(model_field.to_python(value))
+        return values
+
+    def encode_cursor(self, position, reverse):
+        data = {'o': list(self.ordering), 'p': [_encode_value(value) for value in position]}
+        if reverse:
+            data['r'] = True
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _position(self, obj):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if name == 'pk':
+                position.append(obj.pk)
+            elif name in self.annotations:
+                position.append(getattr(obj, name))
+            else:
+                position.append(getattr(obj, obj._meta.get_field(name).attname))
+        return position
+
+    # Pagination
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.annotations = set(queryset.query.annotations)
+        self.model = queryset.model
+        position, reverse = self.decode_cursor(request)
+        self.count = self.get_count(queryset) if self._wants_count(request) else None
+
+        page_queryset = self._load_fields(queryset, self.ordering).order_by(*self._order_expressions(self.ordering, reverse))
+        if position is not None:
+            page_queryset = page_queryset.filter(self._after(self.ordering, position, reverse))
+
+        rows = list(page_queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        self.page = rows
+
+        # Walking forwards there is a previous page whenever we started from a cursor;
+        # walking backwards there is always a next page (the one we came from).
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    # Counting
+
+    def _wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_count(self, queryset):
+        """
+        Exact COUNT(*) for small tables; the planner's row estimate for large Postgres tables.
+
+        Table size is read from ``pg_class.reltuples`` (maintained by ANALYZE), so
+        choosing the strategy never scans the table.
+        """
+        self.count_is_estimate = False
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return queryset.count()
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)', [table])
+            row = cursor.fetchone()
+        if not row or row[0] < self.exact_count_threshold:
+            return queryset.count()
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        self.count_is_estimate = True
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_estimate'] = self.count_is_estimate
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': 'Only present with ?count=true'},
+                'count_is_estimate': {'type': 'boolean', 'description': 'Only present with ?count=true'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str('The pagination cursor value.'),
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str(f'Number of results per page (max {self.max_page_size}).'),
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str('Include the total count (estimated for large tables).'),
+                'schema': {'type': 'boolean'},
+            },
+        ]
@@ -1,7 +1,81 @@
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import permissions
 
 from accounts.models import UserTenant
 
+from .cache import get_generations
+
+PERMISSIONS_GENERATION = 'permissions'
+
+
+def user_permissions_generation(user_id):
+    return f'permissions:user:{user_id}'
+
+
+class AccessSnapshot:
+    """
+    Tenant membership and Django permissions of one user, resolved once.
+
+    Permission classes read from the snapshot instead of querying UserTenant
+    and calling user.has_perm themselves.
+    """
+
+    def __init__(self, user, is_member=False, is_owner=False, perms=frozenset(), generations=()):
+        self.user = user
+        self.is_member = is_member  # Approved member of the request tenant
+        self.is_owner = is_owner  # Approved owner of the request tenant
+        self.perms = perms
+        self.generations = generations  # Permission generations the snapshot was built under
+
+    def has_perm(self, perm) -> bool:
+        # Mirrors ModelBackend: inactive users have no permissions, superusers have all
+        if not self.user.is_active:
+            return False
+        return self.user.is_superuser or perm in self.perms
+
+
+def _load_access_snapshot(user, tenant):
+    """Query membership and permissions, or fetch them from the shared cache."""
+    if user.pk is None:
+        return AccessSnapshot(user)
+
+    generations = get_generations(PERMISSIONS_GENERATION, user_permissions_generation(user.pk))
+    global_gen, user_gen = generations
+    tenant_id = tenant.pk if tenant is not None else 'none'
+    key = f'access:{user.pk}:{tenant_id}:{global_gen}:{user_gen}'
+    cached = cache.get(key)
+    if cached is not None:
+        is_member, is_owner, perms = cached
+        return AccessSnapshot(user, is_member, is_owner, perms, generations)
+
+    is_member = is_owner = False
+    if tenant is not None:
+        membership = UserTenant.objects.filter(
+            user=user, tenant=tenant, is_approved=True
+        ).values_list('is_owner', flat=True).first()
+        is_member = membership is not None
+        is_owner = bool(membership)
+    perms = frozenset(user.get_all_permissions())
+
+    cache.set(key, (is_member, is_owner, perms), getattr(settings, 'PERMISSION_SNAPSHOT_TTL', 300))
+    return AccessSnapshot(user, is_member, is_owner, perms, generations)
+
+
+def get_access_snapshot(request) -> AccessSnapshot:
+    """
+    Return the access snapshot for the request, computing it at most once.
+
+    The snapshot is memoized on the underlying HttpRequest so it is shared by
+    every permission class (and every DRF Request wrapper) for that request.
+    """
+    http_request = getattr(request, '_request', request)
+    snapshot = getattr(http_request, '_access_snapshot', None)
+    if snapshot is None or snapshot.user is not request.user:
+        snapshot = _load_access_snapshot(request.user, getattr(request, 'tenant', None))
+        http_request._access_snapshot = snapshot
+    return snapshot
+
 
 class HasTenantAccess(permissions.BasePermission):
     """
@@ -13,14 +87,14 @@ class HasTenantAccess(permissions.BasePermission):
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
         # User must be associated with the tenant
-        return bool(UserTenant.objects.filter(user=request.user, tenant=request.tenant, is_approved=True).exists())
+        return get_access_snapshot(request).is_member
 
     def has_object_permission(self, request, view, obj) -> bool:
         # Allow in dev mode
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        # Object must belong to current tenant
-        return bool(hasattr(obj, 'tenant') and obj.tenant == request.tenant)
+        # Object must belong to current tenant; compare ids so the tenant row isn't loaded
+        return getattr(obj, 'tenant_id', None) == request.tenant.pk
 
 
 class HasDjangoPermission(permissions.BasePermission):
@@ -39,7 +113,7 @@ class HasDjangoPermission(permissions.BasePermission):
         action = self._get_action_from_view(view)
         required_perm = self.permission_map.get(action)
         if required_perm:
-            return bool(request.user.has_perm(required_perm))
+            return bool(get_access_snapshot(request).has_perm(required_perm))
         return False
 
     def has_object_permission(self, request, view, obj) -> bool:
@@ -54,7 +128,7 @@ class HasDjangoPermission(permissions.BasePermission):
         else:
             required_perm = self.permission_map.get(action)
         if required_perm:
-            return bool(request.user.has_perm(required_perm))
+            return bool(get_access_snapshot(request).has_perm(required_perm))
         return False
 
     def _get_action_from_view(self, view):
@@ -79,25 +153,15 @@ class IsTenantOwner(permissions.BasePermission):
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
         # Must be approved tenant owner
-        return bool(UserTenant.objects.filter(
-            user=request.user,
-            tenant=request.tenant,
-            is_owner=True,
-            is_approved=True
-        ).exists())
+        return get_access_snapshot(request).is_owner
 
     def has_object_permission(self, request, view, obj) -> bool:
         # Allow in dev mode
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
         # Object must belong to tenant and user must be owner
-        return bool(hasattr(obj, 'tenant') and obj.tenant == request.tenant and
-                UserTenant.objects.filter(
-                    user=request.user,
-                    tenant=request.tenant,
-                    is_owner=True,
-                    is_approved=True
-                ).exists())
+        return bool(getattr(obj, 'tenant_id', None) == request.tenant.pk and
+                get_access_snapshot(request).is_owner)
 
 
 class IsTenantCreator(permissions.BasePermission):
@@ -132,12 +196,7 @@ class IsTenantCreator(permissions.BasePermission):
     def _user_belongs_to_tenant(self, request):
         """Check if user belongs to any tenant (for viewing)"""
         if hasattr(request, 'tenant') and request.tenant:
-            from accounts.models import UserTenant
-            return UserTenant.objects.filter(
-                user=request.user,
-                tenant=request.tenant,
-                is_approved=True
-            ).exists()
+            return get_access_snapshot(request).is_member
         return True  # Dev mode
 
     def _user_is_tenant_owner(self, request, tenant):
@@ -164,8 +223,7 @@ class CanManageClients(permissions.BasePermission):
     def has_permission(self, request, view) -> bool:
         # Check tenant access if tenant context exists
         if hasattr(request, 'tenant') and request.tenant is not None:
-            from accounts.models import UserTenant
-            if not UserTenant.objects.filter(user=request.user, tenant=request.tenant, is_approved=True).exists():
+            if not get_access_snapshot(request).is_member:
                 return False
 
         # Check Django permission
@@ -177,14 +235,14 @@ class CanManageClients(permissions.BasePermission):
             'delete': 'project.delete_client',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def has_object_permission(self, request, view, obj) -> bool:
         # Allow in dev mode
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
         # Check tenant
-        if hasattr(obj, 'tenant') and obj.tenant != request.tenant:
+        if hasattr(obj, 'tenant_id') and obj.tenant_id != request.tenant.pk:
             return False
         # Check permission
         action = self._get_action_from_view(view)
@@ -195,7 +253,7 @@ class CanManageClients(permissions.BasePermission):
             'delete': 'project.delete_client',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def _get_action_from_view(self, view):
         action_map = {
@@ -216,8 +274,7 @@ class CanManageProjects(permissions.BasePermission):
     def has_permission(self, request, view) -> bool:
         # Check tenant access if tenant context exists
         if hasattr(request, 'tenant') and request.tenant is not None:
-            from accounts.models import UserTenant
-            if not UserTenant.objects.filter(user=request.user, tenant=request.tenant, is_approved=True).exists():
+            if not get_access_snapshot(request).is_member:
                 return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -227,12 +284,12 @@ class CanManageProjects(permissions.BasePermission):
             'delete': 'project.delete_project',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def has_object_permission(self, request, view, obj) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        if hasattr(obj, 'tenant') and obj.tenant != request.tenant:
+        if hasattr(obj, 'tenant_id') and obj.tenant_id != request.tenant.pk:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -242,7 +299,7 @@ class CanManageProjects(permissions.BasePermission):
             'delete': 'project.delete_project',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def _get_action_from_view(self, view):
         action_map = {
@@ -263,8 +320,7 @@ class CanManageTasks(permissions.BasePermission):
     def has_permission(self, request, view) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        from accounts.models import UserTenant
-        if not UserTenant.objects.filter(user=request.user, tenant=request.tenant, is_approved=True).exists():
+        if not get_access_snapshot(request).is_member:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -274,12 +330,12 @@ class CanManageTasks(permissions.BasePermission):
             'delete': 'project.delete_task',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def has_object_permission(self, request, view, obj) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        if hasattr(obj, 'tenant') and obj.tenant != request.tenant:
+        if hasattr(obj, 'tenant_id') and obj.tenant_id != request.tenant.pk:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -289,7 +345,7 @@ class CanManageTasks(permissions.BasePermission):
             'delete': 'project.delete_task',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def _get_action_from_view(self, view):
         action_map = {
@@ -310,8 +366,7 @@ class CanManageInvoices(permissions.BasePermission):
     def has_permission(self, request, view) -> bool:
         # Check tenant access if tenant context exists
         if hasattr(request, 'tenant') and request.tenant is not None:
-            from accounts.models import UserTenant
-            if not UserTenant.objects.filter(user=request.user, tenant=request.tenant, is_approved=True).exists():
+            if not get_access_snapshot(request).is_member:
                 return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -321,12 +376,12 @@ class CanManageInvoices(permissions.BasePermission):
             'delete': 'project.delete_invoice',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def has_object_permission(self, request, view, obj) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        if hasattr(obj, 'tenant') and obj.tenant != request.tenant:
+        if hasattr(obj, 'tenant_id') and obj.tenant_id != request.tenant.pk:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -336,7 +391,7 @@ class CanManageInvoices(permissions.BasePermission):
             'delete': 'project.delete_invoice',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def _get_action_from_view(self, view):
         action_map = {
@@ -357,8 +412,7 @@ class CanManagePayments(permissions.BasePermission):
     def has_permission(self, request, view) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        from accounts.models import UserTenant
-        if not UserTenant.objects.filter(user=request.user, tenant=request.tenant, is_approved=True).exists():
+        if not get_access_snapshot(request).is_member:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -368,12 +422,12 @@ class CanManagePayments(permissions.BasePermission):
             'delete': 'project.delete_payment',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def has_object_permission(self, request, view, obj) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        if hasattr(obj, 'tenant') and obj.tenant != request.tenant:
+        if hasattr(obj, 'tenant_id') and obj.tenant_id != request.tenant.pk:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -383,7 +437,7 @@ class CanManagePayments(permissions.BasePermission):
             'delete': 'project.delete_payment',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def _get_action_from_view(self, view):
         action_map = {
@@ -404,8 +458,7 @@ class CanManageMilestones(permissions.BasePermission):
     def has_permission(self, request, view) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        from accounts.models import UserTenant
-        if not UserTenant.objects.filter(user=request.user, tenant=request.tenant, is_approved=True).exists():
+        if not get_access_snapshot(request).is_member:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -415,12 +468,12 @@ class CanManageMilestones(permissions.BasePermission):
             'delete': 'project.delete_milestone',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def has_object_permission(self, request, view, obj) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        if hasattr(obj, 'tenant') and obj.tenant != request.tenant:
+        if hasattr(obj, 'tenant_id') and obj.tenant_id != request.tenant.pk:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -430,7 +483,7 @@ class CanManageMilestones(permissions.BasePermission):
             'delete': 'project.delete_milestone',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def _get_action_from_view(self, view):
         action_map = {
@@ -451,8 +504,7 @@ class CanManageSprints(permissions.BasePermission):
     def has_permission(self, request, view) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        from accounts.models import UserTenant
-        if not UserTenant.objects.filter(user=request.user, tenant=request.tenant, is_approved=True).exists():
+        if not get_access_snapshot(request).is_member:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -462,12 +514,12 @@ class CanManageSprints(permissions.BasePermission):
             'delete': 'project.delete_sprint',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def has_object_permission(self, request, view, obj) -> bool:
         if not hasattr(request, 'tenant') or request.tenant is None:
             return True
-        if hasattr(obj, 'tenant') and obj.tenant != request.tenant:
+        if hasattr(obj, 'tenant_id') and obj.tenant_id != request.tenant.pk:
             return False
         action = self._get_action_from_view(view)
         perm_map = {
@@ -477,7 +529,7 @@ class CanManageSprints(permissions.BasePermission):
             'delete': 'project.delete_sprint',
         }
         required_perm = perm_map.get(action)
-        return bool(required_perm and request.user.has_perm(required_perm))
+        return bool(required_perm and get_access_snapshot(request).has_perm(required_perm))
 
     def _get_action_from_view(self, view):
         action_map = {
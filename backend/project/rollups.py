@@ -0,0 +1,323 @@
+"""
+Incremental progress rollups.
+
+Milestone progress is the share of its sprints that are completed; project
+progress is the mean progress of its milestones. Instead of recounting every
+sibling on each save, milestones keep ``sprint_count``/``completed_sprint_count``
+and projects keep ``milestone_count``/``milestone_progress_sum``. Saves and
+deletes apply deltas to those counters (F() expressions on projects, values
+computed under a row lock on milestones), and only when a relevant field
+actually changed, so the cost of a save no longer grows with the number of
+siblings.
+
+The receivers in ``project.signals`` call into this module. The deltas are
+applied in the transaction of the save, API requests included
+(``ATOMIC_REQUESTS``), so they commit or roll back with it. Writes that don't
+go through ``save()`` (the sprint status transitions tasks trigger, the bulk
+actions' ``QuerySet.update()``) mark their parents in the dirty set
+(``project.dirty``) instead, to be recounted once on commit. ``reconcile_*``
+recompute the counters from scratch with grouped aggregates; they back that
+flush, the ``refresh_project_progress`` action and the
+``verify_progress_rollups``/``recompute_progress`` commands that repair drift
+(e.g. after raw SQL).
+"""
+
+import logging
+from contextlib import nullcontext
+
+from django.db import models, router, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from saasCRM.db_routers import using_shard
+
+from .cache import invalidate_cached_lists
+from .dirty import get_dirty_set
+from .models import Milestone, Project, Sprint, written
+
+logger = logging.getLogger(__name__)
+
+
+def milestone_percentage(completed, total):
+    return completed * 100 // total if total else 0
+
+
+def project_percentage(progress_sum, count):
+    return progress_sum // count if count else 0
+
+
+# Incremental updates
+
+def apply_milestone_delta(project_id, count=0, progress=0):
+    """Shift a project's milestone counters and recompute its progress, in one UPDATE."""
+    if project_id is None or not (count or progress):
+        return
+    # Clamped at zero so counters that already drifted can't violate the unsigned check
+    progress_sum = Greatest(F('milestone_progress_sum') + progress, Value(0))
+    Project.objects.filter(pk=project_id).update(
+        milestone_count=Greatest(F('milestone_count') + count, Value(0)),
+        milestone_progress_sum=progress_sum,
+        # Right-hand F() values are the pre-update ones, so apply the deltas here too
+        progress=Case(
+            When(milestone_count__lte=-count, then=Value(0)),
+            default=progress_sum / (F('milestone_count') + count),
+        ),
+    )
+
+
+def apply_sprint_delta(milestone_id, total=0, completed=0):
+    """
+    Shift a milestone's sprint counters and roll its progress change up to the project.
+
+    Returns the milestone's new ``(sprint_count, completed_sprint_count, progress)``,
+    or None if it doesn't exist.
+    """
+    if milestone_id is None or not (total or completed):
+        return None
+    using = router.db_for_write(Milestone)
+    with transaction.atomic(using=using):
+        # The row lock serializes concurrent sprint saves under the same milestone,
+        # so the progress delta pushed to the project is exact
+        row = (
+            Milestone.objects.select_for_update()
+            .filter(pk=milestone_id)
+            .values_list('sprint_count', 'completed_sprint_count', 'progress', 'project_id', 'tenant_id')
+            .first()
+        )
+        if row is None:
+            return None
+        sprint_count, completed_count, old_progress, project_id, tenant_id = row
+        sprint_count = max(sprint_count + total, 0)
+        completed_count = min(max(completed_count + completed, 0), sprint_count)
+        progress = milestone_percentage(completed_count, sprint_count)
+        Milestone.objects.filter(pk=milestone_id).update(
+            sprint_count=sprint_count,
+            completed_sprint_count=completed_count,
+            progress=progress,
+        )
+        apply_milestone_delta(project_id, progress=progress - old_progress)
+        dirty = get_dirty_set(using)
+        dirty.log_changes(Milestone, 'updated', (tenant_id, milestone_id, project_id))
+        if progress != old_progress:
+            dirty.log_changes(Project, 'updated', (tenant_id, project_id))
+    return sprint_count, completed_count, progress
+
+
+def capture_stored_values(instance):
+    """
+    Before a save, re-read the stored value of every tracked field that differs
+    in memory (or was never loaded), so post_save computes deltas against the
+    database rather than against a possibly stale instance.
+    """
+    if instance._state.adding:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    changed = [
+        name for name in instance.tracked_fields
+        if name not in loaded or loaded[name] != getattr(instance, name)
+    ]
+    if changed:
+        stored = type(instance)._base_manager.filter(pk=instance.pk).values(*changed).first()
+        instance._loaded_values = {**loaded, **(stored or {})}
+
+
+def _is_completed(status):
+    return int(status == 'completed')
+
+
+def field_change(instance, name, update_fields=None):
+    """The stored ``(before, after)`` values of a tracked field across a save."""
+    before = instance.loaded_value(name, getattr(instance, name))
+    # Fields left out of update_fields weren't written, so they didn't change
+    return (before, getattr(instance, name)) if written(name, update_fields) else (before, before)
+
+
+def _sprint_moves(sprint, created, update_fields):
+    """(milestone_id, sprint delta, completed delta) for each milestone a sprint save affects."""
+    if created:
+        return [(sprint.milestone_id, 1, _is_completed(sprint.status))]
+    old_milestone_id, milestone_id = field_change(sprint, 'milestone_id', update_fields)
+    old_status, status = field_change(sprint, 'status', update_fields)
+    if old_milestone_id != milestone_id:
+        return [
+            (old_milestone_id, -1, -_is_completed(old_status)),
+            (milestone_id, 1, _is_completed(status)),
+        ]
+    return [(milestone_id, 0, _is_completed(status) - _is_completed(old_status))]
+
+
+def _milestone_moves(milestone, created, update_fields):
+    """(project_id, milestone delta, progress delta) for each project a milestone save affects."""
+    if created:
+        return [(milestone.project_id, 1, milestone.progress)]
+    old_project_id, project_id = field_change(milestone, 'project_id', update_fields)
+    old_progress, progress = field_change(milestone, 'progress', update_fields)
+    if old_project_id != project_id:
+        return [(old_project_id, -1, -old_progress), (project_id, 1, progress)]
+    return [(project_id, 0, progress - old_progress)]
+
+
+def _apply_sprint_moves(moves, sprint):
+    moves = [move for move in moves if move[1] or move[2]]
+    for milestone_id, total, completed in moves:
+        result = apply_sprint_delta(milestone_id, total, completed)
+        milestone = sprint._state.fields_cache.get('milestone')
+        if result and milestone is not None and milestone.pk == milestone_id:
+            # Keep the cached parent in step so a later milestone.save() doesn't look stale
+            milestone.sprint_count, milestone.completed_sprint_count, milestone.progress = result
+            milestone.remember_tracked_values()
+
+
+def _apply_milestone_moves(moves, milestone):
+    moves = [move for move in moves if move[1] or move[2]]
+    for project_id, count, progress in moves:
+        apply_milestone_delta(project_id, count, progress)
+    get_dirty_set(milestone._state.db).log_changes(Project, 'updated', *[(milestone.tenant_id, project_id) for project_id, _, _ in moves])
+
+
+def sprint_saved(sprint, created, update_fields=None):
+    _apply_sprint_moves(_sprint_moves(sprint, created, update_fields), sprint)
+
+
+def sprint_deleted(sprint):
+    status = sprint.loaded_value('status', sprint.status)
+    milestone_id = sprint.loaded_value('milestone_id', sprint.milestone_id)
+    _apply_sprint_moves([(milestone_id, -1, -_is_completed(status))], sprint)
+
+
+def milestone_saved(milestone, created, update_fields=None):
+    _apply_milestone_moves(_milestone_moves(milestone, created, update_fields), milestone)
+
+
+def milestone_deleted(milestone):
+    project_id = milestone.loaded_value('project_id', milestone.project_id)
+    progress = milestone.loaded_value('progress', milestone.progress)
+    _apply_milestone_moves([(project_id, -1, -progress)], milestone)
+
+
+def sync_sprint_statuses(sprint_ids):
+    """
+    Apply the automatic sprint transitions for ``sprint_ids`` from one grouped
+    task aggregate: planned sprints with a task in progress become active, and
+    active sprints whose tasks are all done become completed. The changed
+    sprints are written with one bulk_update and returned; their milestones
+    are left for the caller to recompute.
+    """
+    sprints = (
+        Sprint.objects.filter(pk__in=sprint_ids, status__in=['planned', 'active'])
+        .select_related('milestone__assignee')
+        .annotate(
+            tasks_total=Count('tasks'),
+            tasks_in_progress=Count('tasks', filter=Q(tasks__status='in_progress')),
+            tasks_done=Count('tasks', filter=Q(tasks__status='done')),
+        )
+    )
+    changed = []
+    for sprint in sprints:
+        if sprint.status == 'planned' and sprint.tasks_in_progress:
+            sprint.status = 'active'
+            logger.info("Auto-activated sprint '%s'", sprint.name)
+        elif sprint.status == 'active' and sprint.tasks_total and sprint.tasks_done == sprint.tasks_total:
+            sprint.status = 'completed'
+            logger.info("Auto-completed sprint '%s' - all %d tasks done", sprint.name, sprint.tasks_total)
+        else:
+            continue
+        changed.append(sprint)
+    if changed:
+        Sprint.objects.bulk_update(changed, ['status'])
+    return changed
+
+
+def is_cascade(instance, origin):
+    """
+    True when ``instance`` is deleted because another model's row is (its
+    milestone, project, client or tenant), in which case the parent whose
+    counters would be adjusted is being deleted too.
+    """
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return not issubclass(model, type(instance))
+
+
+# Reconciliation
+
+def reconcile_milestones(milestones, fix=False):
+    """
+    Recompute sprint counters and progress for ``milestones`` with one grouped
+    aggregate. Returns the drifted milestones (with corrected values); with
+    ``fix`` they're written back in one bulk_update.
+    """
+    milestones = list(milestones.only('id', 'tenant_id', 'project_id', 'sprint_count', 'completed_sprint_count', 'progress'))
+    counts = {
+        row['milestone']: row
+        for row in Sprint.objects.filter(milestone__in=[m.pk for m in milestones])
+        .order_by()
+        .values('milestone')
+        .annotate(total=Count('id'), completed=Count('id', filter=Q(status='completed')))
+    }
+    drifted = []
+    for milestone in milestones:
+        row = counts.get(milestone.pk, {'total': 0, 'completed': 0})
+        expected = (row['total'], row['completed'], milestone_percentage(row['completed'], row['total']))
+        if (milestone.sprint_count, milestone.completed_sprint_count, milestone.progress) != expected:
+            milestone.sprint_count, milestone.completed_sprint_count, milestone.progress = expected
+            drifted.append(milestone)
+    if fix and drifted:
+        Milestone.objects.bulk_update(drifted, ['sprint_count', 'completed_sprint_count', 'progress'])
+        invalidate_cached_lists(Milestone, *[m.tenant_id for m in drifted])
+    return drifted
+
+
+def reconcile_projects(projects, fix=False):
+    """Like reconcile_milestones, for project milestone counters and progress."""
+    projects = list(projects.only('id', 'tenant_id', 'milestone_count', 'milestone_progress_sum', 'progress'))
+    sums = {
+        row['project']: row
+        for row in Milestone.objects.filter(project__in=[p.pk for p in projects])
+        .order_by()
+        .values('project')
+        .annotate(count=Count('id'), progress_sum=Sum('progress'))
+    }
+    drifted = []
+    for project in projects:
+        row = sums.get(project.pk, {'count': 0, 'progress_sum': 0})
+        expected = (row['count'], row['progress_sum'], project_percentage(row['progress_sum'], row['count']))
+        if (project.milestone_count, project.milestone_progress_sum, project.progress) != expected:
+            project.milestone_count, project.milestone_progress_sum, project.progress = expected
+            drifted.append(project)
+    if fix and drifted:
+        Project.objects.bulk_update(drifted, ['milestone_count', 'milestone_progress_sum', 'progress'])
+        invalidate_cached_lists(Project, *[p.tenant_id for p in drifted])
+    return drifted
+
+
+def pk_chunks(queryset, size):
+    """Primary keys of ``queryset`` in ascending chunks, walked by keyset so each query stays cheap."""
+    last = None
+    while True:
+        page = queryset.order_by('pk')
+        if last is not None:
+            page = page.filter(pk__gt=last)
+        chunk = list(page.values_list('pk', flat=True)[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+RECONCILERS = {
+    'milestone': (Milestone, reconcile_milestones),
+    'project': (Project, reconcile_projects),
+}
+
+
+def recompute_chunk(model_name, pks, shard=None):
+    """
+    Recompute and write back progress for one chunk of milestones or projects,
+    on ``shard`` (default: wherever project data is routed now). Returns
+    ``(checked, changed)``. Module level so a process pool can run it.
+    """
+    model, reconcile = RECONCILERS[model_name]
+    with using_shard(shard) if shard is not None else nullcontext():
+        return len(pks), len(reconcile(model.objects.filter(pk__in=pks), fix=True))
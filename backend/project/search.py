@@ -0,0 +1,118 @@
+"""
+Postgres full-text search for the API list endpoints.
+
+FullTextSearchFilter is a drop-in replacement for DRF's SearchFilter. On
+Postgres, ``?search=`` on a registered model is matched against a weighted
+``tsvector`` expression (served by the GIN expression indexes created in
+migration 0005) and results are ranked with ``ts_rank``. Very short
+single-word queries, typed while the user is still on the first keystrokes,
+go through a prefix match on the model's title column instead, served by a
+``pg_trgm`` GIN index. Unregistered models and other databases (the SQLite
+test runs) keep the plain SearchFilter ``icontains`` behaviour.
+
+The expressions below must stay identical to the ones indexed in
+``project/migrations/0005_search_indexes.py`` or Postgres can't use the indexes.
+"""
+
+import re
+from functools import reduce
+from operator import add, or_
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from rest_framework.filters import SearchFilter
+
+SEARCH_CONFIG = 'english'
+
+# Name of the rank annotation; KeysetPagination orders by it when present
+SEARCH_RANK = 'search_rank'
+
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+class SearchDocument:
+    """
+    The searchable text of a model.
+
+    ``weights`` maps field names to tsvector weights (A-D), ``trigram`` lists the
+    fields with a trigram index for short prefix queries, and ``through`` names a
+    foreign key whose document is searched instead (e.g. invoices by client name).
+    """
+
+    def __init__(self, weights, trigram=(), through=None):
+        self.weights = weights
+        self.trigram = tuple(trigram)
+        self.through = through
+
+    def _path(self, field):
+        return f'{self.through}__{field}' if self.through else field
+
+    def vector(self):
+        return reduce(add, [
+            SearchVector(self._path(field), config=SEARCH_CONFIG, weight=weight)
+            for field, weight in self.weights.items()
+        ])
+
+    def prefix_filter(self, term):
+        return reduce(or_, [Q(**{f'{self._path(field)}__istartswith': term}) for field in self.trigram])
+
+    def similarity(self, term):
+        similarities = [TrigramSimilarity(self._path(field), term) for field in self.trigram]
+        return similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+
+
+_client_document = {'name': 'A', 'email': 'B'}
+
+SEARCH_DOCUMENTS = {
+    'project.Client': SearchDocument(_client_document, trigram=('name',)),
+    'project.Project': SearchDocument({'name': 'A', 'description': 'B'}, trigram=('name',)),
+    'project.Milestone': SearchDocument({'name': 'A', 'description': 'B'}, trigram=('name',)),
+    'project.Task': SearchDocument({'title': 'A', 'description': 'B'}, trigram=('title',)),
+    'project.Invoice': SearchDocument(_client_document, trigram=('name',), through='client'),
+}
+
+
+def search_tokens(text):
+    """Split free text into the word tokens used to build a tsquery."""
+    return [token.lower() for token in _TOKEN_RE.findall(text or '')]
+
+
+def fulltext_search(queryset, text, document=None):
+    """
+    Filter ``queryset`` to rows matching ``text`` and annotate ``search_rank``.
+
+    Every token must match; the last one matches as a prefix so results update
+    as the user types. Postgres only.
+    """
+    document = document or SEARCH_DOCUMENTS[queryset.model._meta.label]
+    tokens = search_tokens(text)
+    if not tokens:
+        return queryset
+
+    max_trigram_length = getattr(settings, 'SEARCH_TRIGRAM_MAX_LENGTH', 3)
+    if len(tokens) == 1 and len(tokens[0]) <= max_trigram_length and document.trigram:
+        return queryset.filter(document.prefix_filter(tokens[0])).annotate(
+            **{SEARCH_RANK: document.similarity(tokens[0])}
+        )
+
+    # Tokens are letters and digits only, so they're safe to splice into a raw tsquery
+    raw = ' & '.join(tokens[:-1] + [f'{tokens[-1]}:*'])
+    query = SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+    vector = document.vector()
+    return queryset.alias(search_document=vector).filter(search_document=query).annotate(
+        **{SEARCH_RANK: SearchRank(vector, query)}
+    )
+
+
+class FullTextSearchFilter(SearchFilter):
+    """SearchFilter that uses the indexed full-text search on Postgres."""
+
+    def filter_queryset(self, request, queryset, view):
+        document = SEARCH_DOCUMENTS.get(queryset.model._meta.label)
+        terms = self.get_search_terms(request)
+        if not terms or document is None or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+        return fulltext_search(queryset, ' '.join(terms), document)
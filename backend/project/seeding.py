@@ -0,0 +1,280 @@
+"""
+Bulk seeding of tenant data at benchmark scale, built on ``project.factories``.
+
+The factories only build the rows (``Factory.build``: field values, no
+queries); they're written with ``bulk_create`` in batches. That skips
+``save()`` and its signals, so the stored progress counters are recomputed
+afterwards with the same set-based reconciliation ``recompute_progress`` runs.
+
+Rows go to the tenant's shard (``seed_tenant`` routes by the shard map).
+Members are bulk created, which the shared row mirroring in
+``project.signals`` doesn't see, so the seeder copies them to the shard itself.
+
+Projects are seeded a chunk at a time together with their milestones, sprints,
+tasks, invoices and payments, so memory stays flat however many rows a tenant
+gets. Nothing goes through ``save()``, so no post_save receiver (rollups,
+change log, cache invalidation) runs per row.
+
+With ``fast``, the high-volume levels (milestones, sprints and tasks) skip
+the factories too. They're built as plain model instances, with the same
+field rules and their text drawn from a pool of Faker sentences made up
+front. Running each factory declaration once per row is most of the cost at
+millions of tasks.
+"""
+
+import random
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import cycle, islice
+
+import factory.random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.db import router
+
+from accounts.models import CustomUser, Tenant, UserTenant
+from saasCRM.db_routers import shard_for, using_shard
+
+from .cache import invalidate_cached_lists
+from .factories import (
+    ClientFactory,
+    InvoiceFactory,
+    MilestoneFactory,
+    PaymentFactory,
+    ProjectFactory,
+    SprintFactory,
+    TaskFactory,
+    TenantFactory,
+    fake,
+)
+from .models import Client, Invoice, Milestone, Payment, Project, Sprint, Task
+from .rollups import pk_chunks, recompute_chunk
+from .sharding import home_shard, replicate_shared_rows
+
+SEEDED_MODELS = (Client, Project, Milestone, Sprint, Task, Invoice, Payment)
+TASK_STATUSES = [choice for choice, _ in Task.STATUS_CHOICES]
+
+
+@dataclass
+class Scale:
+    """Rows per tenant."""
+
+    clients: int = 50
+    projects: int = 200
+    milestones_per_project: int = 3
+    sprints_per_milestone: int = 2
+    tasks: int = 5000
+    members: int = 10
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def share(total, start, end, count):
+    """Rows of ``total`` spread evenly over ``count`` slots that fall to slots ``start:end``."""
+    return total * end // count - total * start // count
+
+
+def create_tenant(domain, password, name=None):
+    """
+    A tenant with an approved owner in a group holding every project
+    permission: the account to log in as, or benchmark requests run as.
+    Returns ``(tenant, owner)``.
+    """
+    tenant = TenantFactory(domain=domain, name=name or domain)
+    group, _ = Group.objects.get_or_create(name='Seeded Tenant Owners')
+    group.permissions.set(Permission.objects.filter(content_type__app_label='project'))
+    owner = CustomUser.objects.create_user(email=f'owner@{domain}.example.com', password=password)
+    owner.groups.add(group)
+    UserTenant.objects.create(user=owner, tenant=tenant, is_owner=True, is_approved=True, role='Tenant Owner')
+    return tenant, owner
+
+
+class TextPool:
+    """Faker text made once and drawn from per row, as the factories would make it."""
+
+    def __init__(self, size=1000):
+        self.names = [fake.sentence(nb_words=2)[:255] for _ in range(size)]
+        self.titles = [fake.sentence(nb_words=4)[:255] for _ in range(size)]
+        self.descriptions = [fake.text(max_nb_chars=200) for _ in range(size)]
+
+    def pick(self, texts):
+        return random.choice(texts)
+
+
+class TenantSeeder:
+    """Fill one tenant with ``scale`` rows; ``progress`` (a callable) gets a line per chunk."""
+
+    def __init__(self, tenant, scale, batch_size=2000, progress=None, fast=False):
+        self.tenant = tenant
+        self.scale = scale
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.texts = TextPool() if fast else None
+        # One hash for every member: hashing per user would dominate small seeds
+        self.password = make_password('password123')
+        self.milestone_statuses = cycle(['planning', 'active', 'completed'])
+        self.sprint_statuses = cycle(['planned', 'active', 'completed'])
+
+    def run(self):
+        started = time.perf_counter()
+        self.members = self.seed_members()
+        # Client emails are unique across tenants; Faker's repeat at this scale
+        self.clients = self.create(Client, [
+            ClientFactory.build(tenant=self.tenant, email=f'client{index}@{self.tenant.domain}.example.com')
+            for index in range(self.scale.clients)
+        ])
+        projects = self.scale.projects
+        chunk = max(1, self.batch_size // max(1, self.scale.milestones_per_project * self.scale.sprints_per_milestone))
+        for start in range(0, projects, chunk):
+            end = min(projects, start + chunk)
+            self.seed_projects(start, end)
+            self.progress(f'{self.tenant.domain}: {end}/{projects} projects')
+        self.recompute_progress()
+        for model in SEEDED_MODELS:
+            invalidate_cached_lists(model, self.tenant.pk)
+        return time.perf_counter() - started
+
+    def create(self, model, objs):
+        return model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def seed_members(self):
+        # Built directly: UserFactory hashes a password per user on build
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                email=f'member{index}@{self.tenant.domain}.example.com', username=f'member{index}@{self.tenant.domain}.example.com',
+                first_name=fake.first_name(), last_name=fake.last_name(), password=self.password,
+            )
+            for index in range(self.scale.members)
+        ], batch_size=self.batch_size)
+        UserTenant.objects.bulk_create(
+            [UserTenant(user=user, tenant=self.tenant, is_approved=True, role='Employee') for user in users],
+            batch_size=self.batch_size,
+        )
+        shard = router.db_for_write(Project)
+        if users and shard != home_shard():
+            replicate_shared_rows(shard, [CustomUser], [user.pk for user in users], batch_size=self.batch_size)
+        return users
+
+    def seed_projects(self, start, end):
+        """Projects ``start:end`` of the tenant with everything below them."""
+        scale, tenant = self.scale, self.tenant
+        members = cycle(self.members or [None])
+        clients = self.clients
+        projects = self.create(Project, [
+            ProjectFactory.build(client=clients[index % len(clients)], tenant=tenant) for index in range(start, end)
+        ])
+        if self.members:
+            through = Project.team_members.through
+            self.create(through, [
+                through(project_id=project.pk, customuser_id=next(members).pk)
+                for project in projects for _ in range(min(3, len(self.members)))
+            ])
+
+        milestones = self.create(Milestone, [
+            self.build_milestone(project, next(members))
+            for project in projects for _ in range(scale.milestones_per_project)
+        ])
+        sprints = self.create(Sprint, [
+            self.build_sprint(milestone) for milestone in milestones for _ in range(scale.sprints_per_milestone)
+        ])
+        sprints_of = {}
+        for sprint in sprints:
+            sprints_of.setdefault(sprint.milestone_id, []).append(sprint)
+
+        # This chunk's share of the tenant's tasks, dealt round robin over its
+        # milestones; most land in one of the milestone's sprints
+        tasks = share(scale.tasks, start, end, scale.projects)
+        statuses = cycle(TASK_STATUSES)
+
+        def build_tasks():
+            for index in range(tasks):
+                milestone = milestones[index % len(milestones)]
+                candidates = sprints_of.get(milestone.pk)
+                sprint = candidates[index % len(candidates)] if candidates and index % 5 else None
+                yield self.build_task(milestone, sprint, next(members), next(statuses))
+
+        if milestones:
+            for batch in batched(build_tasks(), self.batch_size):
+                self.create(Task, batch)
+
+        invoices = self.create(Invoice, [
+            InvoiceFactory.build(client=project.client, project=project, tenant=tenant) for project in projects
+        ])
+        self.create(Payment, [
+            PaymentFactory.build(invoice=invoice, tenant=tenant) for invoice in invoices if invoice.paid
+        ])
+
+    def build_milestone(self, project, assignee):
+        if self.texts is None:
+            return MilestoneFactory.build(project=project, tenant=self.tenant, assignee=assignee, progress=0)
+        planned_start = project.start_date + timedelta(days=1) if project.start_date else None
+        return Milestone(
+            project=project, tenant=self.tenant, assignee=assignee, status=next(self.milestone_statuses),
+            name=self.texts.pick(self.texts.names), description=self.texts.pick(self.texts.descriptions),
+            planned_start=planned_start, due_date=planned_start + timedelta(days=14) if planned_start else None,
+        )
+
+    def build_sprint(self, milestone):
+        if self.texts is None:
+            return SprintFactory.build(milestone=milestone, tenant=self.tenant)
+        start_date = milestone.planned_start + timedelta(days=1) if milestone.planned_start else None
+        return Sprint(
+            milestone=milestone, tenant=self.tenant, status=next(self.sprint_statuses),
+            name=self.texts.pick(self.texts.names), progress=random.randint(0, 100),
+            start_date=start_date, end_date=start_date + timedelta(days=7) if start_date else None,
+        )
+
+    def build_task(self, milestone, sprint, assignee, status):
+        if self.texts is None:
+            return TaskFactory.build(milestone=milestone, tenant=self.tenant, sprint=sprint, assignee=assignee, status=status)
+        start_date = milestone.planned_start + timedelta(days=1) if milestone.planned_start else None
+        return Task(
+            milestone=milestone, tenant=self.tenant, sprint=sprint, assignee=assignee, status=status,
+            title=self.texts.pick(self.texts.titles), description=self.texts.pick(self.texts.descriptions),
+            start_date=start_date, end_date=start_date + timedelta(days=3) if start_date else None,
+            estimated_hours=random.randint(1, 40),
+        )
+
+    def recompute_progress(self):
+        """Stored counters, milestones first because project progress is built from theirs."""
+        for model in (Milestone, Project):
+            for chunk in pk_chunks(model.objects.filter(tenant=self.tenant), self.batch_size):
+                recompute_chunk(model._meta.model_name, chunk)
+
+
+def reseed(seed):
+    """Seed every random source the seeding draws from, so a seed reproduces the rows."""
+    random.seed(seed)
+    factory.random.reseed_random(seed)
+    fake.seed_instance(seed)
+
+
+def seed_tenant(tenant_id, scale, batch_size, fast, seed):
+    """
+    Seed one existing tenant, on its shard; ``scale`` is a ``Scale.as_dict()``.
+    Returns ``(domain, rows per model, seconds)``. Module level so a process
+    pool can run it, one tenant per worker.
+    """
+    reseed(seed + tenant_id)
+    tenant = Tenant.objects.select_related('shard').get(pk=tenant_id)
+    with using_shard(shard_for(tenant)):
+        elapsed = TenantSeeder(tenant, Scale(**scale), batch_size, fast=fast).run()
+        return tenant.domain, tenant_counts(tenant), elapsed
+
+
+def tenant_counts(tenant):
+    """Rows the tenant holds, per seeded model."""
+    return {model._meta.verbose_name_plural.lower(): model.objects.filter(tenant=tenant).count() for model in SEEDED_MODELS}
+
+
+def benchmark_tenants(prefix):
+    return Tenant.objects.filter(domain__startswith=prefix).order_by('domain')
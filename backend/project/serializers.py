@@ -3,10 +3,11 @@ from rest_framework import serializers
 
 from accounts.models import CustomUser, Invitation, Tenant, UserTenant
 
+from .fieldsets import SparseFieldsMixin
 from .models import Client, Invoice, Milestone, Payment, Project, Sprint, Task
 
 
-class TenantSerializer(serializers.ModelSerializer):
+class TenantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tenant
         fields = '__all__'
@@ -20,7 +21,8 @@ class TenantSerializer(serializers.ModelSerializer):
             'company_size': 'Size category of the company (1-10, 11-50, 51-200, 201-1000, 1000+)',
         }
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'tenant': ('TenantSerializer', ['id', 'name', 'domain'])}
     tenant_name = serializers.CharField(source='tenant.name', read_only=True, help_text='Name of the tenant organization')
     projects_count = serializers.SerializerMethodField(help_text='Number of projects associated with this client')
 
@@ -37,12 +39,16 @@ class ClientSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.IntegerField)
     def get_projects_count(self, obj):
+        # Annotated by ClientViewSet.get_queryset; fall back to a COUNT for single objects
+        if hasattr(obj, 'projects_count'):
+            return obj.projects_count
         return obj.projects.count()
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'client': ('ClientSerializer', ['id', 'name', 'email', 'status'])}
     client_name = serializers.CharField(source='client.name', read_only=True, help_text='Name of the associated client')
     milestones_count = serializers.SerializerMethodField(help_text='Number of milestones in this project')
-    progress = serializers.SerializerMethodField(help_text='Overall project progress percentage (0-100)')
+    progress = serializers.IntegerField(read_only=True, help_text='Overall project progress percentage (0-100)')
 
     def validate_budget(self, value):
         if value is not None:
@@ -82,13 +88,15 @@ class ProjectSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.IntegerField)
     def get_milestones_count(self, obj):
+        if hasattr(obj, 'milestones_count'):
+            return obj.milestones_count
         return obj.milestones.count()
 
-    @extend_schema_field(serializers.IntegerField)
-    def get_progress(self, obj):
-        return obj.calculate_progress()
-
-class MilestoneSerializer(serializers.ModelSerializer):
+class MilestoneSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'project': ('ProjectSerializer', ['id', 'name', 'status', 'priority']),
+        'assignee': ('CustomUserSerializer', ['id', 'email', 'first_name', 'last_name']),
+    }
     project_name = serializers.CharField(source='project.name', read_only=True, help_text='Name of the parent project')
     sprints_count = serializers.SerializerMethodField(help_text='Number of sprints in this milestone')
     progress = serializers.IntegerField(min_value=0, max_value=100, help_text='Milestone progress percentage (0-100)')
@@ -114,13 +122,12 @@ class MilestoneSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.IntegerField)
     def get_sprints_count(self, obj):
+        if hasattr(obj, 'sprints_count'):
+            return obj.sprints_count
         return obj.sprints.count()
 
-    @extend_schema_field(serializers.IntegerField)
-    def get_progress(self, obj):
-        return obj.calculate_progress()
-
-class SprintSerializer(serializers.ModelSerializer):
+class SprintSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'milestone': ('MilestoneSerializer', ['id', 'name', 'status', 'due_date'])}
     milestone_name = serializers.CharField(source='milestone.name', read_only=True, help_text='Name of the parent milestone')
     tasks_count = serializers.SerializerMethodField(help_text='Number of tasks in this sprint')
     progress = serializers.IntegerField(min_value=0, max_value=100, read_only=True, help_text='Sprint progress percentage (0-100)')
@@ -145,13 +152,21 @@ class SprintSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.IntegerField)
     def get_tasks_count(self, obj):
+        if hasattr(obj, 'tasks_count'):
+            return obj.tasks_count
         return obj.tasks.count()
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'milestone': ('MilestoneSerializer', ['id', 'name', 'status', 'due_date']),
+        'sprint': ('SprintSerializer', ['id', 'name', 'status', 'start_date', 'end_date']),
+        'assignee': ('CustomUserSerializer', ['id', 'email', 'first_name', 'last_name']),
+    }
     milestone_name = serializers.CharField(source='milestone.name', read_only=True, help_text='Name of the parent milestone')
     sprint_name = serializers.CharField(source='sprint.name', read_only=True, help_text='Name of the assigned sprint (if any)')
     progress = serializers.IntegerField(min_value=0, max_value=100, read_only=True, help_text='Task progress percentage (0-100)')
     is_assigned = serializers.SerializerMethodField(help_text='Whether the task is assigned to a sprint')
+    field_dependencies = {'is_assigned': ['sprint']}
 
     class Meta:
         model = Task
@@ -160,7 +175,7 @@ class TaskSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.BooleanField)
     def get_is_assigned(self, obj):
-        return obj.sprint is not None
+        return obj.sprint_id is not None
         help_texts = {
             'title': 'Task title or summary',
             'description': 'Detailed task description',
@@ -174,7 +189,73 @@ class TaskSerializer(serializers.ModelSerializer):
             'tenant': 'Tenant organization this task belongs to',
         }
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class TreeNodeSerializer(serializers.ModelSerializer):
+    """
+    Read-only node of the project tree (``ProjectViewSet.tree``). Emits only
+    the fields listed for its level in ``context['tree_fields']``; see
+    ``project.tree`` for how they're chosen.
+    """
+    tree_level = None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get('tree_fields', {}).get(self.tree_level)
+        if selected is None:
+            return fields
+        return {name: fields[name] for name in selected}
+
+class TaskTreeSerializer(TreeNodeSerializer):
+    """Task node of the project tree."""
+    tree_level = 'task'
+
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'description', 'status', 'assignee', 'start_date', 'end_date', 'estimated_hours']
+        read_only_fields = fields
+
+class SprintTreeSerializer(TreeNodeSerializer):
+    """Sprint node of the project tree."""
+    tree_level = 'sprint'
+    tasks = TaskTreeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Sprint
+        fields = ['id', 'name', 'status', 'start_date', 'end_date', 'progress', 'tasks']
+        read_only_fields = fields
+
+class MilestoneTreeSerializer(TreeNodeSerializer):
+    """Milestone node of the project tree."""
+    tree_level = 'milestone'
+    sprints = SprintTreeSerializer(many=True, read_only=True)
+    backlog = TaskTreeSerializer(many=True, read_only=True, help_text='Tasks not assigned to a sprint')
+
+    class Meta:
+        model = Milestone
+        fields = ['id', 'name', 'description', 'status', 'planned_start', 'actual_start', 'due_date', 'assignee', 'progress', 'sprints', 'backlog']
+        read_only_fields = fields
+
+class ProjectTreeSerializer(TreeNodeSerializer):
+    """Project with its milestones, sprints and tasks nested."""
+    tree_level = 'project'
+    milestones = MilestoneTreeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Project
+        fields = ['id', 'name', 'description', 'status', 'priority', 'start_date', 'end_date', 'progress', 'milestones']
+        read_only_fields = fields
+
+TREE_SERIALIZERS = {
+    'project': ProjectTreeSerializer,
+    'milestone': MilestoneTreeSerializer,
+    'sprint': SprintTreeSerializer,
+    'task': TaskTreeSerializer,
+}
+
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'client': ('ClientSerializer', ['id', 'name', 'email', 'status']),
+        'project': ('ProjectSerializer', ['id', 'name', 'status', 'priority']),
+    }
     client_name = serializers.CharField(source='client.name', read_only=True, help_text='Name of the billed client')
 
     class Meta:
@@ -188,7 +269,8 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'paid': 'Whether the invoice has been paid',
         }
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'invoice': ('InvoiceSerializer', ['id', 'amount', 'issued_at', 'paid'])}
     invoice_id = serializers.IntegerField(source='invoice.id', read_only=True, help_text='ID of the associated invoice')
 
     class Meta:
@@ -201,7 +283,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         }
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'email', 'first_name', 'last_name', 'is_active', 'date_joined']
@@ -215,7 +297,11 @@ class CustomUserSerializer(serializers.ModelSerializer):
         }
 
 
-class UserTenantSerializer(serializers.ModelSerializer):
+class UserTenantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'user': ('CustomUserSerializer', ['id', 'email', 'first_name', 'last_name']),
+        'tenant': ('TenantSerializer', ['id', 'name', 'domain']),
+    }
     user_email = serializers.CharField(source='user.email', read_only=True, help_text='Email address of the user')
     user_first_name = serializers.CharField(source='user.first_name', read_only=True, help_text='First name of the user')
     user_last_name = serializers.CharField(source='user.last_name', read_only=True, help_text='Last name of the user')
@@ -233,7 +319,11 @@ class UserTenantSerializer(serializers.ModelSerializer):
         }
 
 
-class InvitationSerializer(serializers.ModelSerializer):
+class InvitationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'tenant': ('TenantSerializer', ['id', 'name', 'domain']),
+        'invited_by': ('CustomUserSerializer', ['id', 'email', 'first_name', 'last_name']),
+    }
     tenant_name = serializers.CharField(source='tenant.name', read_only=True, help_text='Name of the tenant organization')
     invited_by_email = serializers.CharField(source='invited_by.email', read_only=True, help_text='Email of the user who sent the invitation')
 
@@ -0,0 +1,209 @@
+"""
+Operating tenant shards (see ``saasCRM.db_routers``).
+
+Project data references shared rows (tenants, users, groups) that are read
+and written on ``default`` only. Every shard carries the full schema, so for
+its foreign keys to hold it keeps copies of those rows: ``replicate_shared_rows``
+upserts them, ``move_tenant_shard`` runs it before copying a tenant onto a
+shard, and the receivers in ``project.signals`` mirror later saves and deletes
+to every shard hosting tenants. The copies are only there for the foreign
+keys; nothing reads them.
+
+A tenant's project data is moved by ``move_tenant_shard`` in ``COPY_ORDER``
+with its primary keys (so sync cursors and client-held ids stay valid), and
+the rows left on the source are removed with ``purge_tenant_rows``. Keeping
+the ids only works if no two shards hand out the same one: each shard has
+its own block of ``SHARD_ID_BLOCK`` ids (``id_range``, by its position in
+``shard_aliases()``), and ``start_id_sequences`` moves its project tables'
+sequences into it after every ``migrate`` of the shard.
+
+Maintenance commands that walk project data run once per shard, inside
+``using_shard``, over the rows of the tenants that live there
+(``tenant_filter``); rows a move left behind are not theirs.
+"""
+
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.fields import AutoFieldMixin
+from django.db.models.constants import OnConflict
+
+from accounts.models import Tenant, TenantShard
+from saasCRM.db_routers import DBRouter
+
+from .models import ChangeLogEntry, Client, Invoice, Milestone, Payment, Project, Sprint, Task
+from .rollups import pk_chunks
+
+# Parents before children, so foreign keys hold at every insert (and children
+# before parents when purging)
+COPY_ORDER = [
+    (Client, 'tenant'),
+    (Project, 'tenant'),
+    (Project.team_members.through, 'project__tenant'),
+    (Project.access_groups.through, 'project__tenant'),
+    (Milestone, 'tenant'),
+    (Sprint, 'tenant'),
+    (Task, 'tenant'),
+    (Invoice, 'tenant'),
+    (Payment, 'tenant'),
+    (ChangeLogEntry, 'tenant'),
+]
+
+
+def shared_models():
+    """The shared tables project data points at; users first, tenants reference them."""
+    return [get_user_model(), Group, Tenant]
+
+
+def shard_aliases():
+    """Every alias project data can live on, the home shard first."""
+    return DBRouter().shards()
+
+
+def home_shard():
+    return shard_aliases()[0]
+
+
+def hosting_shards():
+    """Shards other than the home one that the shard map assigns tenants to."""
+    return set(TenantShard.objects.values_list('alias', flat=True).distinct()) - {home_shard()}
+
+
+def id_range(alias):
+    """The ``(first, last)`` ids shard ``alias`` hands out for project rows."""
+    block = getattr(settings, 'SHARD_ID_BLOCK', 2 ** 48)
+    index = shard_aliases().index(alias)
+    return index * block + 1, (index + 1) * block
+
+
+def start_id_sequences(alias):
+    """
+    Move the id sequences of ``alias``'s project tables up to the start of
+    its ``id_range`` (ones already past it are left alone). Rows it created
+    before it had a range keep their ids; the copy check in
+    ``move_tenant_shard`` still refuses to overwrite any that collide.
+    """
+    first, _ = id_range(alias)
+    if first == 1:
+        return
+    connection = connections[alias]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        raise ImproperlyConfigured(f'{alias}: id ranges are only implemented for PostgreSQL shards')
+    models = [
+        model for model in apps.get_app_config('project').get_models(include_auto_created=True)
+        if isinstance(model._meta.pk, AutoFieldMixin)
+    ]
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, model._meta.pk.column])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f'SELECT last_value FROM {sequence}')
+                if cursor.fetchone()[0] < first:
+                    cursor.execute('SELECT setval(%s, %s, false)', [sequence, first])
+            else:
+                # AUTOINCREMENT tables continue from sqlite_sequence.seq + 1
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, first - 1])
+                elif row[0] < first - 1:
+                    cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [first - 1, table])
+
+
+def tenant_filter(alias, lookup='tenant_id'):
+    """Q matching rows of the tenants whose project data lives on ``alias``."""
+    if alias == home_shard():
+        elsewhere = TenantShard.objects.exclude(alias=alias).values_list('tenant_id', flat=True)
+        return ~Q(**{f'{lookup}__in': list(elsewhere)})
+    return Q(**{f'{lookup}__in': list(TenantShard.objects.filter(alias=alias).values_list('tenant_id', flat=True))})
+
+
+def batch_insert(model, objs, using, **options):
+    """Raw INSERTs of ``objs`` as loaded (stored values, no signals), split to the backend's parameter limit."""
+    fields = model._meta.concrete_fields
+    size = connections[using].ops.bulk_batch_size(fields, objs)
+    for start in range(0, len(objs), size):
+        model._base_manager._insert(objs[start:start + size], fields=fields, using=using, raw=True, **options)
+
+
+def replicate_shared_rows(alias, models=None, pks=None, after=None, batch_size=1000):
+    """
+    Upsert the shared rows from ``default`` into shard ``alias``, as stored:
+    every row of ``models`` (default ``shared_models()``), only ``pks``, or
+    only rows past ``after`` (``{model: pk}``, as returned by an earlier call).
+    Returns ``{model: highest pk replicated}``.
+    """
+    replicated = {}
+    for model in models or shared_models():
+        queryset = model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk')
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+        if after and after.get(model) is not None:
+            queryset = queryset.filter(pk__gt=after[model])
+        replicated[model] = (after or {}).get(model)
+        rows = queryset.iterator(chunk_size=batch_size)
+        while batch := list(islice(rows, batch_size)):
+            batch_insert(
+                model, batch, alias, on_conflict=OnConflict.UPDATE,
+                update_fields=[field for field in model._meta.concrete_fields if not field.primary_key],
+                unique_fields=[model._meta.pk],
+            )
+            replicated[model] = batch[-1].pk
+    return replicated
+
+
+def mirror_shared_save(model, pk):
+    """Copy one saved shared row to every shard hosting tenants."""
+    for alias in hosting_shards():
+        replicate_shared_rows(alias, [model], [pk])
+
+
+def mirror_shared_delete(model, pk):
+    """
+    Delete one shared row on every shard hosting tenants. The shard's own
+    collector cascades it there, as the delete on ``default`` did for the
+    home shard.
+    """
+    for alias in hosting_shards():
+        model._base_manager.using(alias).filter(pk=pk).delete()
+
+
+def purge_tenant_rows(tenant, alias, batch_size=1000):
+    """
+    Delete ``tenant``'s project data from ``alias``, children first, with raw
+    DELETEs in batches: no signals, so the live tenant gets no tombstones or
+    rollups for a copy it no longer reads. Returns ``{model: rows deleted}``.
+    """
+    deleted = {}
+    for model, lookup in reversed(COPY_ORDER):
+        manager = model._base_manager.db_manager(alias)
+        count = 0
+        for chunk in pk_chunks(manager.filter(**{lookup: tenant}), batch_size):
+            count += manager.filter(pk__in=chunk)._raw_delete(alias)
+        deleted[model] = count
+    return deleted
+
+
+def leftover_models(tenant, alias):
+    """Labels of the models with rows of ``tenant`` on ``alias``."""
+    return [
+        model._meta.label for model, lookup in COPY_ORDER
+        if model._base_manager.using(alias).filter(**{lookup: tenant}).exists()
+    ]
+
+
+def configured_shard(value):
+    """A shard alias given on the command line, validated."""
+    shards = shard_aliases()
+    if value not in shards:
+        raise CommandError(f'{value!r} is not a shard; choose from {", ".join(shards)}')
+    return value
@@ -1,116 +1,74 @@
-from django.conf import settings
-from django.core.mail import send_mail
-from django.db.models.signals import post_delete, post_save, pre_save
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import Milestone, Project, Sprint, Task
+from accounts.models import Tenant, TenantShard, UserTenant
 
+from . import notifications, rollups, sharding
+from .cache import bump_generation, tenant_cache, tenant_generation
+from .dirty import get_dirty_set
+from .models import Client, Invoice, Milestone, Payment, Project, Sprint, Task
+from .permissions import PERMISSIONS_GENERATION, user_permissions_generation
 
-@receiver(post_save, sender=Sprint)
-def update_milestone_on_sprint_status_change(sender, instance, **kwargs):
-    """
-    Update milestone progress when sprint status changes to/from completed.
-    Only triggers on actual status changes to avoid unnecessary updates.
-    """
-    if not hasattr(instance, '_progress_updated'):  # Prevent recursion
-        try:
-            milestone = instance.milestone
-            if milestone:
-                # Calculate new progress based on completed sprints
-                total_sprints = milestone.sprints.count()
-                completed_sprints = milestone.sprints.filter(status='completed').count()
-                new_progress = int((completed_sprints / total_sprints * 100)) if total_sprints > 0 else 0
-
-                # Only update if progress changed
-                if milestone.progress != new_progress:
-                    milestone._progress_updated = True  # Prevent recursion
-                    milestone.progress = new_progress
-                    milestone.save(update_fields=['progress'])
-
-        except Exception as e:
-            # Log error but don't break the save
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to update milestone progress for sprint {instance.id}: {e}")
+User = get_user_model()
 
-@receiver(post_save, sender=Milestone)
-def update_project_on_milestone_progress_change(sender, instance, **kwargs):
-    """
-    Update project progress when milestone progress changes.
-    Only triggers on actual progress changes to avoid unnecessary updates.
-    """
-    if not hasattr(instance, '_progress_updated'):  # Prevent recursion
-        try:
-            project = instance.project
-            if project:
-                # Calculate new progress as average of milestone progress
-                milestones = project.milestones.all()
-                new_progress = sum(m.progress for m in milestones) // len(milestones) if milestones else 0
-
-                # Only update if progress changed
-                if project.progress != new_progress:
-                    project._progress_updated = True  # Prevent recursion
-                    project.progress = new_progress
-                    project.save(update_fields=['progress'])
-
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to update project progress for milestone {instance.id}: {e}")
 
 @receiver(pre_save, sender=Sprint)
-def notify_sprint_status_change(sender, instance, **kwargs):
+@receiver(pre_save, sender=Milestone)
+def capture_rollup_state(sender, instance, raw=False, **kwargs):
+    """Make sure the stored values of the rollup-relevant fields are known before the write."""
+    if not raw:
+        rollups.capture_stored_values(instance)
+
+@receiver(post_save, sender=Sprint)
+def roll_up_sprint_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
     """
-    Send notification when sprint status changes to 'completed'.
+    Adjust the milestone's sprint counters when a sprint is added, moved or
+    completed/reopened; the progress change rolls up to the project.
     """
-    if instance.pk:  # Existing instance
-        old_instance = Sprint.objects.get(pk=instance.pk)
-        if old_instance.status != 'completed' and instance.status == 'completed':
-            # Send email notification (if email configured)
-            if hasattr(settings, 'EMAIL_HOST'):
-                send_mail(
-                    'Sprint Completed',
-                    f'Sprint "{instance.name}" has been completed.',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [instance.milestone.assignee.email if instance.milestone.assignee else 'admin@example.com'],
-                    fail_silently=True,
-                )
-            else:
-                print(f"Notification: Sprint '{instance.name}' completed.")  # Fallback for dev
+    if not raw:
+        rollups.sprint_saved(instance, created, update_fields)
 
-@receiver(post_save, sender=Task)
-def auto_activate_sprint(sender, instance, **kwargs):
+@receiver(post_delete, sender=Sprint)
+def roll_up_sprint_delete(sender, instance, origin=None, **kwargs):
+    if not rollups.is_cascade(instance, origin):
+        rollups.sprint_deleted(instance)
+
+@receiver(post_save, sender=Milestone)
+def roll_up_milestone_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Adjust the project's milestone counters when a milestone is added, moved or its progress changes."""
+    if not raw:
+        rollups.milestone_saved(instance, created, update_fields)
+
+@receiver(post_delete, sender=Milestone)
+def roll_up_milestone_delete(sender, instance, origin=None, **kwargs):
+    if not rollups.is_cascade(instance, origin):
+        rollups.milestone_deleted(instance)
+
+@receiver(post_save, sender=Sprint)
+def notify_sprint_status_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
     """
-    Auto-activate sprint when first task moves to in_progress.
-    Only activates if sprint is currently planned.
+    Send notification when sprint status changes to 'completed'.
+    The mail goes out once the transaction commits.
     """
-    if instance.sprint and instance.status == 'in_progress':
-        sprint = instance.sprint
-        if sprint.status == 'planned':
-            # Check if this is the first in_progress task
-            other_in_progress = sprint.tasks.filter(status='in_progress').exclude(id=instance.id).exists()
-            if not other_in_progress:
-                sprint.status = 'active'
-                sprint.save(update_fields=['status'])
-                print(f"Auto-activated sprint '{sprint.name}' due to task '{instance.title}'")
+    if created or raw:
+        return
+    old_status, status = rollups.field_change(instance, 'status', update_fields)
+    if old_status != 'completed' and status == 'completed':
+        get_dirty_set(instance._state.db).defer(notifications.sprint_completed(instance))
 
 @receiver(post_save, sender=Task)
-def auto_complete_sprint(sender, instance, **kwargs):
+def mark_task_sprint(sender, instance, raw=False, **kwargs):
     """
-    Auto-complete sprint when all tasks are done.
-    Only completes if sprint is active and all tasks are completed.
+    Auto-activate the sprint when a task moves to in_progress, and auto-complete
+    it when all its tasks are done. Evaluated once per sprint when the
+    transaction commits, however many of its tasks were saved.
     """
-    if instance.sprint and instance.status == 'done':
-        sprint = instance.sprint
-        if sprint.status == 'active':
-            # Check if all tasks are done
-            total_tasks = sprint.tasks.count()
-            completed_tasks = sprint.tasks.filter(status='done').count()
-
-            if total_tasks > 0 and total_tasks == completed_tasks:
-                sprint.status = 'completed'
-                sprint.save(update_fields=['status'])
-                print(f"Auto-completed sprint '{sprint.name}' - all {total_tasks} tasks done")
+    if not raw and instance.sprint_id and instance.status in ('in_progress', 'done'):
+        get_dirty_set(instance._state.db).mark_sprints(instance.sprint_id)
 
 @receiver(post_save, sender=Milestone)
 def notify_milestone_due(sender, instance, created, **kwargs):
@@ -121,6 +79,162 @@ def notify_milestone_due(sender, instance, created, **kwargs):
         # Simple check: if due in 3 days (in real app, use celery for scheduling)
         from datetime import datetime, timedelta
         if instance.due_date - datetime.now().date() <= timedelta(days=3):
-            print(f"Notification: Milestone '{instance.name}' is due soon.")  # Or send email
+            get_dirty_set(instance._state.db).defer(notifications.milestone_due(instance))
+
+@receiver(pre_save, sender=Tenant)
+def remember_tenant_domain(sender, instance, **kwargs):
+    """
+    Remember the stored domain before a save so a renamed tenant's old
+    domain can be evicted from the tenant lookup cache.
+    """
+    if instance.pk:
+        instance._previous_domain = (
+            Tenant.objects.filter(pk=instance.pk).values_list('domain', flat=True).first()
+        )
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    """
+    Evict cached lookups for the tenant's domain (including negative entries
+    cached before the tenant existed), and change the validators of every
+    response served in the tenant.
+    """
+    tenant_cache.invalidate(instance.domain, getattr(instance, '_previous_domain', None))
+    bump_generation(tenant_generation(instance.pk))
+
+@receiver(post_save, sender=TenantShard)
+@receiver(post_delete, sender=TenantShard)
+def invalidate_tenant_shard(sender, instance, **kwargs):
+    """
+    Cached tenants carry their shard map entry: evict the tenant once the
+    change commits, so no request caches the old entry again.
+    """
+    domain = Tenant.objects.filter(pk=instance.tenant_id).values_list('domain', flat=True).first()
+    transaction.on_commit(lambda: tenant_cache.invalidate(domain), using=instance._state.db)
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=Tenant)
+def mirror_shared_row_save(sender, instance, using, raw=False, update_fields=None, **kwargs):
+    """
+    Shards hosting tenants keep copies of the shared rows their project data
+    references (see project.sharding): copy the row once the save commits.
+    Logins only touch last_login, which no foreign key cares about.
+    """
+    if raw or using != DEFAULT_DB_ALIAS or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: sharding.mirror_shared_save(sender, pk), using=using, robust=True)
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Tenant)
+def mirror_shared_row_delete(sender, instance, using, **kwargs):
+    """Delete the shards' copies once the delete commits (deletes on a shard are those copies going)."""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: sharding.mirror_shared_delete(sender, pk), using=using, robust=True)
+
+@receiver(post_migrate)
+def start_shard_id_range(sender, using, **kwargs):
+    """Each shard hands out ids from its own block, so moved rows keep theirs (see project.sharding)."""
+    if sender.name == 'project' and using in sharding.shard_aliases():
+        sharding.start_id_sequences(using)
+
+@receiver(post_save, sender=UserTenant)
+@receiver(post_delete, sender=UserTenant)
+def invalidate_membership_snapshot(sender, instance, **kwargs):
+    """Membership or approval changed: drop the user's cached access snapshots."""
+    bump_generation(user_permissions_generation(instance.user_id))
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permission_snapshot(sender, instance, action, reverse, pk_set, **kwargs):
+    """Group membership or direct user permissions changed."""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_generation(user_permissions_generation(instance.pk))
+    elif pk_set:
+        # group.customuser_set.add(...) etc.: pk_set holds the affected users
+        bump_generation(*[user_permissions_generation(pk) for pk in pk_set])
+    else:
+        # Reverse clear: the affected users are unknown, invalidate everyone
+        bump_generation(PERMISSIONS_GENERATION)
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permission_snapshots(sender, action, **kwargs):
+    """A group's permissions changed: every member may be affected."""
+    if action.startswith('post_'):
+        bump_generation(PERMISSIONS_GENERATION)
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group_snapshots(sender, **kwargs):
+    bump_generation(PERMISSIONS_GENERATION)
+
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Milestone)
+@receiver(post_save, sender=Sprint)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Milestone)
+@receiver(post_delete, sender=Sprint)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Payment)
+def invalidate_list_cache(sender, instance, **kwargs):
+    """Bump the list-cache generation for the model in the instance's tenant (once per transaction)."""
+    get_dirty_set(instance._state.db).invalidate_lists(sender, instance.tenant_id)
+
+def change_row(instance):
+    """``(tenant_id, pk, parent_id)`` for the change log; the parent routes live events (see ``project.events``)."""
+    parent_id = instance.project_id if isinstance(instance, Milestone) else getattr(instance, 'milestone_id', None)
+    return instance.tenant_id, instance.pk, parent_id
+
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Milestone)
+@receiver(post_save, sender=Sprint)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Payment)
+def log_saved_change(sender, instance, created, raw=False, **kwargs):
+    """Append the write to the sync change log, in the write's transaction."""
+    if not raw:
+        get_dirty_set(instance._state.db).log_changes(sender, 'created' if created else 'updated', change_row(instance))
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Milestone)
+@receiver(post_delete, sender=Sprint)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Payment)
+def log_deleted_change(sender, instance, origin=None, **kwargs):
+    """Leave a tombstone in the sync change log, unless the whole tenant (and its log) is going."""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not Tenant:
+        get_dirty_set(instance._state.db).log_changes(sender, 'deleted', change_row(instance))
+
+@receiver(m2m_changed, sender=Project.team_members.through)
+@receiver(m2m_changed, sender=Project.access_groups.through)
+def invalidate_project_list_cache_on_m2m(sender, instance, action, reverse, using, pk_set=None, **kwargs):
+    if not action.startswith('post_'):
+        return
+    dirty = get_dirty_set(using)
+    if reverse:
+        # Changed from the user/group side: affected projects may span tenants
+        dirty.invalidate_lists(Project)
+        if pk_set:
+            dirty.log_changes(Project, 'updated', *Project.objects.using(using).filter(pk__in=pk_set).values_list('tenant_id', 'pk'))
+    else:
+        dirty.invalidate_lists(Project, instance.tenant_id)
+        dirty.log_changes(Project, 'updated', (instance.tenant_id, instance.pk))
 
 # Add more signals as needed for project status, etc.
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Change log behind the delta sync endpoint (``GET /api/sync/?since=``).
+
+Every create, update and delete of a synced model appends a
+``ChangeLogEntry``. The receivers in ``project.signals`` (and the bulk paths
+that bypass signals: ``QuerySet.update()`` in the bulk actions, the rollup
+``bulk_update``s) log them through the dirty set, which inserts the entries
+in the same transaction as the write, so the log commits or rolls back with
+the data. Reading is an index range scan on ``(tenant, id)``: a poll costs
+O(changes since the cursor), not O(table).
+
+Sequences are handed out at insert time but become visible at commit, so on
+PostgreSQL a long transaction can commit a sequence below one a poller has
+already passed. Each entry therefore records its transaction id
+(``pg_current_xact_id()``), and the feed is read in ``(txid, id)`` order,
+only up to the oldest transaction still running
+(``pg_snapshot_xmin(pg_current_snapshot())``): nothing can commit into that
+part of the log any more, so the cursor never skips an entry. Clients still
+pass the id of the last entry they saw; its txid places it in that order.
+SQLite runs one write transaction at a time, so there sequences commit in
+order and the feed is read by id alone.
+"""
+
+from django.db import connections
+from django.db.models import BigIntegerField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import ChangeLogEntry
+
+# Standard CASTs rather than ::, so the SQL also parses where tests stand the functions in
+CURRENT_TXID = 'CAST(CAST(pg_current_xact_id() AS TEXT) AS BIGINT)'
+SNAPSHOT_XMIN = 'CAST(CAST(pg_snapshot_xmin(pg_current_snapshot()) AS TEXT) AS BIGINT)'
+
+
+def tracks_transactions(connection):
+    """Whether entries written on ``connection`` carry transaction ids (PostgreSQL 13+)."""
+    return connection.vendor == 'postgresql'
+
+
+def record_change(changes, model_name, tenant_id, pk, action, parent_id=None):
+    """
+    Add one write to ``changes`` (``(model name, pk) -> [tenant_id, action,
+    parent_id]``, in write order). Later writes to the same row replace earlier
+    ones, except that a row created in the same transaction stays ``created``.
+
+    ``parent_id`` is only used for live events (``project.events``): the
+    milestone of a task or sprint, the project of a milestone.
+    """
+    if tenant_id is None or pk is None:
+        return
+    key = (model_name, pk)
+    previous = changes.pop(key, None)
+    if previous:
+        if previous[1] == 'created' and action == 'updated':
+            action = 'created'
+        parent_id = parent_id if parent_id is not None else previous[2]
+    changes[key] = [tenant_id, action, parent_id]
+
+
+def write_change_log(model_name, action, rows, using):
+    """
+    Append ``action`` on the ``(tenant_id, pk)`` rows of ``model_name`` to the
+    log with one INSERT, tagged with the current transaction's id. Returns the
+    new entries, in order, with their sequence where the database reports it.
+    """
+    txid = RawSQL(CURRENT_TXID, [], output_field=BigIntegerField()) if tracks_transactions(connections[using]) else 0
+    return ChangeLogEntry.objects.using(using).bulk_create([
+        ChangeLogEntry(tenant_id=tenant_id, model=model_name, object_id=pk, action=action, txid=txid)
+        for tenant_id, pk in rows
+    ])
+
+
+def read_changes(tenant, since, limit):
+    """
+    The next ``limit`` writes in ``tenant`` after entry ``since``, collapsed
+    to the latest entry per row. Returns ``(entries, cursor, has_more)`` where
+    ``cursor`` is the entry to poll from next. Raises ``ChangeLogEntry.DoesNotExist``
+    for a ``since`` that isn't an entry of the tenant.
+    """
+    queryset = ChangeLogEntry.objects.filter(tenant=tenant)
+    if tracks_transactions(connections[queryset.db]):
+        queryset = queryset.filter(txid__lt=RawSQL(SNAPSHOT_XMIN, [], output_field=BigIntegerField()))
+        if since:
+            txid = ChangeLogEntry.objects.filter(tenant=tenant).values_list('txid', flat=True).get(pk=since)
+            queryset = queryset.filter(Q(txid__gt=txid) | Q(txid=txid, id__gt=since))
+        ordering = ('txid', 'id')
+    else:
+        queryset = queryset.filter(id__gt=since)
+        ordering = ('id',)
+    entries = list(queryset.only('id', 'model', 'object_id', 'action').order_by(*ordering)[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    cursor = entries[-1].id if entries else since
+
+    latest = {}
+    for entry in entries:
+        key = (entry.model, entry.object_id)
+        previous = latest.pop(key, None)
+        if previous and previous.action == 'created' and entry.action == 'updated':
+            entry.action = 'created'
+        latest[key] = entry
+    return list(latest.values()), cursor, has_more
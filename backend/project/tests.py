@@ -1,15 +1,122 @@
+import asyncio
+import base64
 import json
+import os
+import traceback
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
 from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-from django.contrib.auth.models import Group
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.http import Http404
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from accounts.models import CustomUser, Tenant
-
-from .models import Client, Invoice, Milestone, Payment, Project, Sprint, Task
+from accounts.models import CustomUser, Invitation, Tenant, TenantShard, UserTenant
+
+from .cache import tenant_cache
+from .factories import (
+    ClientFactory, InvoiceFactory, MilestoneFactory, PaymentFactory, ProjectFactory, SprintFactory,
+    TaskFactory, UserTenantFactory,
+)
+from .middleware import TenantMiddleware
+from .models import ChangeLogEntry, Client, Invoice, Milestone, Payment, Project, Sprint, Task
+from .permissions import (
+    CanManageClients, CanManageInvoices, CanManageMilestones, CanManagePayments,
+    CanManageProjects, CanManageSprints, CanManageTasks, HasTenantAccess, IsTenantOwner,
+    get_access_snapshot,
+)
+
+
+def data_queries(captured):
+    """
+    SQL run inside ``CaptureQueriesContext``, without the savepoints that
+    ATOMIC_REQUESTS adds around each test client request.
+    """
+    return [query['sql'] for query in captured if 'SAVEPOINT' not in query['sql']]
+
+
+class TenantOwnerMixin:
+    """
+    The fixture most tests build on: a tenant with an approved owner in a
+    group holding every project permission.
+    """
+
+    def project_managers_group(self):
+        group, created = Group.objects.get_or_create(name='Test Project Managers')
+        if created:
+            group.permissions.set(Permission.objects.filter(content_type__app_label='project'))
+        return group
+
+    def create_tenant_owner(self, domain, name=None, email=None):
+        """A tenant and its owner, as ``(tenant, user)``."""
+        tenant = Tenant.objects.create(name=name or domain.title(), domain=domain)
+        user = CustomUser.objects.create_user(email=email or f'owner@{domain}.com', password='pass')
+        user.groups.add(self.project_managers_group())
+        UserTenant.objects.create(user=user, tenant=tenant, is_owner=True, is_approved=True)
+        return tenant, user
+
+    def set_up_tenant(self, domain, **kwargs):
+        """
+        Empty the caches, then create ``self.tenant`` and ``self.user`` (with
+        their commit hooks run) and authenticate the API client as the owner.
+        """
+        cache.clear()
+        tenant_cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tenant, self.user = self.create_tenant_owner(domain, **kwargs)
+        if hasattr(self.client, 'force_authenticate'):
+            self.client.force_authenticate(user=self.user)
+        return self.tenant
+
+    def seed_projects(self, count, **tree):
+        """
+        ``count`` projects of ``self.tenant``, each with its own client and a
+        ``seed_tree`` below it (``tree`` are its options). Returns them.
+        """
+        projects = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                index = Client.objects.count()
+                client = Client.objects.create(
+                    name=f'Client {index}', email=f'client{index}@{self.tenant.domain}.com', tenant=self.tenant,
+                )
+                project = Project.objects.create(name=f'Project {index}', client=client, tenant=self.tenant)
+                self._build_tree(project, **tree)
+                projects.append(project)
+        return projects
+
+    def seed_tree(self, project, **tree):
+        """
+        Milestones ``M<m>`` under ``project``, each with ``backlog`` tasks
+        outside sprints and ``sprints`` sprints ``S<m>.<s>`` of ``tasks`` tasks
+        ``T<m>.<s>.<t>``. The commit hooks run, so rollups and list caches are
+        current.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self._build_tree(project, **tree)
+
+    def _build_tree(self, project, milestones=1, sprints=1, tasks=1, backlog=0, sprint_status='planned'):
+        tenant = self.tenant
+        for m in range(milestones):
+            milestone = Milestone.objects.create(name=f'M{m}', project=project, tenant=tenant)
+            for b in range(backlog):
+                Task.objects.create(title=f'Backlog {m}.{b}', milestone=milestone, tenant=tenant)
+            for s in range(sprints):
+                sprint = Sprint.objects.create(name=f'S{m}.{s}', milestone=milestone, tenant=tenant, status=sprint_status)
+                for t in range(tasks):
+                    Task.objects.create(title=f'T{m}.{s}.{t}', milestone=milestone, sprint=sprint, tenant=tenant)
 
 
 class ModelTests(TestCase):
@@ -276,7 +383,7 @@ class TenantAPITests(APITestCase):
         """Test listing tenants"""
         response = self.client.get('/api/tenants/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_create_tenant(self):
         """Test creating tenant"""
@@ -315,7 +422,7 @@ class TenantAPITests(APITestCase):
         # Search by name
         response = self.client.get('/api/tenants/?search=Org 1')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
         # Ordering
         response = self.client.get('/api/tenants/?ordering=name')
@@ -348,9 +455,9 @@ class ClientAPITests(APITestCase):
         """Test listing clients"""
         response = self.client.get('/api/clients/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertIn('tenant_name', response.data[0])
-        self.assertIn('projects_count', response.data[0])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn('tenant_name', response.data['results'][0])
+        self.assertIn('projects_count', response.data['results'][0])
 
     def test_create_client(self):
         """Test creating client"""
@@ -380,12 +487,12 @@ class ClientAPITests(APITestCase):
         # Filter by status
         response = self.client.get('/api/clients/?status=active')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
         # Search by name
         response = self.client.get('/api/clients/?search=Test Client')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
 
 class ProjectAPITests(APITestCase):
@@ -419,9 +526,9 @@ class ProjectAPITests(APITestCase):
         """Test listing projects"""
         response = self.client.get('/api/projects/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertIn('client_name', response.data[0])
-        self.assertIn('milestones_count', response.data[0])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn('client_name', response.data['results'][0])
+        self.assertIn('milestones_count', response.data['results'][0])
 
     def test_create_project(self):
         """Test creating project"""
@@ -443,12 +550,12 @@ class ProjectAPITests(APITestCase):
         # Filter by status
         response = self.client.get('/api/projects/?status=active')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
         # Filter by priority
         response = self.client.get('/api/projects/?priority=high')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
 
 class MilestoneAPITests(APITestCase):
@@ -484,9 +591,9 @@ class MilestoneAPITests(APITestCase):
         """Test listing milestones"""
         response = self.client.get('/api/milestones/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertIn('project_name', response.data[0])
-        self.assertIn('sprints_count', response.data[0])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn('project_name', response.data['results'][0])
+        self.assertIn('sprints_count', response.data['results'][0])
 
     def test_create_milestone(self):
         """Test creating milestone"""
@@ -539,8 +646,8 @@ class SprintAPITests(APITestCase):
         """Test listing invoices"""
         response = self.client.get('/api/invoices/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertIn('client_name', response.data[0])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn('client_name', response.data['results'][0])
 
     def test_create_invoice(self):
         """Test creating invoice"""
@@ -557,7 +664,7 @@ class SprintAPITests(APITestCase):
         # Filter by paid status
         response = self.client.get('/api/invoices/?paid=false')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
 
 class PaymentAPITests(APITestCase):
@@ -595,8 +702,8 @@ class PaymentAPITests(APITestCase):
         """Test listing payments"""
         response = self.client.get('/api/payments/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertIn('invoice_id', response.data[0])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn('invoice_id', response.data['results'][0])
 
     def test_create_payment(self):
         """Test creating payment"""
@@ -772,3 +879,1792 @@ class ErrorHandlingTests(APITestCase):
         self.client.force_authenticate(user=None)
         response = self.client.get('/api/tenants/')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class TenantCacheTests(TestCase):
+    """Test tenant resolution caching in TenantMiddleware"""
+
+    def setUp(self):
+        cache.clear()
+        tenant_cache.clear()
+        tenant_cache.reset_stats()
+        self.tenant = Tenant.objects.create(name="Acme", domain="acme")
+        self.factory = RequestFactory()
+        self.middleware = TenantMiddleware(lambda request: None)
+
+    def resolve(self, host):
+        request = self.factory.get('/api/clients/', HTTP_HOST=host)
+        self.middleware.process_request(request)
+        return request.tenant
+
+    def test_repeated_lookups_hit_cache(self):
+        """Only the first lookup for a domain queries the database"""
+        with self.assertNumQueries(1):
+            self.assertEqual(self.resolve('acme.example.com'), self.tenant)
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.assertEqual(self.resolve('acme.example.com'), self.tenant)
+        stats = tenant_cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['local_hits'], 5)
+
+    def test_shared_cache_used_when_local_empty(self):
+        """A cold worker is served from the shared cache"""
+        self.resolve('acme.example.com')
+        tenant_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve('acme.example.com'), self.tenant)
+        self.assertEqual(tenant_cache.stats()['shared_hits'], 1)
+
+    def test_unknown_subdomain_is_negatively_cached(self):
+        """Unknown subdomains raise 404 and don't query the database twice"""
+        with self.assertNumQueries(1):
+            with self.assertRaises(Http404):
+                self.resolve('ghost.example.com')
+        with self.assertNumQueries(0):
+            with self.assertRaises(Http404):
+                self.resolve('ghost.example.com')
+        self.assertEqual(tenant_cache.stats()['negative_hits'], 2)
+
+    def test_save_and_delete_invalidate(self):
+        """Tenant writes evict stale and negative entries"""
+        with self.assertRaises(Http404):
+            self.resolve('newco.example.com')
+        newco = Tenant.objects.create(name="NewCo", domain="newco")
+        self.assertEqual(self.resolve('newco.example.com'), newco)
+
+        self.resolve('acme.example.com')
+        self.tenant.domain = 'acme2'
+        self.tenant.save()
+        with self.assertRaises(Http404):
+            self.resolve('acme.example.com')
+        self.assertEqual(self.resolve('acme2.example.com').name, 'Acme')
+
+        newco.delete()
+        with self.assertRaises(Http404):
+            self.resolve('newco.example.com')
+
+    def test_cached_tenant_is_copied(self):
+        """Mutating request.tenant doesn't corrupt the cached instance"""
+        tenant = self.resolve('acme.example.com')
+        tenant.name = 'Mutated'
+        self.assertEqual(self.resolve('acme.example.com').name, 'Acme')
+
+
+class AccessSnapshotTests(TenantOwnerMixin, TestCase):
+    """Test the per-request and cross-request permission snapshot"""
+
+    def setUp(self):
+        self.set_up_tenant('acme')
+        self.group = self.project_managers_group()
+        self.membership = UserTenant.objects.get(user=self.user)
+        self.factory = RequestFactory()
+
+    def make_request(self):
+        # Fresh user instance per request, like the authentication layer provides
+        request = self.factory.get('/api/clients/')
+        request.user = CustomUser.objects.get(pk=self.user.pk)
+        request.tenant = self.tenant
+        return request
+
+    def check_all(self, request):
+        view = type('View', (), {'action': 'list'})()
+        permission_classes = [
+            HasTenantAccess, IsTenantOwner, CanManageClients, CanManageProjects, CanManageTasks,
+            CanManageInvoices, CanManagePayments, CanManageMilestones, CanManageSprints,
+        ]
+        return [cls().has_permission(request, view) for cls in permission_classes]
+
+    def test_snapshot_computed_once_per_request(self):
+        """All permission classes share one snapshot"""
+        request = self.make_request()
+        with self.assertNumQueries(3):  # membership, user perms, group perms
+            self.check_all(request)
+        with self.assertNumQueries(0):
+            self.check_all(request)
+
+    def test_snapshot_cached_across_requests(self):
+        """Subsequent requests don't query membership or permissions"""
+        self.check_all(self.make_request())
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            results = self.check_all(request)
+        self.assertEqual(results[:3], [True, True, True])
+
+    def test_membership_change_invalidates(self):
+        self.assertTrue(get_access_snapshot(self.make_request()).is_member)
+        self.membership.is_approved = False
+        self.membership.save()
+        snapshot = get_access_snapshot(self.make_request())
+        self.assertFalse(snapshot.is_member)
+        self.assertFalse(snapshot.is_owner)
+
+    def test_group_membership_change_invalidates(self):
+        self.assertTrue(get_access_snapshot(self.make_request()).has_perm('project.view_client'))
+        self.user.groups.clear()
+        self.assertFalse(get_access_snapshot(self.make_request()).has_perm('project.view_client'))
+        self.group.customuser_set.add(self.user)
+        self.assertTrue(get_access_snapshot(self.make_request()).has_perm('project.view_client'))
+
+    def test_group_permission_change_invalidates(self):
+        self.assertTrue(get_access_snapshot(self.make_request()).has_perm('project.delete_client'))
+        self.group.permissions.remove(Permission.objects.get(codename='delete_client'))
+        self.assertFalse(get_access_snapshot(self.make_request()).has_perm('project.delete_client'))
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class ListCacheTests(TenantOwnerMixin, APITestCase):
+    """Test the tenant-aware versioned list cache on ProjectViewSet"""
+
+    def setUp(self):
+        cache.clear()
+        tenant_cache.clear()
+        self.group = self.project_managers_group()
+        self.tenants = {}
+        self.users = {}
+        with self.captureOnCommitCallbacks(execute=True):
+            for domain in ('acme', 'globex'):
+                tenant, user = self.create_tenant_owner(domain)
+                client = Client.objects.create(name=f"{domain} client", email=f"client@{domain}.com", tenant=tenant)
+                Project.objects.create(name=f"{domain} project", client=client, tenant=tenant)
+                self.tenants[domain] = tenant
+                self.users[domain] = user
+
+    def get_projects(self, domain, query=''):
+        self.client.force_authenticate(user=self.users[domain])
+        return self.client.get(f'/api/projects/{query}', HTTP_HOST=f'{domain}.example.com')
+
+    def test_second_request_is_served_from_cache(self):
+        self.assertEqual(self.get_projects('acme')['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_projects('acme')
+        self.assertEqual(data_queries(queries), [])
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual([p['name'] for p in response.data['results']], ['acme project'])
+
+    def test_tenants_do_not_share_entries(self):
+        self.get_projects('acme')
+        response = self.get_projects('globex')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([p['name'] for p in response.data['results']], ['globex project'])
+
+    def test_query_params_are_normalized(self):
+        self.get_projects('acme', '?status=planning&priority=medium')
+        self.assertEqual(self.get_projects('acme', '?priority=medium&status=planning')['X-Cache'], 'HIT')
+        self.assertEqual(self.get_projects('acme', '?status=active')['X-Cache'], 'MISS')
+
+    def test_dependency_writes_invalidate(self):
+        project = Project.objects.get(tenant=self.tenants['acme'])
+        self.get_projects('acme')
+        with self.captureOnCommitCallbacks(execute=True):
+            milestone = Milestone.objects.create(name="M1", project=project, tenant=project.tenant)
+        response = self.get_projects('acme')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['milestones_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Sprint.objects.create(name="S1", milestone=milestone, tenant=project.tenant)
+        self.assertEqual(self.get_projects('acme')['X-Cache'], 'MISS')
+
+        # Writes in another tenant leave acme's entry alone
+        self.get_projects('acme')
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.create(name="Other", client=Client.objects.get(tenant=self.tenants['globex']), tenant=self.tenants['globex'])
+        self.assertEqual(self.get_projects('acme')['X-Cache'], 'HIT')
+
+    def test_invalidation_waits_for_commit(self):
+        project = Project.objects.get(tenant=self.tenants['acme'])
+        self.get_projects('acme')
+        with self.captureOnCommitCallbacks() as callbacks:
+            Milestone.objects.create(name="M1", project=project, tenant=project.tenant)
+            Milestone.objects.create(name="M2", project=project, tenant=project.tenant)
+            self.assertEqual(self.get_projects('acme')['X-Cache'], 'HIT')
+        # Both writes share one commit hook
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(self.get_projects('acme')['X-Cache'], 'MISS')
+
+
+class ListQueryCountTests(TenantOwnerMixin, APITestCase):
+    """List endpoints run a constant number of queries regardless of row count"""
+
+    def setUp(self):
+        self.set_up_tenant('counting')
+
+    def count_queries(self, url):
+        # Warm the permission snapshot; the distinct query string keeps the list cache cold
+        self.client.get(url, {'warmup': Client.objects.count()})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_counts_are_annotated(self):
+        for url in ['/api/clients/', '/api/projects/', '/api/milestones/', '/api/sprints/']:
+            with self.captureOnCommitCallbacks(execute=True):
+                Client.objects.all().delete()
+            self.seed_projects(2)
+            small = self.count_queries(url)
+            self.seed_projects(8)
+            self.assertEqual(self.count_queries(url), small, url)
+
+    def test_annotated_counts_match(self):
+        self.seed_projects(1)
+        project = Project.objects.get()
+        Milestone.objects.create(name="Extra", project=project, tenant=self.tenant)
+        self.assertEqual(self.client.get('/api/clients/').data['results'][0]['projects_count'], 1)
+        self.assertEqual(self.client.get('/api/projects/').data['results'][0]['milestones_count'], 2)
+        milestones = {m['name']: m['sprints_count'] for m in self.client.get('/api/milestones/').data['results']}
+        self.assertEqual(milestones, {'M0': 1, 'Extra': 0})
+        self.assertEqual(self.client.get('/api/sprints/').data['results'][0]['tasks_count'], 1)
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class ProjectProgressListTests(TenantOwnerMixin, APITestCase):
+    """Test that project lists serve the stored progress rollup"""
+
+    def setUp(self):
+        self.set_up_tenant('progress')
+        client = Client.objects.create(name="Client", email="progress@example.com", tenant=self.tenant)
+        self.project = Project.objects.create(name="Project", client=client, tenant=self.tenant)
+        self.empty_project = Project.objects.create(name="Empty", client=client, tenant=self.tenant)
+        Milestone.objects.create(name="M1", project=self.project, tenant=self.tenant)
+
+    def test_list_reads_stored_progress(self):
+        # Set behind the rollups' back: the list must show the column, not recompute it
+        Project.objects.filter(pk=self.project.pk).update(progress=42)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/projects/', HTTP_HOST='progress.example.com')
+        self.assertEqual({p['name']: p['progress'] for p in response.data['results']}, {'Project': 42, 'Empty': 0})
+        self.assertFalse([query['sql'] for query in queries if 'AVG(' in query['sql'].upper()])
+
+
+@override_settings(API_MAX_PAGE_SIZE=4)
+class KeysetPaginationTests(APITestCase):
+    """Test keyset pagination over (created_at, id) and OrderingFilter orderings"""
+
+    def setUp(self):
+        from datetime import date
+        self.user = CustomUser.objects.create_user(email='pager@example.com', password='pass')
+        self.tenant = Tenant.objects.create(name="Paging Org")
+        UserTenant.objects.create(user=self.user, tenant=self.tenant, is_owner=True, is_approved=True)
+        self.client.force_authenticate(user=self.user)
+        client = Client.objects.create(name="Client", email="pager@example.com", tenant=self.tenant)
+        project = Project.objects.create(name="Project", client=client, tenant=self.tenant)
+        milestone = Milestone.objects.create(name="M", project=project, tenant=self.tenant)
+        for i in range(11):
+            Sprint.objects.create(
+                name=f"Sprint {i:02d}", milestone=milestone, tenant=self.tenant,
+                start_date=date(2025, 1, 1 + i % 4) if i % 3 else None,
+            )
+        # Identical timestamps force the id tie-breaker to do the work
+        Sprint.objects.filter(name__in=["Sprint 03", "Sprint 04", "Sprint 05"]).update(
+            created_at=Sprint.objects.get(name="Sprint 03").created_at
+        )
+
+    def walk(self, url):
+        pages, seen = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return pages, seen
+
+    def test_forward_walk_is_complete_and_stable(self):
+        pages, seen = self.walk('/api/sprints/?page_size=4')
+        expected = list(Sprint.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page['results']) for page in pages], [4, 4, 3])
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_links_walk_backwards(self):
+        pages, _ = self.walk('/api/sprints/?page_size=4')
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual(response.data['results'], pages[1]['results'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(response.data['results'], pages[0]['results'])
+
+    def test_ordering_filter_with_nulls(self):
+        _, seen = self.walk('/api/sprints/?ordering=start_date&page_size=3')
+        self.assertEqual(len(seen), 11)
+        self.assertEqual(len(set(seen)), 11)
+        dates = [Sprint.objects.get(pk=pk).start_date for pk in seen]
+        self.assertEqual(dates[-4:], [None] * 4)  # NULLs last when ascending
+        self.assertEqual(dates[:7], sorted(dates[:7]))
+
+        _, seen_desc = self.walk('/api/sprints/?ordering=-start_date&page_size=3')
+        self.assertEqual(len(set(seen_desc)), 11)
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/sprints/?page_size=100')
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_count_is_optional(self):
+        self.assertNotIn('count', self.client.get('/api/sprints/').data)
+        response = self.client.get('/api/sprints/?count=true&status=planned')
+        self.assertEqual(response.data['count'], 11)
+        self.assertFalse(response.data['count_is_estimate'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/sprints/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def cursor(self, data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def test_tampered_cursors_are_not_found(self):
+        ordering = ['-created_at', '-id']
+        for data in [
+            {'o': ordering, 'p': ['not a date', 1]},
+            {'o': ordering, 'p': ['2025-01-01T00:00:00', 'x']},
+            {'o': ordering, 'p': [{'a': 1}, [2]]},
+            {'o': ordering, 'p': [None]},
+            {'o': ordering, 'p': 'ab'},
+            {'p': ['2025-01-01T00:00:00', 1]},
+            [1, 2],
+        ]:
+            with self.subTest(data=data):
+                response = self.client.get(f'/api/sprints/?cursor={self.cursor(data)}')
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_is_bound_to_its_ordering(self):
+        next_url = self.client.get('/api/sprints/?ordering=start_date&page_size=3').data['next']
+        response = self.client.get(next_url.replace('ordering=start_date', 'ordering=-name'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(next_url).status_code, status.HTTP_200_OK)
+
+    def test_related_field_orderings_are_rejected(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        from .views import SprintViewSet
+
+        with mock.patch.object(SprintViewSet, 'ordering_fields', ['name', 'milestone__name']):
+            response = self.client.get('/api/sprints/?ordering=milestone__name')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.data)
+
+        # A view configured with one is a server bug, not a bad request
+        with mock.patch.object(SprintViewSet, 'cursor_ordering', ('milestone__name',), create=True):
+            with self.assertRaises(ImproperlyConfigured):
+                self.client.get('/api/sprints/')
+
+
+class FullTextSearchTests(TenantOwnerMixin, APITestCase):
+    """Test the search filter's SQLite fallback and relevance-ordered pagination"""
+
+    def setUp(self):
+        self.set_up_tenant('search')
+        client = Client.objects.create(name="Acme Corp", email="acme@example.com", tenant=self.tenant)
+        project = Project.objects.create(name="Portal", client=client, tenant=self.tenant)
+        self.milestone = Milestone.objects.create(name="Launch", project=project, tenant=self.tenant)
+        for title, description in [
+            ("Fix login bug", ""),
+            ("Write docs", "Document the login flow"),
+            ("Deploy", "Ship it"),
+            ("Refactor authentication and login", ""),
+        ]:
+            Task.objects.create(title=title, description=description, milestone=self.milestone, tenant=self.tenant)
+
+    def test_search_tokens(self):
+        from .search import search_tokens
+        self.assertEqual(search_tokens("Fix: LOGIN-bug, o'neil_x"), ['fix', 'login', 'bug', 'o', 'neil', 'x'])
+        self.assertEqual(search_tokens(None), [])
+
+    def test_sqlite_falls_back_to_icontains(self):
+        response = self.client.get('/api/tasks/', {'search': 'login'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(task['title'] for task in response.data['results']),
+            ["Fix login bug", "Refactor authentication and login", "Write docs"],
+        )
+
+    def test_invoice_search_uses_client_name(self):
+        Invoice.objects.create(
+            client=Client.objects.get(name="Acme Corp"), project=Project.objects.get(), amount=Decimal('10.00'),
+            issued_at='2025-01-01', tenant=self.tenant,
+        )
+        self.assertEqual(len(self.client.get('/api/invoices/', {'search': 'acme'}).data['results']), 1)
+        self.assertEqual(len(self.client.get('/api/invoices/', {'search': 'globex'}).data['results']), 0)
+
+    def test_pagination_orders_by_search_rank(self):
+        from django.db.models.functions import Length
+        from rest_framework.request import Request
+
+        from .pagination import KeysetPagination
+
+        queryset = Task.objects.annotate(search_rank=Length('title'))
+        expected = list(queryset.order_by('-search_rank', '-id').values_list('id', flat=True))
+        seen, url = [], '/api/tasks/?page_size=3'
+        while url:
+            paginator = KeysetPagination()
+            request = Request(RequestFactory().get(url))
+            seen.extend(task.id for task in paginator.paginate_queryset(queryset, request))
+            url = paginator.get_next_link()
+        self.assertEqual(seen, expected)
+
+
+class ProgressRollupTests(TransactionTestCase):
+    """Test the incremental progress counters (autocommit path) and the repair commands"""
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Rollup Org")
+        client = Client.objects.create(name="Client", email="rollup@example.com", tenant=self.tenant)
+        self.project = Project.objects.create(name="Project", client=client, tenant=self.tenant)
+        self.m1 = Milestone.objects.create(name="M1", project=self.project, tenant=self.tenant)
+        self.m2 = Milestone.objects.create(name="M2", project=self.project, tenant=self.tenant)
+
+    def add_sprints(self, milestone, count, status='planned'):
+        return [
+            Sprint.objects.create(name=f"S{i}", milestone=milestone, tenant=self.tenant, status=status)
+            for i in range(count)
+        ]
+
+    def assertCounters(self, milestone, total, completed, progress):
+        milestone.refresh_from_db()
+        self.assertEqual(
+            (milestone.sprint_count, milestone.completed_sprint_count, milestone.progress),
+            (total, completed, progress),
+        )
+
+    def test_counters_follow_sprint_changes(self):
+        sprints = self.add_sprints(self.m1, 4)
+        self.add_sprints(self.m2, 1, status='completed')
+        self.assertCounters(self.m1, 4, 0, 0)
+        self.assertCounters(self.m2, 1, 1, 100)
+
+        sprint = Sprint.objects.get(pk=sprints[0].pk)
+        sprint.status = 'completed'
+        sprint.save()
+        self.assertCounters(self.m1, 4, 1, 25)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.milestone_count, self.project.milestone_progress_sum), (2, 125))
+        self.assertEqual(self.project.progress, 62)
+
+        # Moving a completed sprint updates both milestones
+        sprint.milestone = self.m2
+        sprint.save()
+        self.assertCounters(self.m1, 3, 0, 0)
+        self.assertCounters(self.m2, 2, 2, 100)
+
+        sprint.delete()
+        self.assertCounters(self.m2, 1, 1, 100)
+        self.m2.delete()
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.milestone_count, self.project.progress), (1, 0))
+
+    def test_sprint_save_cost_is_independent_of_siblings(self):
+        def status_change_queries(milestone, siblings):
+            sprint = self.add_sprints(milestone, siblings)[0]
+            sprint = Sprint.objects.get(pk=sprint.pk)
+            sprint.status = 'completed'
+            with CaptureQueriesContext(connection) as context:
+                sprint.save()
+            return len(context.captured_queries)
+
+        self.assertEqual(status_change_queries(self.m1, 2), status_change_queries(self.m2, 20))
+
+    def test_stale_instance_does_not_clobber_counters(self):
+        stale = Milestone.objects.get(pk=self.m1.pk)
+        self.add_sprints(Milestone.objects.get(pk=self.m1.pk), 2, status='completed')
+        stale.name = "Renamed"
+        stale.save()
+        self.assertCounters(self.m1, 2, 2, 100)
+
+    def test_verifier_repairs_drift(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        self.add_sprints(self.m1, 2, status='completed')
+        Milestone.objects.filter(pk=self.m1.pk).update(sprint_count=0, completed_sprint_count=0, progress=0)
+        Project.objects.filter(pk=self.project.pk).update(milestone_progress_sum=0, progress=0)
+
+        with self.assertRaises(CommandError):
+            call_command('verify_progress_rollups', stdout=StringIO())
+        call_command('verify_progress_rollups', fix=True, stdout=StringIO())
+        self.assertCounters(self.m1, 2, 2, 100)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.milestone_progress_sum, self.project.progress), (100, 50))
+        call_command('verify_progress_rollups', stdout=StringIO())
+
+    def test_recompute_progress_command(self):
+        from django.core.management import call_command
+
+        self.add_sprints(self.m1, 3, status='completed')
+        other = Tenant.objects.create(name="Other Org", domain="other-rollup")
+        other_milestone = Milestone.objects.create(
+            name="Other", tenant=other,
+            project=Project.objects.create(name="Other", client=self.project.client, tenant=other),
+        )
+        Milestone.objects.update(progress=7)
+        Project.objects.update(milestone_progress_sum=0, progress=0)
+
+        out = StringIO()
+        call_command('recompute_progress', tenant=[self.tenant.pk], chunk_size=1, stdout=out)
+        self.assertIn('milestones: 2 checked, 2 changed', out.getvalue())
+        self.assertIn('projects: 1 checked, 1 changed', out.getvalue())
+        self.assertCounters(self.m1, 3, 3, 100)
+        self.assertCounters(self.m2, 0, 0, 0)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.progress, 50)
+        # Other tenants are left alone
+        other_milestone.refresh_from_db()
+        self.assertEqual(other_milestone.progress, 7)
+
+        out = StringIO()
+        call_command('recompute_progress', stdout=out)
+        self.assertIn('Recomputed 5 rows, 1 changed', out.getvalue())
+
+
+class DirtySetTests(TestCase):
+    """Test that side effects are coalesced per transaction and run on commit"""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tenant = Tenant.objects.create(name="Dirty Org")
+            client = Client.objects.create(name="Client", email="dirty@example.com", tenant=self.tenant)
+            self.project = Project.objects.create(name="Project", client=client, tenant=self.tenant)
+            self.milestone = Milestone.objects.create(name="M", project=self.project, tenant=self.tenant)
+
+    def make_sprint(self, tasks):
+        with self.captureOnCommitCallbacks(execute=True):
+            sprint = Sprint.objects.create(name="S", milestone=self.milestone, tenant=self.tenant)
+            for i in range(tasks):
+                Task.objects.create(title=f"T{i}", milestone=self.milestone, sprint=sprint, tenant=self.tenant)
+        return sprint
+
+    def test_task_writes_share_one_flush(self):
+        def flush_queries(tasks):
+            sprint = self.make_sprint(tasks)
+            with self.captureOnCommitCallbacks() as callbacks:
+                for task in sprint.tasks.all():
+                    task.status = 'in_progress'
+                    task.save()
+            self.assertEqual(len(callbacks), 1)
+            with CaptureQueriesContext(connection) as context:
+                callbacks[0]()
+            sprint.refresh_from_db()
+            self.assertEqual(sprint.status, 'active')
+            return len(context.captured_queries)
+
+        self.assertEqual(flush_queries(3), flush_queries(15))
+
+    def test_rolled_back_writes_are_discarded(self):
+        sprint = self.make_sprint(1)
+        task = sprint.tasks.get()
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    task.status = 'in_progress'
+                    task.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = 'in_progress'
+            task.save()
+        sprint.refresh_from_db()
+        self.assertEqual(sprint.status, 'active')
+
+    def test_progress_moves_in_the_transaction_and_mail_waits_for_commit(self):
+        from django.core import mail
+
+        sprint = self.make_sprint(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            sprint.status = 'active'
+            sprint.save()
+        with self.captureOnCommitCallbacks() as callbacks:
+            sprint.status = 'completed'
+            sprint.save()
+            # The counters take the delta in the same transaction, without a recount
+            self.milestone.refresh_from_db()
+            self.project.refresh_from_db()
+            self.assertEqual((self.milestone.completed_sprint_count, self.milestone.progress), (1, 100))
+            self.assertEqual(self.project.progress, 100)
+            self.assertEqual(len(mail.outbox), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_auto_transitions_are_logged(self):
+        sprint = self.make_sprint(1)
+        task = sprint.tasks.get()
+        with self.assertLogs('project.rollups', 'INFO') as logs, self.captureOnCommitCallbacks(execute=True):
+            task.status = 'in_progress'
+            task.save()
+        self.assertEqual(logs.output, ["INFO:project.rollups:Auto-activated sprint 'S'"])
+
+    def test_rolled_back_saves_leave_the_counters(self):
+        class Abort(Exception):
+            pass
+
+        sprint = self.make_sprint(0)
+        with self.assertRaises(Abort), transaction.atomic():
+            sprint.status = 'completed'
+            sprint.save()
+            raise Abort
+        self.milestone.refresh_from_db()
+        self.assertEqual((self.milestone.sprint_count, self.milestone.completed_sprint_count, self.milestone.progress), (1, 0, 0))
+
+    def test_every_view_can_run_with_atomic_requests(self):
+        from django.core.handlers.base import BaseHandler
+        from django.urls import URLPattern, URLResolver, get_resolver
+
+        # The test databases carry production's DB_ATOMIC_REQUESTS default
+        self.assertTrue(connection.settings_dict['ATOMIC_REQUESTS'])
+
+        def views(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from views(pattern.url_patterns)
+                elif isinstance(pattern, URLPattern):
+                    yield pattern.callback
+
+        handler = BaseHandler()
+        for alias in connections:
+            patcher = mock.patch.dict(connections[alias].settings_dict, {'ATOMIC_REQUESTS': True})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for view in views(get_resolver().url_patterns):
+            # Raises RuntimeError for an async view that isn't exempt on every alias
+            handler.make_view_atomic(view)
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class BulkUpdateRollupTests(TenantOwnerMixin, APITestCase):
+    """Test that the bulk update endpoints leave sprint status and progress consistent"""
+
+    def setUp(self):
+        self.set_up_tenant('bulk')
+        with self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.create(name="Client", email="client@bulk.com", tenant=self.tenant)
+            self.project = Project.objects.create(name="Project", client=client, tenant=self.tenant)
+
+    def seed(self, milestones, sprints, tasks):
+        self.seed_tree(self.project, milestones=milestones, sprints=sprints, tasks=tasks, sprint_status='active')
+
+    def post(self, path, data):
+        # Capture outermost so the on-commit rollups are counted too
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(path, data, format='json', HTTP_HOST='bulk.example.com')
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries)
+
+    def test_bulk_task_update_completes_sprints_and_rolls_up(self):
+        self.seed(milestones=2, sprints=2, tasks=3)
+        first = Sprint.objects.filter(milestone__name="M0").first()
+        self.post('/api/tasks/bulk_update_tasks/', {'task_ids': list(first.tasks.values_list('id', flat=True)), 'status': 'done'})
+        first.refresh_from_db()
+        self.project.refresh_from_db()
+        self.assertEqual(first.status, 'completed')
+        self.assertEqual(Milestone.objects.get(name="M0").progress, 50)
+        self.assertEqual(self.project.progress, 25)
+
+        self.post('/api/tasks/bulk_update_tasks/', {'task_ids': list(Task.objects.values_list('id', flat=True)), 'status': 'done'})
+        self.project.refresh_from_db()
+        self.assertFalse(Sprint.objects.exclude(status='completed').exists())
+        self.assertEqual(self.project.progress, 100)
+        self.assertEqual(set(Milestone.objects.values_list('completed_sprint_count', 'progress')), {(2, 100)})
+
+    def test_bulk_cost_is_independent_of_size(self):
+        def bulk_queries(milestones):
+            Milestone.objects.all().delete()
+            self.seed(milestones, sprints=2, tasks=2)
+            return self.post('/api/tasks/bulk_update_tasks/', {'task_ids': list(Task.objects.values_list('id', flat=True)), 'status': 'done'})
+
+        bulk_queries(1)  # warm the tenant and user lookups
+        self.assertEqual(bulk_queries(1), bulk_queries(5))
+
+    def test_refresh_project_progress(self):
+        self.seed(milestones=3, sprints=2, tasks=0)
+        Sprint.objects.filter(name__endswith='.0').update(status='completed')
+        self.post('/api/projects/%d/refresh_project_progress/' % self.project.pk, {})
+        self.project.refresh_from_db()
+        self.assertEqual(set(Milestone.objects.values_list('completed_sprint_count', 'progress')), {(1, 50)})
+        self.assertEqual((self.project.milestone_count, self.project.progress), (3, 50))
+
+        # Cost doesn't grow with the number of milestones
+        queries = self.post('/api/projects/%d/refresh_project_progress/' % self.project.pk, {})
+        self.seed(milestones=5, sprints=2, tasks=0)
+        Sprint.objects.update(status='completed')
+        self.assertEqual(self.post('/api/projects/%d/refresh_project_progress/' % self.project.pk, {}), queries + 2)
+
+    def test_bulk_sprint_update_rolls_up(self):
+        from django.core import mail
+
+        self.seed(milestones=1, sprints=4, tasks=0)
+        sprint_ids = list(Sprint.objects.order_by('id').values_list('id', flat=True)[:3])
+        self.post('/api/sprints/bulk_update_sprints/', {'sprint_ids': sprint_ids, 'status': 'completed'})
+        milestone = Milestone.objects.get()
+        self.project.refresh_from_db()
+        self.assertEqual((milestone.completed_sprint_count, milestone.progress), (3, 75))
+        self.assertEqual(self.project.progress, 75)
+        self.assertEqual(len(mail.outbox), 3)
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class ProjectTreeTests(TenantOwnerMixin, APITestCase):
+    """Test the nested project tree endpoint"""
+
+    def setUp(self):
+        self.set_up_tenant('tree')
+        with self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.create(name="Client", email="client@tree.com", tenant=self.tenant)
+            self.project = Project.objects.create(name="Board", client=client, tenant=self.tenant)
+
+    def seed(self, milestones, sprints, tasks):
+        self.seed_tree(self.project, milestones=milestones, sprints=sprints, tasks=tasks, backlog=1)
+
+    def get_tree(self, query=''):
+        return self.client.get(f'/api/projects/{self.project.pk}/tree/{query}', HTTP_HOST='tree.example.com')
+
+    def test_full_tree(self):
+        self.seed(milestones=2, sprints=2, tasks=2)
+        response = self.get_tree()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], "Board")
+        milestone = response.data['milestones'][0]
+        self.assertEqual([s['name'] for s in milestone['sprints']], ["S0.0", "S0.1"])
+        self.assertEqual([t['title'] for t in milestone['sprints'][0]['tasks']], ["T0.0.0", "T0.0.1"])
+        self.assertEqual([t['title'] for t in milestone['backlog']], ["Backlog 0.0"])
+
+    def test_query_count_is_fixed(self):
+        def tree_queries(milestones):
+            Milestone.objects.all().delete()
+            self.seed(milestones, sprints=3, tasks=3)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.get_tree().status_code, 200)
+            return len(context.captured_queries)
+
+        tree_queries(1)  # warm the tenant and user lookups
+        self.assertEqual(tree_queries(1), tree_queries(6))
+
+    def test_exact_queries(self):
+        self.seed(milestones=2, sprints=2, tasks=2)
+        self.get_tree()  # warm the tenant and user lookups
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.get_tree().status_code, 200)
+        # The project (with its tenant id for the permission check), then one query per level
+        tables = [sql.split(' FROM ')[1].split()[0] for sql in data_queries(context.captured_queries)]
+        self.assertEqual(tables, ['"project_project"', '"project_milestone"', '"project_sprint"', '"project_task"', '"project_task"'])
+
+    def test_depth_and_fields(self):
+        self.seed(milestones=1, sprints=1, tasks=1)
+        response = self.get_tree('?depth=1')
+        self.assertNotIn('sprints', response.data['milestones'][0])
+        self.assertNotIn('backlog', response.data['milestones'][0])
+
+        response = self.get_tree('?fields[project]=id,milestones&fields[milestone]=name,sprints&fields[sprint]=tasks&fields[task]=id,status')
+        self.assertEqual(set(response.data), {'id', 'milestones'})
+        self.assertEqual(set(response.data['milestones'][0]), {'name', 'sprints'})
+        self.assertEqual(set(response.data['milestones'][0]['sprints'][0]['tasks'][0]), {'id', 'status'})
+
+        self.assertEqual(self.get_tree('?depth=7').status_code, 400)
+        self.assertEqual(self.get_tree('?fields[task]=title,secret').status_code, 400)
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class SparseFieldsetTests(TenantOwnerMixin, APITestCase):
+    """Test ?fields=, ?omit= and ?expand= and the querysets they prune"""
+
+    def setUp(self):
+        self.set_up_tenant('sparse')
+
+    def seed(self, count):
+        self.seed_projects(count, sprints=0, backlog=1)
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, HTTP_HOST='sparse.example.com')
+        return response, context.captured_queries
+
+    def test_fields_and_omit(self):
+        self.seed(2)
+        response, _ = self.get('/api/projects/?fields=id,name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+        response, queries = self.get('/api/tasks/?omit=description,milestone_name')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('description', response.data['results'][0])
+        self.assertIn('title', response.data['results'][0])
+        task_query = next(q['sql'] for q in queries if 'FROM "project_task"' in q['sql'])
+        self.assertNotIn('"project_task"."description"', task_query)
+
+    def test_unrequested_prefetches_are_skipped(self):
+        self.seed(2)
+        self.get('/api/projects/?fields=id')  # warm the tenant and user lookups
+        _, full = self.get('/api/projects/')
+        _, sparse = self.get('/api/projects/?fields=id,name,progress')
+        # team_members and access_groups aren't prefetched
+        self.assertEqual(len(full) - len(sparse), 2)
+
+    def test_expand(self):
+        def expand_queries(count):
+            Project.objects.all().delete()
+            self.seed(count)
+            response, queries = self.get('/api/projects/?expand=client&fields=id,client')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(set(response.data['results'][0]['client']), {'id', 'name', 'email', 'status'})
+            return len(queries)
+
+        expand_queries(1)  # warm the tenant and user lookups
+        self.assertEqual(expand_queries(1), expand_queries(5))
+
+    def test_cursor_reads_deferred_ordering_field(self):
+        self.seed(3)
+        response, queries = self.get('/api/projects/?fields=id&ordering=name&page_size=2')
+        self.assertEqual([p['id'] for p in response.data['results']], list(
+            Project.objects.order_by('name').values_list('id', flat=True)[:2]
+        ))
+        response, _ = self.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_invalid_names(self):
+        self.assertEqual(self.get('/api/projects/?fields=id,secret')[0].status_code, 400)
+        self.assertEqual(self.get('/api/projects/?expand=milestones')[0].status_code, 400)
+
+
+class RendererTests(APITestCase):
+    """Test the orjson and MessagePack renderers against DRF's JSON ones"""
+
+    def test_orjson_matches_json_renderer(self):
+        import datetime
+        import uuid
+
+        from django.utils import timezone
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+
+        from .renderers import ORJSONRenderer
+
+        data = {
+            'amount': Decimal('12.50'),
+            'at': datetime.datetime(2024, 1, 2, 3, 4, 5, 600000, tzinfo=datetime.timezone.utc),
+            'local': timezone.now().date(),
+            'id': uuid.UUID(int=1),
+            'label': gettext_lazy('Done'),
+            'items': (1, 'two', None, True),
+            'text': 'naïve',
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b'\n  ', ORJSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_orjson_parser(self):
+        from rest_framework.exceptions import ParseError
+
+        from .renderers import ORJSONParser
+
+        self.assertEqual(ORJSONParser().parse(BytesIO(b'{"a": [1, 2.5]}')), {'a': [1, 2.5]})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a": NaN}'))
+
+    def test_msgpack_is_negotiated(self):
+        import msgpack
+
+        user = CustomUser.objects.create_user(email='msgpack@example.com', password='pass')
+        self.client.force_authenticate(user=user)
+        response = self.client.get(f'/api/users/{user.pk}/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['email'], 'msgpack@example.com')
+
+        response = self.client.get(f'/api/users/{user.pk}/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content)['email'], 'msgpack@example.com')
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class ConditionalGetTests(TenantOwnerMixin, APITestCase):
+    """Test ETag/Last-Modified validators and 304 responses"""
+
+    def setUp(self):
+        self.set_up_tenant('initech')
+        with self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.create(name='Initech client', email='client@initech.com', tenant=self.tenant)
+            self.project = Project.objects.create(name='TPS', client=client, tenant=self.tenant)
+            self.milestone = Milestone.objects.create(name='M1', project=self.project, tenant=self.tenant)
+            self.task = Task.objects.create(title='Cover sheet', milestone=self.milestone, tenant=self.tenant)
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, path, **headers):
+        return self.client.get(path, HTTP_HOST='initech.example.com', **headers)
+
+    def test_matching_etag_returns_304_without_queries(self):
+        response = self.get('/api/tasks/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('private', response['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(data_queries(queries), [])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        # Another query string or format is another representation
+        self.assertEqual(self.get('/api/tasks/?ordering=title', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT='application/msgpack').status_code, 200)
+
+    def test_detail_304_checks_the_object_first(self):
+        path = f'/api/tasks/{self.task.pk}/'
+        etag = self.get(path)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(data_queries(queries)), 1)
+
+        # Gone without any generation bump (raw SQL): a 404, not a stale 304
+        Task.objects.filter(pk=self.task.pk)._raw_delete(connection.alias)
+        self.assertEqual(self.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_writes_change_the_etag(self):
+        detail = self.get(f'/api/tasks/{self.task.pk}/')['ETag']
+        listing = self.get('/api/projects/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = 'New cover sheet'
+            self.task.save()
+
+        response = self.get(f'/api/tasks/{self.task.pk}/', HTTP_IF_NONE_MATCH=detail)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'New cover sheet')
+        # Project lists don't show tasks, so the write leaves their ETag alone
+        self.assertEqual(self.get('/api/projects/', HTTP_IF_NONE_MATCH=listing).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milestone.delete()
+        self.assertEqual(self.get('/api/projects/', HTTP_IF_NONE_MATCH=listing).status_code, 200)
+
+    def test_access_changes_change_the_etag(self):
+        etag = self.get('/api/projects/')['ETag']
+        self.assertEqual(self.get('/api/projects/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # The permission set comes out the same, but the snapshot it came from changed
+        self.user.groups.add(Group.objects.create(name='Initech Auditors'))
+        response = self.get('/api/projects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.tenant.name = 'Initrode'
+        self.tenant.save()
+        response = self.get('/api/projects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get('/api/projects/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_if_modified_since(self):
+        response = self.get('/api/milestones/')
+        last_modified = response['Last-Modified']
+        self.assertEqual(self.get('/api/milestones/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(
+            self.get('/api/milestones/', HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200
+        )
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class DeltaSyncTests(TenantOwnerMixin, APITestCase):
+    """Test the change log and GET /api/sync/"""
+
+    def setUp(self):
+        self.set_up_tenant('hooli')
+        with self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.create(name='Hooli client', email='client@hooli.com', tenant=self.tenant)
+            self.project = Project.objects.create(name='Nucleus', client=client, tenant=self.tenant)
+            self.milestone = Milestone.objects.create(name='M1', project=self.project, tenant=self.tenant)
+            self.sprint = Sprint.objects.create(name='S1', milestone=self.milestone, tenant=self.tenant)
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, since=0, **params):
+        return self.client.get('/api/sync/', {'since': since, **params}, HTTP_HOST='hooli.example.com')
+
+    def test_initial_sync_returns_everything(self):
+        response = self.sync()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['has_more'])
+        changes = {(change['model'], change['action']) for change in response.data['changes']}
+        self.assertEqual(changes, {('client', 'created'), ('project', 'created'), ('milestone', 'created'), ('sprint', 'created')})
+        project = next(change for change in response.data['changes'] if change['model'] == 'project')
+        self.assertEqual(project['data']['name'], 'Nucleus')
+        self.assertEqual(self.sync(response.data['cursor']).data['changes'], [])
+
+    def test_changes_since_cursor_include_rollups_and_tombstones(self):
+        cursor = self.sync().data['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title='Compress', milestone=self.milestone, sprint=self.sprint, tenant=self.tenant)
+            task.title = 'Compress more'
+            task.save()
+            self.sprint.status = 'completed'
+            self.sprint.save()
+
+        response = self.sync(cursor)
+        changes = {change['model']: change for change in response.data['changes']}
+        # Saved twice in one transaction: one created entry with the final row
+        self.assertEqual(changes['task']['action'], 'created')
+        self.assertEqual(changes['task']['data']['title'], 'Compress more')
+        # Progress rolled up on commit is a change too
+        self.assertEqual(changes['milestone']['data']['progress'], 100)
+        self.assertEqual(changes['project']['action'], 'updated')
+
+        cursor, task_id = response.data['cursor'], task.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delete()
+        changes = self.sync(cursor).data['changes']
+        self.assertEqual([(c['model'], c['id'], c['action'], c['data']) for c in changes if c['model'] == 'task'],
+                         [('task', task_id, 'deleted', None)])
+
+    def test_bulk_updates_are_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks = [Task.objects.create(title=f'T{i}', milestone=self.milestone, tenant=self.tenant) for i in range(3)]
+        cursor = self.sync().data['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/tasks/bulk_update_tasks/',
+                {'task_ids': [task.pk for task in tasks], 'status': 'in_progress'},
+                format='json', HTTP_HOST='hooli.example.com',
+            )
+        self.assertEqual(response.status_code, 200)
+        changes = self.sync(cursor).data['changes']
+        self.assertEqual(sorted(c['id'] for c in changes if c['model'] == 'task'), [task.pk for task in tasks])
+
+    def test_log_is_written_in_the_data_transaction(self):
+        before = ChangeLogEntry.objects.count()
+        with self.captureOnCommitCallbacks(execute=False):
+            task = Task.objects.create(title='Pending', milestone=self.milestone, tenant=self.tenant)
+            # Logged before the commit hooks run, so a crash after commit can't lose it
+            self.assertTrue(ChangeLogEntry.objects.filter(model='task', object_id=task.pk, action='created').exists())
+
+        class Abort(Exception):
+            pass
+
+        with self.assertRaises(Abort), transaction.atomic():
+            Task.objects.create(title='Rolled back', milestone=self.milestone, tenant=self.tenant)
+            raise Abort
+        # The entry rolls back with the row
+        self.assertEqual(ChangeLogEntry.objects.count(), before + 1)
+
+    def test_paging(self):
+        response = self.sync(limit=2)
+        self.assertTrue(response.data['has_more'])
+        self.assertEqual(len(response.data['changes']), 2)
+        rest = self.sync(response.data['cursor'], limit=10).data
+        self.assertFalse(rest['has_more'])
+        # Every write is an entry; between them the pages cover each row
+        rows = {(change['model'], change['id']) for change in response.data['changes'] + rest['changes']}
+        self.assertEqual({model for model, _ in rows}, {'client', 'project', 'milestone', 'sprint'})
+        self.assertEqual(len(rows), 4)
+
+    def test_the_feed_waits_for_transactions_still_running(self):
+        # SQLite stand-ins for PostgreSQL's transaction functions; each write
+        # below plays a transaction with the id in xact['id']
+        xact = {'id': 0, 'xmin': 1}
+        connection.ensure_connection()
+        connection.connection.create_function('pg_current_xact_id', 0, lambda: xact['id'])
+        connection.connection.create_function('pg_current_snapshot', 0, lambda: None)
+        connection.connection.create_function('pg_snapshot_xmin', 1, lambda snapshot: xact['xmin'])
+
+        def task_titles(response):
+            return [change['data']['title'] for change in response.data['changes'] if change['model'] == 'task']
+
+        with mock.patch('project.sync.tracks_transactions', return_value=True):
+            cursor = self.sync().data['cursor']
+            # A long transaction (11) logs a task first, then a short one (10) logs one after it
+            for xid, title in [(11, 'Long'), (10, 'Short')]:
+                xact['id'] = xid
+                with self.captureOnCommitCallbacks(execute=True):
+                    Task.objects.create(title=title, milestone=self.milestone, tenant=self.tenant)
+            long_entry = ChangeLogEntry.objects.get(model='task', object_id=Task.objects.get(title='Long').pk)
+
+            # 10 committed, 11 still running: the cursor passes the short one's higher sequence...
+            xact['xmin'] = 11
+            response = self.sync(cursor)
+            self.assertEqual(task_titles(response), ['Short'])
+            self.assertGreater(response.data['cursor'], long_entry.pk)
+
+            # ...and the long one still arrives once it commits
+            xact['xmin'] = 12
+            response = self.sync(response.data['cursor'])
+            self.assertEqual(task_titles(response), ['Long'])
+            self.assertEqual(self.sync(response.data['cursor']).data['changes'], [])
+
+            self.assertEqual(self.sync(long_entry.pk + 1000).status_code, 400)
+
+    def test_poll_cost_does_not_grow_with_table(self):
+        cursor = self.sync().data['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.bulk_create([Task(title=f'Old {i}', milestone=self.milestone, tenant=self.tenant) for i in range(50)])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.sync(cursor)
+        self.assertEqual(response.data['changes'], [])
+        self.assertLessEqual(len(data_queries(queries)), 2)
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class LiveEventTests(TenantOwnerMixin, TestCase):
+    """Test change events published on commit and the SSE stream"""
+
+    def setUp(self):
+        # As in production: request-wide transactions on every alias, which
+        # Django refuses to combine with an async view unless it is exempt
+        for alias in connections:
+            patcher = mock.patch.dict(connections[alias].settings_dict, {'ATOMIC_REQUESTS': True})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.set_up_tenant('piedpiper', name='Pied Piper')
+        with self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.create(name='Pied Piper client', email='client@piedpiper.com', tenant=self.tenant)
+            self.project = Project.objects.create(name='Compression', client=client, tenant=self.tenant)
+            self.milestone = Milestone.objects.create(name='M1', project=self.project, tenant=self.tenant)
+            self.sprint = Sprint.objects.create(name='S1', milestone=self.milestone, tenant=self.tenant)
+        from rest_framework.authtoken.models import Token
+        self.token = Token.objects.create(user=self.user).key
+
+    def stream(self, query='', authenticate=True):
+        # AsyncClient always sends Host: testserver, so build the scope by hand to reach the tenant
+        headers = [(b'host', b'piedpiper.example.com')]
+        if authenticate:
+            headers.append((b'authorization', f'Token {self.token}'.encode()))
+        return self.async_client.request(method='GET', path='/api/events/', query_string=query, headers=headers)
+
+    def create_task(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Middle out', milestone=self.milestone, sprint=self.sprint, tenant=self.tenant)
+
+    async def test_commit_publishes_to_tenant_and_project_channels(self):
+        from .events import get_broker, project_channel, tenant_channel
+
+        broker = get_broker()
+        async with broker.subscribe(tenant_channel(self.tenant.pk)) as tenant_events:
+            async with broker.subscribe(project_channel(self.tenant.pk, self.project.pk)) as project_events:
+                await sync_to_async(self.create_task)()
+                event = json.loads(await project_events(1))
+                self.assertEqual(await tenant_events(1), json.dumps(event))
+        self.assertEqual((event['model'], event['action'], event['project']), ('task', 'created', self.project.pk))
+        self.assertTrue(await ChangeLogEntry.objects.filter(pk=event['seq'], model='task').aexists())
+
+    async def test_redis_streams_share_one_connection(self):
+        from .events import RedisBroker, tenant_channel
+
+        class PubSub:
+            def __init__(self):
+                self.channels, self.messages = set(), asyncio.Queue()
+
+            async def subscribe(self, channel):
+                self.channels.add(channel)
+
+            async def unsubscribe(self, channel):
+                self.channels.discard(channel)
+
+            async def get_message(self, ignore_subscribe_messages, timeout):
+                try:
+                    return await asyncio.wait_for(self.messages.get(), timeout)
+                except asyncio.TimeoutError:
+                    return None
+
+        pubsub, opened = PubSub(), []
+
+        def from_url(url):
+            opened.append(url)
+            return mock.Mock(pubsub=mock.Mock(return_value=pubsub))
+
+        channel = tenant_channel(self.tenant.pk)
+        with mock.patch('redis.asyncio.Redis.from_url', from_url):
+            broker = RedisBroker('redis://events')
+            async with broker.subscribe(channel) as first, broker.subscribe(channel) as second:
+                self.assertEqual(pubsub.channels, {channel})
+                pubsub.messages.put_nowait({'type': 'message', 'channel': channel.encode(), 'data': b'{"seq": 1}'})
+                self.assertEqual(await first(1), '{"seq": 1}')
+                self.assertEqual(await second(1), '{"seq": 1}')
+            self.assertEqual(pubsub.channels, set())
+            # With nobody subscribed the reader stops at its next message or timeout
+            pubsub.messages.put_nowait(None)
+            await broker.subscriptions().reader
+        self.assertEqual(opened, ['redis://events'])
+
+    async def test_stream(self):
+        response = await self.stream(f'project={self.project.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        frame = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)  # Let the stream subscribe
+        await sync_to_async(self.create_task)()
+        frame = (await asyncio.wait_for(frame, 1)).decode()
+        self.assertIn('event: task.created\n', frame)
+        self.assertIn(f'"project": {self.project.pk}', frame)
+        await stream.aclose()
+
+    async def test_stream_access(self):
+        self.assertEqual((await self.stream(authenticate=False)).status_code, 401)
+        self.assertEqual((await self.stream('project=999999')).status_code, 404)
+
+    def test_stream_needs_asgi(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/events/', HTTP_HOST='piedpiper.example.com').status_code, 501)
+
+
+class ConnectionSettingsTests(TestCase):
+    """Test the DB_CONN_MAX_AGE / DB_POOL connection settings and their benchmark"""
+
+    def test_persistent_connections_by_default(self):
+        from saasCRM.databases import apply_connection_settings
+
+        databases = {
+            'default': {'ENGINE': 'django.db.backends.postgresql', 'OPTIONS': {'sslmode': 'require'}},
+            'local': {'ENGINE': 'django.db.backends.sqlite3'},
+        }
+        with mock.patch.dict('os.environ', {'DB_CONN_MAX_AGE': '120'}):
+            apply_connection_settings(databases)
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 120)
+        self.assertTrue(databases['default']['CONN_HEALTH_CHECKS'])
+        self.assertEqual(databases['default']['OPTIONS'], {'sslmode': 'require'})
+        self.assertNotIn('CONN_MAX_AGE', databases['local'])
+
+    def test_pool(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        from saasCRM.databases import connection_settings
+
+        with mock.patch.dict('os.environ', {'DB_POOL': 'true', 'DB_POOL_MAX_SIZE': '8'}):
+            with mock.patch.dict('sys.modules', {'psycopg': mock.MagicMock()}):
+                settings = connection_settings()
+            self.assertEqual(settings['CONN_MAX_AGE'], 0)
+            self.assertEqual(settings['OPTIONS']['pool']['max_size'], 8)
+            with mock.patch.dict('sys.modules', {'psycopg': None}):
+                with self.assertRaises(ImproperlyConfigured):
+                    connection_settings()
+
+    def test_benchmark_connections_command(self):
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('benchmark_connections', requests=5, stdout=out)
+        self.assertIn('Connection reuse saves', out.getvalue())
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 0)
+
+
+class ReplicaRoutingTests(TestCase):
+    """Test read replica routing and read-your-writes pinning"""
+
+    replicas = {'default': ['replica_a', 'replica_b']}
+
+    def setUp(self):
+        from saasCRM.db_routers import DBRouter, end_request, replica_monitor
+
+        self.router = DBRouter()
+        self.lags = {'replica_a': 0, 'replica_b': 0}
+        patcher = mock.patch.object(replica_monitor, 'lag', side_effect=lambda alias: self.lags[alias])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(replica_monitor.reset)
+        self.addCleanup(end_request)
+        replica_monitor.reset()
+
+    def test_add_replicas(self):
+        from saasCRM.databases import add_replicas
+
+        databases = {'default': {'ENGINE': 'django.db.backends.postgresql', 'HOST': 'db', 'PORT': '5432', 'ATOMIC_REQUESTS': True}}
+        replicas = add_replicas(databases, hosts='replica1, replica2:5433')
+        self.assertEqual(replicas, {'default': ['default_replica_1', 'default_replica_2']})
+        self.assertEqual(databases['default_replica_2']['HOST'], 'replica2')
+        self.assertEqual(databases['default_replica_2']['PORT'], '5433')
+        self.assertEqual(databases['default_replica_1']['PORT'], '5432')
+        self.assertFalse(databases['default_replica_1']['ATOMIC_REQUESTS'])
+        self.assertEqual(databases['default_replica_1']['TEST'], {'MIRROR': 'default'})
+        self.assertEqual(add_replicas({'default': {'ENGINE': 'django.db.backends.sqlite3'}}, hosts='replica1'), {})
+
+    @override_settings(DATABASE_REPLICAS=replicas)
+    def test_reads_round_robin_until_the_request_writes(self):
+        from saasCRM.db_routers import start_request
+
+        self.assertEqual(self.router.db_for_read(Task), 'default')  # outside a request
+
+        state = start_request()
+        reads = {self.router.db_for_read(Task) for _ in range(4)}
+        self.assertEqual(reads, {'replica_a', 'replica_b'})
+
+        self.assertEqual(self.router.db_for_write(Task), 'default')
+        self.assertTrue(state.wrote)
+        self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    @override_settings(DATABASE_REPLICAS=replicas, REPLICA_MAX_LAG_SECONDS=5)
+    def test_lagging_or_unreachable_replicas_leave_rotation(self):
+        from saasCRM.db_routers import replica_monitor, start_request
+
+        start_request()
+        self.lags['replica_a'] = 30
+        self.assertEqual({self.router.db_for_read(Task) for _ in range(4)}, {'replica_b'})
+
+        del self.lags['replica_b']  # lag() raises: unreachable
+        replica_monitor.reset()
+        self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    @override_settings(DATABASE_REPLICAS=replicas)
+    def test_migrations_skip_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica_a', 'project'))
+        self.assertTrue(self.router.allow_migrate('default', 'project'))
+        self.assertTrue(self.router.allow_migrate('default', 'accounts'))
+
+    @override_settings(DATABASE_REPLICAS=replicas, REPLICA_PIN_SECONDS=15)
+    def test_middleware_pins_clients_and_tenants_that_wrote(self):
+        from django.http import HttpResponse
+
+        from saasCRM import db_routers
+
+        from .middleware import PrimaryPinMiddleware
+
+        tenant = Tenant.objects.create(name='Pinned', domain='pinned')
+        seen = []
+
+        def view(request):
+            seen.append(request.db_routing.pinned)
+            if request.method == 'POST':
+                self.router.db_for_write(Task)
+            return HttpResponse()
+
+        middleware = PrimaryPinMiddleware(view)
+        factory = RequestFactory()
+
+        request = factory.get('/api/tasks/')
+        response = middleware(request)
+        self.assertNotIn(PrimaryPinMiddleware.cookie_name, response.cookies)
+        self.assertIsNone(db_routers._routing.get())
+
+        request = factory.post('/api/tasks/')
+        request.tenant = tenant
+        response = middleware(request)
+        cookie = response.cookies[PrimaryPinMiddleware.cookie_name]
+
+        request = factory.get('/api/tasks/')
+        request.COOKIES[PrimaryPinMiddleware.cookie_name] = cookie.value
+        middleware(request)
+
+        request = factory.get('/api/tasks/')
+        request.tenant = tenant
+        middleware(request)
+
+        request = factory.get('/api/tasks/')
+        middleware(request)
+        self.assertEqual(seen, [False, True, True, True, False])
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class TenantShardingTests(TenantOwnerMixin, APITestCase):
+    """Test tenant shard routing and the move_tenant_shard command"""
+
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        self.set_up_tenant('initech')
+        with self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.create(name='Initech client', email='client@initech.com', tenant=self.tenant)
+            self.project = Project.objects.create(name='TPS', client=client, tenant=self.tenant)
+            self.project.team_members.add(self.user)
+            milestone = Milestone.objects.create(name='M1', project=self.project, tenant=self.tenant, assignee=self.user)
+            self.tasks = [
+                Task.objects.create(title=f'Report {i}', milestone=milestone, tenant=self.tenant, assignee=self.user)
+                for i in range(3)
+            ]
+        self.client.force_authenticate(user=self.user)
+
+    def move(self, **options):
+        from django.core.management import call_command
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('move_tenant_shard', 'initech', 'shard_1', settle=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_router_follows_the_current_shard(self):
+        from saasCRM.db_routers import DBRouter, using_shard
+
+        router = DBRouter()
+        self.assertEqual(router.db_for_read(Task), 'default')
+        with using_shard('shard_1'):
+            self.assertEqual(router.db_for_read(Task), 'shard_1')
+            self.assertEqual(router.db_for_write(Project), 'shard_1')
+            self.assertEqual(router.db_for_read(Tenant), 'default')
+        self.assertEqual(router.db_for_write(Task), 'default')
+        self.assertTrue(router.allow_migrate('shard_1', 'accounts'))
+
+    def test_move_copies_rows_flips_the_map_and_purges_the_source(self):
+        counts = {model: model.objects.using('default').filter(tenant=self.tenant).count()
+                  for model in (Client, Project, Milestone, Task, ChangeLogEntry)}
+        entry = ChangeLogEntry.objects.using('default').filter(tenant=self.tenant).first()
+        output = self.move(batch_size=2)
+        self.assertIn('Moved initech from default to shard_1', output)
+
+        for model, count in counts.items():
+            self.assertEqual(model.objects.using('shard_1').filter(tenant=self.tenant).count(), count, model)
+            self.assertFalse(model.objects.using('default').filter(tenant=self.tenant).exists(), model)
+        self.assertEqual(Project.team_members.through.objects.using('shard_1').count(), 1)
+        self.assertEqual(ChangeLogEntry.objects.using('shard_1').get(pk=entry.pk).created_at, entry.created_at)
+        shard = TenantShard.objects.get(tenant=self.tenant)
+        self.assertEqual((shard.alias, shard.moving), ('shard_1', False))
+
+        # Requests for the tenant now read and write the shard
+        task = self.tasks[0]
+        Task.objects.using('shard_1').filter(pk=task.pk).update(title='Only on the shard')
+        response = self.client.get(f'/api/tasks/{task.pk}/', HTTP_HOST='initech.example.com')
+        self.assertEqual(response.data['title'], 'Only on the shard')
+        response = self.client.patch(f'/api/tasks/{task.pk}/', {'title': 'Patched'}, format='json', HTTP_HOST='initech.example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Task.objects.using('shard_1').get(pk=task.pk).title, 'Patched')
+
+        with self.assertRaisesMessage(CommandError, 'already on shard_1'):
+            self.move()
+
+    def test_shared_rows_are_replicated_to_hosting_shards(self):
+        self.move()
+        self.assertTrue(CustomUser.objects.using('shard_1').filter(pk=self.user.pk).exists())
+        self.assertEqual(Tenant.objects.using('shard_1').get(pk=self.tenant.pk).domain, 'initech')
+
+        # Later saves and deletes on default follow once they commit
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = CustomUser.objects.create_user(email='milton@initech.com', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/tasks/{self.tasks[0].pk}/', {'assignee': newcomer.pk}, format='json', HTTP_HOST='initech.example.com'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Task.objects.using('shard_1').get(pk=self.tasks[0].pk).assignee_id, newcomer.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer.delete()
+        self.assertFalse(CustomUser.objects.using('shard_1').filter(pk=newcomer.pk).exists())
+        self.assertIsNone(Task.objects.using('shard_1').get(pk=self.tasks[0].pk).assignee_id)
+
+    def test_move_onto_a_shard_hosting_another_tenant(self):
+        from saasCRM.db_routers import using_shard
+
+        from .sharding import id_range
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other, owner = self.create_tenant_owner('initrode')
+            TenantShard.objects.create(tenant=other, alias='shard_1')
+        with using_shard('shard_1'), self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.create(name='Initrode client', email='client@initrode.com', tenant=other)
+            project = Project.objects.create(name='Jump to conclusions', client=client, tenant=other)
+            project.team_members.add(owner)
+            milestone = Milestone.objects.create(name='M1', project=project, tenant=other)
+            task = Task.objects.create(title='Mat', milestone=milestone, tenant=other)
+        # The shard's own rows come from its block, clear of the ids made on default
+        first, last = id_range('shard_1')
+        self.assertTrue(first <= task.pk <= last)
+        self.assertLess(self.tasks[-1].pk, first)
+
+        self.assertIn('Moved initech from default to shard_1', self.move())
+        self.assertEqual(Task.objects.using('shard_1').filter(tenant=self.tenant).count(), 3)
+        self.assertEqual(Task.objects.using('shard_1').get(pk=task.pk).tenant_id, other.pk)
+        with using_shard('shard_1'):
+            added = Task.objects.create(title='Another', milestone=milestone, tenant=other)
+        self.assertEqual(added.pk, task.pk + 1)
+
+    def test_move_aborts_on_ids_taken_on_the_target(self):
+        from .sharding import replicate_shared_rows
+
+        other = Tenant.objects.create(name='Initrode', domain='initrode')
+        replicate_shared_rows('shard_1')
+        # Only rows from before the shard had an id block can collide
+        taken = Client.objects.using('default').get(tenant=self.tenant)
+        Client.objects.using('shard_1').create(pk=taken.pk, name='Initrode client', email='client@initrode.com', tenant=other)
+
+        with self.assertRaisesMessage(CommandError, f'project.Client ids {taken.pk} are already taken on shard_1'):
+            self.move()
+        self.assertFalse(TenantShard.objects.get(tenant=self.tenant).moving)
+        self.assertFalse(Project.objects.using('shard_1').filter(tenant=self.tenant).exists())
+        self.assertTrue(Project.objects.using('default').filter(tenant=self.tenant).exists())
+
+    def test_keep_source_and_purge_tenant_rows(self):
+        from django.core.management import call_command
+
+        output = self.move(keep_source=True)
+        self.assertIn('remove them with purge_tenant_rows', output)
+        self.assertEqual(Task.objects.using('default').filter(tenant=self.tenant).count(), 3)
+
+        with self.assertRaisesMessage(CommandError, 'initech lives on shard_1'):
+            call_command('purge_tenant_rows', 'initech', 'shard_1', stdout=StringIO())
+        out = StringIO()
+        call_command('purge_tenant_rows', 'initech', 'default', batch_size=2, stdout=out)
+        self.assertIn('Deleted', out.getvalue())
+        for model in (Client, Project, Milestone, Task, ChangeLogEntry, Project.team_members.through):
+            lookup = 'project__tenant' if model is Project.team_members.through else 'tenant'
+            self.assertFalse(model.objects.using('default').filter(**{lookup: self.tenant}).exists(), model)
+        self.assertEqual(Task.objects.using('shard_1').filter(tenant=self.tenant).count(), 3)
+
+    def test_maintenance_commands_cover_every_shard(self):
+        from django.core.management import call_command
+
+        self.move()
+        milestone = Milestone.objects.using('shard_1').get(tenant=self.tenant)
+        Milestone.objects.using('shard_1').filter(pk=milestone.pk).update(progress=77)
+
+        out = StringIO()
+        # The project's progress is built from the milestone's, so it drifts too
+        with self.assertRaisesMessage(CommandError, '2 rows drifted'):
+            call_command('verify_progress_rollups', stdout=out)
+        self.assertIn('default: milestones: 0 checked', out.getvalue())
+        self.assertIn('shard_1: milestones: 1 checked, 1 drifted', out.getvalue())
+
+        out = StringIO()
+        call_command('recompute_progress', shard=['shard_1'], stdout=out)
+        self.assertIn('shard_1: milestones: 1 checked, 1 changed', out.getvalue())
+        self.assertNotIn('default:', out.getvalue())
+        self.assertEqual(Milestone.objects.using('shard_1').get(pk=milestone.pk).progress, 0)
+
+    def test_generate_sample_data_on_a_shard(self):
+        from django.core.management import call_command
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('generate_sample_data', scale=0.02, tenants=1, seed=3, shard='shard_1', stdout=StringIO())
+        tenant = Tenant.objects.get(domain='sample-1')
+        self.assertEqual(TenantShard.objects.get(tenant=tenant).alias, 'shard_1')
+        self.assertTrue(Task.objects.using('shard_1').filter(tenant=tenant).exists())
+        self.assertFalse(Task.objects.using('default').filter(tenant=tenant).exists())
+
+    def test_writes_are_refused_while_moving(self):
+        TenantShard.objects.create(tenant=self.tenant, alias='default', moving=True)
+        task = self.tasks[0]
+        response = self.client.patch(f'/api/tasks/{task.pk}/', {'title': 'Lost?'}, format='json', HTTP_HOST='initech.example.com')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        response = self.client.get(f'/api/tasks/{task.pk}/', HTTP_HOST='initech.example.com')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'])
+class QueryMetricsTests(TenantOwnerMixin, APITestCase):
+    """Test the query metrics middleware and GET /api/_metrics/"""
+
+    def setUp(self):
+        from .metrics import registry
+
+        registry.reset()
+        self.set_up_tenant('vandelay', email='art@vandelay.com')
+        self.client.force_authenticate(user=None)
+        self.staff = CustomUser.objects.create_user(email='ops@example.com', password='pass', is_staff=True)
+
+    def scrape(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get('/api/_metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_view_action(self):
+        self.client.force_authenticate(user=self.user)
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/tasks/', HTTP_HOST='vandelay.example.com').status_code, 200)
+
+        metrics = self.scrape()
+        labels = f'endpoint="TaskViewSet.list",pid="{os.getpid()}"'
+        self.assertIn(f'crm_request_duration_seconds_count{{{labels}}} 2', metrics)
+        self.assertIn(f'crm_request_queries_bucket{{{labels},le="+Inf"}} 2', metrics)
+        self.assertIn('crm_requests_total{endpoint="TaskViewSet.list",status="2xx"', metrics)
+        self.assertIn('# TYPE crm_request_db_duration_seconds histogram', metrics)
+        self.assertIn('crm_tenant_cache_lookups_total{result="misses"', metrics)
+
+    def test_metrics_are_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get('/api/_metrics/').status_code, 403)
+
+    def test_duplicate_queries_are_fingerprinted(self):
+        from .metrics import QueryRecorder, registry
+
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for ids in ([1], [1, 2], [1, 2, 3]):
+                list(Task.objects.filter(pk__in=ids))
+            for task_id in (1, 2):
+                list(Task.objects.filter(pk=task_id))
+        self.assertEqual(recorder.count, 5)
+        duplicates = recorder.duplicates()
+        # The two IN lists of two and three ids collapse to one fingerprint
+        self.assertEqual(sorted(extra for _, extra in duplicates.values()), [1, 1])
+
+        registry.record_request('TaskViewSet.list', 200, 0.01, recorder)
+        metrics = self.scrape()
+        self.assertEqual(metrics.count('crm_duplicate_queries_total{endpoint="TaskViewSet.list"'), 2)
+
+
+class OriginQueryRecorder:
+    """execute_wrapper counting statements by fingerprint, with the app code that issued them."""
+
+    def __init__(self):
+        self.runs = Counter()
+        self.sql = {}
+        self.origins = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        from django.conf import settings
+
+        from .metrics import fingerprint
+
+        key, self.sql[key] = fingerprint(sql)
+        self.runs[key] += 1
+        app_frames = [
+            frame for frame in traceback.extract_stack()[:-1]
+            if frame.filename.startswith(str(settings.BASE_DIR))
+            and not frame.filename.endswith(('tests.py', 'metrics.py'))
+        ]
+        if app_frames:
+            frame = app_frames[-1]
+            self.origins[key][f'{os.path.relpath(frame.filename, settings.BASE_DIR)}:{frame.lineno} in {frame.name}'] += 1
+        return execute(sql, params, many, context)
+
+
+# UserFactory sets a password per row: don't pay for PBKDF2 on each
+@override_settings(
+    MULTI_TENANCY_ENABLED=True, ALLOWED_HOSTS=['*'],
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class NPlusOneRegressionTests(TenantOwnerMixin, APITestCase):
+    """
+    Every list endpoint registered on the API router runs the same number of
+    queries for N and 10N rows seeded with project.factories. A failure lists
+    the statements that grew, with the code that issued them.
+    """
+
+    rows = 2
+    host = 'nplusone.example.com'
+
+    def setUp(self):
+        self.set_up_tenant('nplusone')
+        self.requests = 0
+
+    def seed(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                member = UserTenantFactory(tenant=self.tenant, is_owner=False, is_approved=True).user
+                client = ClientFactory(tenant=self.tenant)
+                project = ProjectFactory(client=client)
+                project.team_members.add(member)
+                milestone = MilestoneFactory(project=project, assignee=member)
+                sprint = SprintFactory(milestone=milestone)
+                TaskFactory(milestone=milestone, sprint=sprint, assignee=member)
+                PaymentFactory(invoice=InvoiceFactory(client=client, project=project))
+                Invitation.objects.create(
+                    email=f'{uuid.uuid4().hex}@example.com', tenant=self.tenant, token=uuid.uuid4().hex,
+                    invited_by=self.user, expires_at=timezone.now() + timedelta(days=7),
+                )
+
+    def list_urls(self):
+        from .urls import router
+
+        return [f'/api/{prefix}/' for prefix, _, _ in router.registry]
+
+    def measure(self, url):
+        """Queries of one list request, after a warmup that fills the per-user caches."""
+        # A distinct query string per request keeps the list response cache cold
+        self.requests += 1
+        self.client.get(url, {'nplusone': f'warmup-{self.requests}'}, HTTP_HOST=self.host)
+        recorder = OriginQueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.client.get(url, {'nplusone': self.requests}, HTTP_HOST=self.host)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return recorder
+
+    @staticmethod
+    def grown(small, large):
+        """Fingerprints that ran more often for more rows; one shrinking doesn't offset another."""
+        return [key for key, runs in large.runs.items() if runs > small.runs.get(key, 0)]
+
+    def offender_report(self, url, small, large):
+        lines = [f'{url}: {sum(small.runs.values())} queries for {self.rows} rows, {sum(large.runs.values())} for {self.rows * 10}']
+        for key in sorted(self.grown(small, large), key=large.runs.get, reverse=True):
+            lines.append(f'  [{key}] {small.runs.get(key, 0)} -> {large.runs[key]}: {large.sql[key][:300]}')
+            for origin, count in large.origins[key].most_common(3):
+                lines.append(f'      {count}x from {origin}')
+        return '\n'.join(lines)
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        self.seed(self.rows)
+        small = {url: self.measure(url) for url in self.list_urls()}
+        self.seed(self.rows * 9)
+
+        offenders = []
+        for url in self.list_urls():
+            large = self.measure(url)
+            if self.grown(small[url], large):
+                offenders.append(self.offender_report(url, small[url], large))
+        if offenders:
+            self.fail('List queries grow with the number of rows:\n' + '\n'.join(offenders))
+
+
+class BenchmarkSuiteTests(TestCase):
+    """Test the seeding and the in-process API workload of benchmark_api"""
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_benchmark_api_command(self):
+        import json
+        import tempfile
+
+        from django.core.management import call_command
+
+        from .seeding import Scale, TenantSeeder, create_tenant
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.json')
+            call_command(
+                'benchmark_api', clients=2, projects=3, tasks=30, iterations=3, warmup=1, json_path=path, stdout=StringIO(),
+            )
+            with open(path) as handle:
+                report = json.load(handle)
+            self.assertEqual(report['meta']['scale']['tasks'], 30)
+            self.assertEqual(report['meta']['scale']['milestones'], 9)
+            for name, result in report['scenarios'].items():
+                self.assertEqual(result['errors'], 0, name)
+                self.assertGreater(result['queries']['mean'], 0, name)
+                self.assertIsNotNone(result['latency_ms']['p99'], name)
+
+            # The second run reuses the seeded tenant and compares against the first
+            out = StringIO()
+            call_command('benchmark_api', iterations=2, warmup=0, scenario=['project_tree'], compare=path, stdout=out)
+            self.assertIn('Reusing benchmark-1', out.getvalue())
+            self.assertIn('p95 vs base', out.getvalue())
+        self.assertEqual(Task.objects.filter(tenant__domain='benchmark-1').count(), 30)
+
+        # Bulk-inserted rows skip the signals; the seeder recomputes the stored counters
+        tenant, _ = create_tenant('seeded', 'pass')
+        TenantSeeder(tenant, Scale(clients=1, projects=2, tasks=10, sprints_per_milestone=1)).run()
+        milestone = Milestone.objects.filter(tenant=tenant).first()
+        self.assertEqual(milestone.sprint_count, 1)
+        self.assertEqual(milestone.progress, 100 if milestone.completed_sprint_count else 0)
+        project = milestone.project
+        self.assertEqual(project.milestone_count, 3)
+
+
+class BulkSampleDataTests(TestCase):
+    """Test the bulk mode of generate_sample_data"""
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_scale_seeds_tenants_in_bulk(self):
+        from django.core.management import call_command
+
+        from .rollups import reconcile_milestones, reconcile_projects
+
+        out = StringIO()
+        with mock.patch('django.db.models.signals.post_save.send') as post_save:
+            call_command('generate_sample_data', scale=0.02, tenants=2, seed=7, stdout=out)
+        self.assertFalse([call for call in post_save.call_args_list if call.kwargs['sender'] in (Task, Sprint, Milestone)])
+        for domain in ('sample-1', 'sample-2'):
+            tenant = Tenant.objects.get(domain=domain)
+            self.assertEqual(Task.objects.filter(tenant=tenant).count(), 100)
+            self.assertEqual(Project.objects.filter(tenant=tenant).count(), 4)
+            self.assertTrue(UserTenant.objects.filter(tenant=tenant, is_owner=True, user__email=f'owner@{domain}.example.com').exists())
+        # The stored counters were recomputed after the inserts
+        self.assertEqual(reconcile_milestones(Milestone.objects.all()), [])
+        self.assertEqual(reconcile_projects(Project.objects.all()), [])
+
+        # A second run leaves existing tenants alone
+        call_command('generate_sample_data', fast=True, tenants=2, stdout=out)
+        self.assertIn('sample-2 already exists', out.getvalue())
+        self.assertEqual(Task.objects.count(), 200)
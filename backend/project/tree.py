@@ -0,0 +1,90 @@
+"""
+Query planning for ``GET /api/projects/{id}/tree/``.
+
+The tree is project -> milestones -> sprints -> tasks, plus each milestone's
+``backlog`` (tasks not in a sprint). Every level below the project is loaded
+with one ``Prefetch`` query, and every query selects only the columns of the
+requested fields plus the keys needed to join the levels, so a full board
+costs five queries however many rows it has.
+
+``?depth=`` (0-3, default 3) cuts the tree below a level, and JSON:API style
+``?fields[<level>]=a,b`` limits the fields of a level, e.g.
+``?fields[task]=id,title,status``.
+"""
+
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+
+from .models import Milestone, Sprint, Task
+
+TREE_MAX_DEPTH = 3
+
+# level name -> depth at which it appears
+TREE_LEVELS = {'project': 0, 'milestone': 1, 'sprint': 2, 'task': 3}
+
+# Fields that nest the next level, and the depth that level needs
+TREE_CHILDREN = {'milestones': 1, 'sprints': 2, 'tasks': 3, 'backlog': 3}
+
+# Columns always loaded so Prefetch can attach children to their parents (and
+# the project's tenant, which the object permission checks)
+TREE_KEYS = {
+    'project': ('id', 'tenant_id'),
+    'milestone': ('id', 'project_id'),
+    'sprint': ('id', 'milestone_id'),
+    'task': ('id', 'milestone_id', 'sprint_id'),
+}
+
+
+def parse_tree_params(query_params, serializers):
+    """
+    Validate ``depth`` and ``fields[<level>]`` against the tree serializers
+    (level name -> serializer class). Returns a dict mapping each level within
+    the depth to the field names to emit.
+    """
+    try:
+        depth = int(query_params.get('depth', TREE_MAX_DEPTH))
+    except ValueError:
+        raise ValidationError({'depth': 'A whole number is required.'})
+    if not 0 <= depth <= TREE_MAX_DEPTH:
+        raise ValidationError({'depth': f'Must be between 0 and {TREE_MAX_DEPTH}.'})
+
+    fields = {}
+    for level, level_depth in TREE_LEVELS.items():
+        if level_depth > depth:
+            continue
+        available = list(serializers[level].Meta.fields)
+        requested = query_params.get(f'fields[{level}]')
+        if requested:
+            selected = [name.strip() for name in requested.split(',') if name.strip()]
+            unknown = sorted(set(selected) - set(available))
+            if unknown:
+                raise ValidationError({f'fields[{level}]': f"Unknown fields {unknown}; choose from {available}."})
+        else:
+            selected = available
+        fields[level] = [name for name in selected if TREE_CHILDREN.get(name, 0) <= depth]
+    return fields
+
+
+def _columns(model, level, selected):
+    """Concrete columns behind the selected fields, plus the join keys."""
+    concrete = {field.name for field in model._meta.concrete_fields}
+    return list(dict.fromkeys(TREE_KEYS[level] + tuple(name for name in selected if name in concrete)))
+
+
+def tree_queryset(queryset, fields):
+    """Prune ``queryset`` (of projects) and prefetch the levels named in ``fields``."""
+    queryset = queryset.only(*_columns(queryset.model, 'project', fields['project']))
+    if 'milestones' not in fields['project']:
+        return queryset
+
+    milestones = Milestone.objects.only(*_columns(Milestone, 'milestone', fields['milestone'])).order_by('due_date', 'id')
+    prefetches = [Prefetch('milestones', queryset=milestones)]
+    if 'sprints' in fields['milestone']:
+        sprints = Sprint.objects.only(*_columns(Sprint, 'sprint', fields['sprint'])).order_by('start_date', 'id')
+        prefetches.append(Prefetch('milestones__sprints', queryset=sprints))
+    tasks = Task.objects.only(*_columns(Task, 'task', fields.get('task', ()))).order_by('id')
+    if 'sprints' in fields['milestone'] and 'tasks' in fields['sprint']:
+        prefetches.append(Prefetch('milestones__sprints__tasks', queryset=tasks))
+    if 'backlog' in fields['milestone']:
+        prefetches.append(Prefetch('milestones__tasks', queryset=tasks.filter(sprint__isnull=True), to_attr='backlog'))
+    return queryset.prefetch_related(*prefetches)
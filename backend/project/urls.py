@@ -29,4 +29,7 @@ urlpatterns = [
     path('approve-member/', views.approve_member_view, name='approve_member'),
     path('invite-member/', views.invite_member_view, name='invite_member'),
     path('auth-methods/', views.auth_methods_view, name='auth_methods'),
+    path('sync/', views.sync_view, name='sync'),
+    path('events/', views.event_stream_view, name='events'),
+    path('_metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
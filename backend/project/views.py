@@ -1,7 +1,14 @@
 import uuid
+from collections import defaultdict
 from datetime import timedelta
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.core.handlers.asgi import ASGIRequest
+from django.db import router, transaction
+from django.db.models import Count
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
@@ -10,9 +17,9 @@ from rest_framework import permissions, status, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.request import Request
 from rest_framework.response import Response
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from rest_framework.settings import api_settings
 
 from accounts.models import (
     CustomUser,
@@ -21,7 +28,12 @@ from accounts.models import (
     UserTenant,
 )
 
+from . import metrics, notifications
+from .dirty import get_dirty_set
+from .events import project_channel, stream_events, tenant_channel
+from .mixins import CachedListMixin, ConditionalGetMixin, SparseQuerysetMixin
 from .models import (
+    ChangeLogEntry,
     Client,
     Invoice,
     Milestone,
@@ -32,8 +44,11 @@ from .models import (
 )
 from .permissions import (
     CanManageClients, CanManageInvoices, CanManageMilestones, CanManagePayments,
-    CanManageProjects, CanManageSprints, CanManageTasks, IsTenantOwner, IsTenantCreator
+    CanManageProjects, CanManageSprints, CanManageTasks, HasTenantAccess, IsTenantOwner, IsTenantCreator,
+    get_access_snapshot,
 )
+from .rollups import reconcile_milestones, reconcile_projects
+from .search import FullTextSearchFilter
 from .serializers import (
     ClientSerializer,
     CustomUserSerializer,
@@ -42,11 +57,15 @@ from .serializers import (
     MilestoneSerializer,
     PaymentSerializer,
     ProjectSerializer,
+    ProjectTreeSerializer,
     SprintSerializer,
     TaskSerializer,
+    TREE_SERIALIZERS,
     TenantSerializer,
     UserTenantSerializer,
 )
+from .sync import read_changes
+from .tree import parse_tree_params, tree_queryset
 
 
 @extend_schema_view(
@@ -75,7 +94,7 @@ from .serializers import (
         description="Delete a tenant organization."
     ),
 )
-class TenantViewSet(viewsets.ModelViewSet):
+class TenantViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing tenant organizations.
 
@@ -117,7 +136,7 @@ class TenantViewSet(viewsets.ModelViewSet):
         description="Delete a client and all associated projects."
     ),
 )
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing clients.
 
@@ -127,19 +146,22 @@ class ClientViewSet(viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageClients]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ["status", "tenant"]
     search_fields = ["name", "email"]
     ordering_fields = ["name", "created_at"]
+    cache_list_dependencies = ("client", "project")
 
     def get_queryset(self):
+        # Annotate counts so the serializer doesn't run a COUNT query per row
+        queryset = Client.objects.select_related('tenant').annotate(projects_count=Count('projects', distinct=True))
         if self.request.tenant:
-            return Client.objects.filter(tenant=self.request.tenant)
+            return queryset.filter(tenant=self.request.tenant)
         elif self.request.user.is_authenticated:
             # In dev mode, filter by user's tenants
             user_tenants = UserTenant.objects.filter(user=self.request.user).values_list('tenant', flat=True)
             if user_tenants:
-                return Client.objects.filter(tenant__in=user_tenants)
+                return queryset.filter(tenant__in=user_tenants)
             else:
                 return Client.objects.none()  # No tenants, no clients
         else:
@@ -199,7 +221,7 @@ class ClientViewSet(viewsets.ModelViewSet):
         description="Delete a project and all associated milestones, tasks, and invoices."
     ),
 )
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ConditionalGetMixin, CachedListMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing projects.
 
@@ -210,28 +232,35 @@ class ProjectViewSet(viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageProjects]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ["status", "priority", "client"]
     search_fields = ["name", "description"]
     ordering_fields = ["name", "created_at"]
+    cache_list_dependencies = ("project", "milestone", "sprint", "client")
 
     def get_queryset(self):
+        if self.action == 'tree':
+            queryset = tree_queryset(Project.objects.all(), self.tree_fields)
+        else:
+            # Counts are annotated so list size doesn't add queries; progress
+            # is the stored rollup (project.rollups)
+            queryset = (
+                Project.objects.select_related('client')
+                .prefetch_related('team_members', 'access_groups')
+                .annotate(milestones_count=Count('milestones', distinct=True))
+            )
         if self.request.tenant:
-            return Project.objects.filter(tenant=self.request.tenant).prefetch_related('milestones', 'milestones__sprints')
+            return queryset.filter(tenant=self.request.tenant)
         elif self.request.user.is_authenticated:
             # In dev mode, filter by user's tenants
             user_tenants = UserTenant.objects.filter(user=self.request.user).values_list('tenant', flat=True)
             if user_tenants:
-                return Project.objects.filter(tenant__in=user_tenants).prefetch_related('milestones', 'milestones__sprints')
+                return queryset.filter(tenant__in=user_tenants)
             else:
                 return Project.objects.none()  # No tenants, no projects
         else:
             return Project.objects.none()  # Unauthenticated, no access
 
-    @method_decorator(cache_page(60*15))
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
-
     def perform_create(self, serializer):
         # Determine the tenant
         if hasattr(self.request, 'tenant') and self.request.tenant:
@@ -265,6 +294,23 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
         serializer.save(tenant=tenant)
 
+    @extend_schema(
+        summary="Project tree",
+        description=(
+            "The project with its milestones, sprints and tasks (plus each milestone's unsprinted backlog) "
+            "in one response. ?depth=0-3 stops below projects, milestones or sprints; "
+            "?fields[project|milestone|sprint|task]=a,b limits the fields of a level."
+        ),
+        responses=ProjectTreeSerializer,
+    )
+    @action(detail=True, methods=['get'])
+    def tree(self, request, pk=None):
+        """Whole project hierarchy with one query per level."""
+        self.tree_fields = parse_tree_params(request.query_params, TREE_SERIALIZERS)
+        project = self.get_object()
+        serializer = ProjectTreeSerializer(project, context={**self.get_serializer_context(), 'tree_fields': self.tree_fields})
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def refresh_project_progress(self, request, pk=None):
         """
@@ -273,28 +319,18 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """
         project = self.get_object()
 
-        # Recalculate milestone progress first
-        for milestone in project.milestones.all():
-            total_sprints = milestone.sprints.count()
-            completed_sprints = milestone.sprints.filter(status='completed').count()
-            new_milestone_progress = int((completed_sprints / total_sprints * 100)) if total_sprints > 0 else 0
-
-            if milestone.progress != new_milestone_progress:
-                milestone.progress = new_milestone_progress
-                milestone.save(update_fields=['progress'])
-
-        # Recalculate project progress as average of milestone progress
-        milestones = project.milestones.all()
-        new_project_progress = sum(m.progress for m in milestones) // len(milestones) if milestones else 0
-
-        if project.progress != new_project_progress:
-            project.progress = new_project_progress
-            project.save(update_fields=['progress'])
+        # One grouped aggregate and one bulk_update per level, milestones first
+        # because project progress is built from theirs
+        reconcile_milestones(project.milestones.all(), fix=True)
+        drifted = reconcile_projects(Project.objects.filter(pk=project.pk), fix=True)
+        if drifted:
+            # Otherwise the stored counters loaded by get_object() were already right
+            project = drifted[0]
 
         return Response({
             'message': 'Project progress recalculated successfully',
             'project_progress': project.progress,
-            'milestones_updated': len(milestones)
+            'milestones_updated': project.milestone_count
         }, status=status.HTTP_200_OK)
 
 
@@ -324,7 +360,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         description="Delete a milestone and all associated sprints and tasks."
     ),
 )
-class MilestoneViewSet(viewsets.ModelViewSet):
+class MilestoneViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing project milestones.
 
@@ -335,19 +371,21 @@ class MilestoneViewSet(viewsets.ModelViewSet):
     queryset = Milestone.objects.all()
     serializer_class = MilestoneSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageTasks]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ["status", "project"]
     search_fields = ["name", "description"]
     ordering_fields = ["name", "due_date"]
+    cache_list_dependencies = ("milestone", "sprint", "project")
 
     def get_queryset(self):
+        queryset = Milestone.objects.select_related('project').annotate(sprints_count=Count('sprints', distinct=True))
         if self.request.tenant:
-            return Milestone.objects.filter(tenant=self.request.tenant).select_related('project').prefetch_related('sprints', 'sprints__tasks')
+            return queryset.filter(tenant=self.request.tenant)
         elif self.request.user.is_authenticated:
             # In dev mode, filter by user's tenants
             user_tenants = UserTenant.objects.filter(user=self.request.user).values_list('tenant', flat=True)
             if user_tenants:
-                return Milestone.objects.filter(tenant__in=user_tenants).select_related('project').prefetch_related('sprints', 'sprints__tasks')
+                return queryset.filter(tenant__in=user_tenants)
             else:
                 return Milestone.objects.none()  # No tenants, no milestones
         else:
@@ -399,7 +437,7 @@ class MilestoneViewSet(viewsets.ModelViewSet):
         description="Remove a task from this sprint."
     ),
 )
-class SprintViewSet(viewsets.ModelViewSet):
+class SprintViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing agile sprints.
 
@@ -414,9 +452,10 @@ class SprintViewSet(viewsets.ModelViewSet):
     filterset_fields = ["status", "milestone", "milestone__project"]
     search_fields = ["name"]
     ordering_fields = ["name", "start_date"]
+    cache_list_dependencies = ("sprint", "task", "milestone")
 
     def get_queryset(self):
-        queryset = Sprint.objects.select_related('milestone').prefetch_related('tasks')
+        queryset = Sprint.objects.select_related('milestone').annotate(tasks_count=Count('tasks', distinct=True))
 
         # Handle nested routing for project-specific sprints
         project_pk = self.kwargs.get('project_pk')
@@ -507,8 +546,9 @@ class SprintViewSet(viewsets.ModelViewSet):
             return Response({'error': 'No valid sprints found'}, status=status.HTTP_404_NOT_FOUND)
 
         # Check for status transition validation
+        sprints = list(sprints_to_update.select_related('milestone__assignee'))
         invalid_transitions = []
-        for sprint in sprints_to_update:
+        for sprint in sprints:
             if new_status == 'completed' and sprint.status != 'active':
                 invalid_transitions.append(f"Sprint {sprint.id} ({sprint.name}) must be active to complete")
             elif new_status == 'active' and sprint.status != 'planned':
@@ -517,8 +557,18 @@ class SprintViewSet(viewsets.ModelViewSet):
         if invalid_transitions:
             return Response({'error': 'Invalid status transitions', 'details': invalid_transitions}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Perform bulk update
-        updated_count = sprints_to_update.update(status=new_status)
+        # QuerySet.update() bypasses post_save, so hand the affected milestones to
+        # the dirty set: progress is recomputed set-wise, once, on commit
+        using = router.db_for_write(Sprint)
+        with transaction.atomic(using=using):
+            updated_count = sprints_to_update.update(status=new_status)
+            dirty = get_dirty_set(using)
+            dirty.mark_milestones(*{sprint.milestone_id for sprint in sprints})
+            dirty.invalidate_lists(Sprint, *{sprint.tenant_id for sprint in sprints})
+            dirty.log_changes(Sprint, 'updated', *[(sprint.tenant_id, sprint.pk, sprint.milestone_id) for sprint in sprints])
+            if new_status == 'completed':
+                for sprint in sprints:
+                    dirty.defer(notifications.sprint_completed(sprint))
 
         return Response({
             'message': f'Successfully updated {updated_count} sprints to status "{new_status}"',
@@ -552,7 +602,7 @@ class SprintViewSet(viewsets.ModelViewSet):
         description="Delete a task."
     ),
 )
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing individual tasks.
 
@@ -562,10 +612,11 @@ class TaskViewSet(viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageTasks]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ["status", "milestone", "sprint", "assignee", "milestone__project"]
     search_fields = ["title", "description"]
     ordering_fields = ["title", "created_at"]
+    cache_list_dependencies = ("task", "milestone", "sprint")
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -645,8 +696,17 @@ class TaskViewSet(viewsets.ModelViewSet):
         if sprint_id is not None:
             update_data['sprint_id'] = sprint_id
 
-        # Perform bulk update
-        updated_count = tasks_to_update.update(**update_data)
+        # QuerySet.update() bypasses post_save, so hand the sprints the tasks leave
+        # and join to the dirty set: their automatic transitions and the
+        # milestone/project progress are recomputed set-wise, once, on commit
+        using = router.db_for_write(Task)
+        with transaction.atomic(using=using):
+            affected = list(tasks_to_update.values_list('tenant_id', 'sprint_id', 'pk', 'milestone_id'))
+            updated_count = tasks_to_update.update(**update_data)
+            dirty = get_dirty_set(using)
+            dirty.mark_sprints(*{sprint for _, sprint, _, _ in affected}, sprint_id)
+            dirty.invalidate_lists(Task, *{tenant for tenant, _, _, _ in affected})
+            dirty.log_changes(Task, 'updated', *[(tenant, pk, milestone) for tenant, _, pk, milestone in affected])
 
         return Response({
             'message': f'Successfully updated {updated_count} tasks',
@@ -681,7 +741,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         description="Delete an invoice and associated payments."
     ),
 )
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing invoices.
 
@@ -691,10 +751,12 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated, CanManageInvoices]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ["paid", "client", "project"]
     search_fields = ["client__name"]
     ordering_fields = ["issued_at"]
+    cursor_ordering = ("-issued_at", "-id")
+    cache_list_dependencies = ("invoice", "client", "project")
 
     def get_queryset(self):
         if self.request.tenant:
@@ -774,7 +836,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         description="Delete a payment record."
     ),
 )
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing payments.
 
@@ -788,6 +850,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
     filterset_fields = ["invoice"]
     search_fields = ["invoice__id"]
     ordering_fields = ["paid_at"]
+    cursor_ordering = ("-paid_at", "-id")
+    cache_list_dependencies = ("payment", "invoice")
 
     def get_queryset(self):
         if self.request.tenant:
@@ -862,7 +926,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         description="Remove a user from the tenant."
     ),
 )
-class UserTenantViewSet(viewsets.ModelViewSet):
+class UserTenantViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing tenant user relationships.
 
@@ -916,7 +980,7 @@ class UserTenantViewSet(viewsets.ModelViewSet):
         description="Delete an invitation."
     ),
 )
-class InvitationViewSet(viewsets.ModelViewSet):
+class InvitationViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing tenant invitations.
 
@@ -970,7 +1034,7 @@ class InvitationViewSet(viewsets.ModelViewSet):
         description="Delete a user account. Users can only delete their own account."
     ),
 )
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing user accounts.
 
@@ -984,6 +1048,7 @@ class UserViewSet(viewsets.ModelViewSet):
     filterset_fields = ["is_active"]
     search_fields = ["email", "first_name", "last_name"]
     ordering_fields = ["email", "date_joined"]
+    cursor_ordering = ("-date_joined", "-id")
 
     def get_queryset(self):
         # Users can only see their own profile unless they have admin permissions
@@ -1442,3 +1507,161 @@ def auth_methods_view(request):
     return Response(auth_methods)
 
 
+SYNC_VIEWSETS = {
+    'client': ClientViewSet,
+    'project': ProjectViewSet,
+    'milestone': MilestoneViewSet,
+    'sprint': SprintViewSet,
+    'task': TaskViewSet,
+    'invoice': InvoiceViewSet,
+    'payment': PaymentViewSet,
+}
+
+
+@extend_schema(
+    summary="Delta sync",
+    description=(
+        "Rows created, updated or deleted in the tenant since a cursor, across clients, projects, "
+        "milestones, sprints, tasks, invoices and payments. Start with ?since=0 and pass the returned "
+        "cursor next time; keep polling while has_more is true. Each change carries the row as the "
+        "model's list endpoint serializes it, or data null for deletes (and rows no longer visible). "
+        "?limit= caps the changes per response."
+    ),
+    responses={
+        200: {
+            'type': 'object',
+            'properties': {
+                'cursor': {'type': 'integer'},
+                'has_more': {'type': 'boolean'},
+                'changes': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'seq': {'type': 'integer'},
+                            'model': {'type': 'string', 'enum': list(SYNC_VIEWSETS)},
+                            'id': {'type': 'integer'},
+                            'action': {'type': 'string', 'enum': ['created', 'updated', 'deleted']},
+                            'data': {'type': 'object', 'nullable': True},
+                        }
+                    }
+                }
+            }
+        }
+    }
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, HasTenantAccess])
+def sync_view(request):
+    if not hasattr(request, 'tenant') or not request.tenant:
+        return Response({'error': 'Tenant context required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = int(request.query_params.get('limit', settings.SYNC_PAGE_SIZE))
+    except ValueError:
+        return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+    try:
+        entries, cursor, has_more = read_changes(request.tenant, since, limit)
+    except ChangeLogEntry.DoesNotExist:
+        return Response({'error': 'since is not a cursor of this tenant'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # One query per model for the rows still present, through the model's own
+    # viewset so tenant/access filtering, annotations and permissions all apply
+    pks = defaultdict(list)
+    for entry in entries:
+        if entry.action != 'deleted':
+            pks[entry.model].append(entry.object_id)
+    allowed, rows = set(), {}
+    for model_name in {entry.model for entry in entries}:
+        view = SYNC_VIEWSETS[model_name](request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+        if not all(permission.has_permission(request, view) for permission in view.get_permissions()):
+            continue
+        allowed.add(model_name)
+        if pks[model_name]:
+            queryset = view.get_queryset().filter(pk__in=pks[model_name])
+            for item in view.get_serializer(queryset, many=True).data:
+                rows[model_name, item['id']] = item
+
+    changes = []
+    for entry in entries:
+        if entry.model not in allowed:
+            continue
+        data = rows.get((entry.model, entry.object_id))
+        changes.append({
+            'seq': entry.id,
+            'model': entry.model,
+            'id': entry.object_id,
+            # Gone since it was logged, or filtered out for this user: a tombstone to the client
+            'action': entry.action if data is not None else 'deleted',
+            'data': data,
+        })
+    return Response({'cursor': cursor, 'has_more': has_more, 'changes': changes})
+
+
+def event_stream_channel(request):
+    """
+    Authenticate an event stream request the way the API does and pick its
+    channel: ``?project=<id>`` for one project, else the whole tenant.
+    Returns ``(error response, channel)``.
+    """
+    request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED), None
+    if not getattr(request, 'tenant', None):
+        return JsonResponse({'error': 'Tenant context required'}, status=status.HTTP_400_BAD_REQUEST), None
+    snapshot = get_access_snapshot(request)
+    if not (snapshot.is_member and snapshot.has_perm('project.view_task')):
+        return JsonResponse({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN), None
+
+    project_id = request.query_params.get('project')
+    if project_id is None:
+        return None, tenant_channel(request.tenant.pk)
+    view = ProjectViewSet(request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+    if not project_id.isdigit() or not view.get_queryset().filter(pk=project_id).exists():
+        return JsonResponse({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND), None
+    return None, project_channel(request.tenant.pk, int(project_id))
+
+
+def non_atomic_everywhere(view):
+    """
+    Exempt ``view`` from ATOMIC_REQUESTS on every database alias (shards
+    included): Django refuses to wrap an async view in a transaction.
+    """
+    for alias in settings.DATABASES:
+        view = transaction.non_atomic_requests(using=alias)(view)
+    return view
+
+
+@non_atomic_everywhere
+async def event_stream_view(request):
+    """
+    ``GET /api/events/[?project=<id>]``: Server-Sent Events for task, sprint
+    and milestone changes as they commit (see ``project.events``). The
+    connection stays open, so it is only served by the ASGI application. It
+    holds no transaction open: the few reads before streaming autocommit.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Event streams are only served over ASGI'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    error, channel = await sync_to_async(event_stream_channel)(request)
+    if error is not None:
+        return error
+    response = StreamingHttpResponse(stream_events(channel), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
+
+
+@extend_schema(exclude=True)
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics_view(request):
+    """
+    ``GET /api/_metrics/``: per-endpoint request, SQL and duplicate query
+    metrics of this worker in Prometheus text format (see ``project.metrics``).
+    Staff only.
+    """
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
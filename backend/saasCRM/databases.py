@@ -0,0 +1,132 @@
+"""
+Connection reuse settings for the PostgreSQL aliases in ``DATABASES``.
+
+Without them Django opens a new connection for every request and closes it
+afterwards, so each request pays a TCP (and TLS) handshake and backend
+startup. Two modes, chosen with environment variables:
+
+``DB_POOL=true``
+    A psycopg 3 connection pool per alias and process (Django's
+    ``OPTIONS['pool']``). Connections go back to the pool at the end of each
+    request. Use this under ASGI, where threads are short-lived and
+    persistent connections would pile up. Requires ``psycopg[pool]``.
+    ``DB_POOL_MIN_SIZE``, ``DB_POOL_MAX_SIZE`` and ``DB_POOL_TIMEOUT``
+    (seconds to wait for a free connection) size it.
+
+otherwise
+    Persistent connections: each thread keeps its connection for
+    ``DB_CONN_MAX_AGE`` seconds (default 60, ``0`` to close after every
+    request).
+
+``DB_CONN_HEALTH_CHECKS`` (default true) checks a reused connection before the
+request that reuses it, so a connection dropped by the server or a proxy is
+replaced instead of failing the request.
+
+``DB_REPLICA_HOSTS`` (``host[:port]``, comma separated) adds read replicas of
+``default`` as ``default_replica_1``, ``default_replica_2``... and
+``DB_SHARD_HOSTS`` extra project data shards as ``shard_1``, ``shard_2``...,
+both for ``saasCRM.db_routers.DBRouter``.
+"""
+
+import os
+from copy import deepcopy
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+def env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def connection_settings():
+    """``CONN_MAX_AGE``, ``CONN_HEALTH_CHECKS`` and pool ``OPTIONS`` for one PostgreSQL alias."""
+    health_checks = env_flag('DB_CONN_HEALTH_CHECKS', True)
+    if not env_flag('DB_POOL', False):
+        return {
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': health_checks,
+        }
+
+    try:
+        import psycopg  # noqa: F401
+    except ImportError as exc:
+        raise ImproperlyConfigured('DB_POOL=true needs psycopg 3: pip install "psycopg[binary,pool]"') from exc
+    return {
+        # Pooled connections are returned to the pool, never kept by a thread
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': health_checks,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 20)),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            },
+        },
+    }
+
+
+def apply_connection_settings(databases):
+    """Add ``connection_settings()`` to every PostgreSQL alias in ``databases``, keeping their own OPTIONS."""
+    for alias in databases.values():
+        if alias.get('ENGINE') != 'django.db.backends.postgresql':
+            continue
+        settings = connection_settings()
+        options = {**alias.get('OPTIONS', {}), **settings.pop('OPTIONS', {})}
+        alias.update(settings)
+        if options:
+            alias['OPTIONS'] = options
+    return databases
+
+
+def parse_hosts(hosts):
+    """``[(host, port)]`` from a comma separated ``host[:port]`` list."""
+    return [host.strip().partition(':')[::2] for host in hosts.split(',') if host.strip()]
+
+
+def copy_alias(primary, host, port, **overrides):
+    """``primary``'s settings pointed at another server with the same credentials."""
+    database = deepcopy(primary)
+    database.update({'HOST': host, 'PORT': port or primary.get('PORT', '')}, **overrides)
+    return database
+
+
+def add_replicas(databases, alias='default', hosts=None):
+    """
+    Add a read replica alias of ``alias`` for each ``host[:port]`` in ``hosts``
+    (default: ``DB_REPLICA_HOSTS``). Replicas share the primary's credentials,
+    don't wrap requests in a transaction, mirror the primary in tests and
+    give up quickly on an unreachable host (``DB_REPLICA_CONNECT_TIMEOUT``).
+    Returns ``{alias: [replica aliases]}`` for ``DATABASE_REPLICAS``.
+    """
+    primary = databases[alias]
+    hosts = parse_hosts(os.getenv('DB_REPLICA_HOSTS', '') if hosts is None else hosts)
+    if primary.get('ENGINE') != 'django.db.backends.postgresql' or not hosts:
+        return {}
+
+    replicas = []
+    for number, (host, port) in enumerate(hosts, 1):
+        replica = copy_alias(primary, host, port, ATOMIC_REQUESTS=False, TEST={'MIRROR': alias})
+        replica.setdefault('OPTIONS', {})['connect_timeout'] = int(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', 2))
+        replica_alias = f'{alias}_replica_{number}'
+        databases[replica_alias] = replica
+        replicas.append(replica_alias)
+    return {alias: replicas}
+
+
+def add_shards(databases, alias='default', hosts=None):
+    """
+    Add a project data shard for each ``host[:port]`` in ``hosts`` (default:
+    ``DB_SHARD_HOSTS``), with ``alias``'s database name and credentials.
+    Returns the new aliases for ``DATABASE_SHARDS``.
+    """
+    primary = databases[alias]
+    hosts = parse_hosts(os.getenv('DB_SHARD_HOSTS', '') if hosts is None else hosts)
+    if primary.get('ENGINE') != 'django.db.backends.postgresql':
+        return []
+
+    shards = []
+    for number, (host, port) in enumerate(hosts, 1):
+        shard_alias = f'shard_{number}'
+        databases[shard_alias] = copy_alias(primary, host, port)
+        shards.append(shard_alias)
+    return shards
@@ -1,44 +1,230 @@
+"""
+Database routing: each app's primary alias, tenant shards and read replicas.
+
+Project data is sharded by tenant. ``accounts.TenantShard`` (the shard map)
+assigns a tenant to one of ``DATABASE_SHARDS``; tenants without an entry live
+on the home shard (the project app's alias). ``project.middleware.TenantMiddleware``
+sets the current request's shard, and ``using_shard`` does the same outside
+requests. Every shard carries the full schema. The shared tables (accounts,
+auth) are always read and written on ``default``; shards keep copies of
+their rows so foreign keys hold (see ``project.sharding``).
+
+Reads of a primary with replicas in ``DATABASE_REPLICAS`` round-robin across
+the replicas that are reachable and less than ``REPLICA_MAX_LAG_SECONDS``
+behind, but only within requests that ``project.middleware.PrimaryPinMiddleware``
+marked as replica-safe. Everything else reads from the primary: writes,
+reads after the first write of a request, requests that write (unsafe
+methods), requests from a client or tenant that wrote in the last
+``REPLICA_PIN_SECONDS``, and code outside a request (management commands,
+shell), so every caller sees its own writes.
+"""
+
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Lag in seconds of a PostgreSQL standby; 0 when it has replayed everything it
+# received (an idle primary would otherwise look like growing lag) or isn't one.
+PG_REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RoutingState:
+    """Replica routing for one request: whether its reads must stay on the primary, and whether it wrote."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing = contextvars.ContextVar('db_routing', default=None)
+
+
+def start_request(pinned=False):
+    """Let the current request read from replicas until it writes (or from the primary only if ``pinned``)."""
+    state = RoutingState(pinned)
+    _routing.set(state)
+    return state
+
+
+def end_request():
+    _routing.set(None)
+
+
+_shard = contextvars.ContextVar('db_shard', default=None)
+
+
+def shard_for(tenant):
+    """The shard map's alias for ``tenant``, None for the home shard."""
+    shard = getattr(tenant, 'shard', None) if tenant is not None else None
+    return shard.alias if shard is not None else None
+
+
+def set_shard(alias):
+    """Route project data for the rest of the current request to ``alias`` (None: the home shard)."""
+    _shard.set(alias)
+
+
+@contextmanager
+def using_shard(alias):
+    token = _shard.set(alias)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+class ReplicaMonitor:
+    """
+    Per-process view of which replicas are usable. A replica's lag is measured
+    at most every ``REPLICA_CHECK_INTERVAL`` seconds, in whichever request
+    needs it; unreachable or lagging replicas leave the rotation until a later
+    check finds them caught up.
+    """
+
+    def __init__(self):
+        self._checked = {}  # alias -> (checked_at, usable)
+        self._lock = threading.Lock()
+
+    def lag(self, alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(PG_REPLICA_LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except Exception:
+            # Don't keep a broken connection around for the next check
+            connection.close()
+            raise
+
+    def usable(self, alias):
+        now = time.monotonic()
+        checked = self._checked.get(alias)
+        if checked and now - checked[0] < getattr(settings, 'REPLICA_CHECK_INTERVAL', 5):
+            return checked[1]
+
+        try:
+            lag = self.lag(alias)
+        except Exception as exc:
+            logger.warning('Replica %s is unreachable, reading from the primary: %s', alias, exc)
+            usable = False
+        else:
+            usable = lag <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+            if not usable:
+                logger.warning('Replica %s is %.1fs behind, taking it out of rotation', alias, lag)
+        with self._lock:
+            self._checked[alias] = (now, usable)
+        return usable
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replica_monitor = ReplicaMonitor()
+
+
 class DBRouter:
     """
     A router to control all database operations on models in the
     accounts and project applications.
     """
 
+    app_databases = {'accounts': 'default', 'project': 'projects'}
+    sharded_apps = ('project',)
+
+    def __init__(self):
+        self._turns = defaultdict(itertools.count)
+
+    def primary_for(self, app_label):
+        """The app's own alias when it is configured, ``default`` otherwise."""
+        alias = self.app_databases.get(app_label, 'default')
+        return alias if alias in settings.DATABASES else 'default'
+
+    def alias_for(self, app_label):
+        """The app's primary, or for sharded apps the current shard."""
+        if app_label in self.sharded_apps:
+            shard = _shard.get()
+            if shard is not None:
+                return shard
+        return self.primary_for(app_label)
+
+    def shards(self):
+        return [self.primary_for(self.sharded_apps[0])] + list(getattr(settings, 'DATABASE_SHARDS', []))
+
+    def replicas_of(self, alias):
+        return getattr(settings, 'DATABASE_REPLICAS', {}).get(alias, [])
+
+    def is_replica(self, alias):
+        return any(alias in replicas for replicas in getattr(settings, 'DATABASE_REPLICAS', {}).values())
+
     def db_for_read(self, model, **hints):
         """
-        Attempts to read accounts models go to users db.
+        Attempts to read go to a usable replica of the app's primary (or
+        shard) when the current request allows it, to the primary otherwise.
         """
-        if model._meta.app_label == 'accounts':
-            return 'default'
-        elif model._meta.app_label == 'project':
-            return 'projects'
-        return None
+        primary = self.alias_for(model._meta.app_label)
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db and not self.is_replica(instance._state.db):
+            # Related lookups from an object stay on the database it came from
+            return instance._state.db
+
+        state = _routing.get()
+        replicas = self.replicas_of(primary)
+        if state is None or state.pinned or not replicas:
+            return primary
+        usable = [alias for alias in replicas if replica_monitor.usable(alias)]
+        if not usable:
+            return primary
+        return usable[next(self._turns[primary]) % len(usable)]
 
     def db_for_write(self, model, **hints):
         """
-        Attempts to write accounts models go to users db.
+        Attempts to write go to the app's primary (or shard), and pin the
+        rest of the request to it.
         """
-        if model._meta.app_label == 'accounts':
-            return 'default'
-        elif model._meta.app_label == 'project':
-            return 'projects'
-        return None
+        state = _routing.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return self.alias_for(model._meta.app_label)
 
     def allow_relation(self, obj1, obj2, **hints):
         """
-        Allow relations if a model in the accounts app is involved.
+        Allow relations if a model in the accounts app is involved, or both
+        objects live on the same primary (or its replicas).
         """
         if obj1._meta.app_label == 'accounts' or obj2._meta.app_label == 'accounts':
             return True
+        if self.primary_for(obj1._meta.app_label) == self.primary_for(obj2._meta.app_label):
+            return True
         return None
 
     def allow_migrate(self, db, app_label, model_name=None, **hints):
         """
-        Make sure the accounts app only appears in the 'default' database
-        and project app only in 'projects' database.
+        Make sure the accounts app only appears in its primary database, the
+        project app only in its own, shards get the full schema and nothing
+        is migrated on a replica.
         """
-        if app_label == 'accounts':
-            return db == 'default'
-        elif app_label == 'project':
-            return db == 'projects'
-        return None
\ No newline at end of file
+        if self.is_replica(db):
+            return False
+        if db in getattr(settings, 'DATABASE_SHARDS', []):
+            return True
+        if app_label in self.app_databases:
+            return db == self.primary_for(app_label)
+        return None
@@ -15,6 +15,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from saasCRM.databases import add_replicas, add_shards, apply_connection_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -106,6 +108,27 @@ AUTH_USER_MODEL = "accounts.CustomUser"
 # Multi-tenancy configuration
 MULTI_TENANCY_ENABLED = os.getenv("MULTI_TENANCY_ENABLED", "False").lower() == "true"
 
+# Tenant lookup cache used by TenantMiddleware (see project/cache.py)
+TENANT_CACHE_MAXSIZE = int(os.getenv("TENANT_CACHE_MAXSIZE", 1024))
+TENANT_CACHE_LOCAL_TTL = int(os.getenv("TENANT_CACHE_LOCAL_TTL", 30))
+TENANT_CACHE_TTL = int(os.getenv("TENANT_CACHE_TTL", 300))
+TENANT_CACHE_NEGATIVE_TTL = int(os.getenv("TENANT_CACHE_NEGATIVE_TTL", 60))
+
+# Cross-request cache of tenant membership + permissions (see project/permissions.py)
+PERMISSION_SNAPSHOT_TTL = int(os.getenv("PERMISSION_SNAPSHOT_TTL", 300))
+
+# Per-endpoint query count / SQL time / duplicate query metrics, served to staff
+# at /api/_metrics/ in Prometheus format (see project/metrics.py)
+QUERY_METRICS_ENABLED = os.getenv("QUERY_METRICS_ENABLED", "True").lower() == "true"
+
+# Versioned list response cache (see project/mixins.py CachedListMixin)
+LIST_CACHE_TIMEOUT = int(os.getenv("LIST_CACHE_TIMEOUT", 60 * 15))
+
+# Delta sync endpoint (see project/sync.py)
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", 500))
+# Live event stream (see project/events.py)
+EVENTS_KEEPALIVE_SECONDS = int(os.getenv("EVENTS_KEEPALIVE_SECONDS", 15))
+
 
 # Application definition
 
@@ -138,12 +161,15 @@ AUTHENTICATION_BACKENDS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    # Outermost after CORS, so its timings cover the rest of the stack
+    "project.middleware.QueryMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "project.middleware.TenantMiddleware",
+    "project.middleware.PrimaryPinMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
@@ -180,21 +206,53 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD", "saascrm_password"),
         "HOST": os.getenv("DB_HOST", "localhost"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        # One transaction per request, so project.dirty coalesces a request's
+        # rollups and notifications into a single flush on commit
+        "ATOMIC_REQUESTS": os.getenv("DB_ATOMIC_REQUESTS", "True").lower() == "true",
     }
 }
 
 # Test database configuration
 # Use SQLite for tests to avoid needing PostgreSQL setup
 if 'test' in sys.argv:
+    # Same request transactions as production, so views are tested the way they're served
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
+        'ATOMIC_REQUESTS': DATABASES['default']['ATOMIC_REQUESTS'],
+    }
+    # A second project data shard for the tenant sharding tests
+    DATABASES['shard_1'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
     }
+    DATABASE_SHARDS = ['shard_1']
 else:
     # Django automatically creates test databases with 'test_' prefix
     TEST = {
         'NAME': 'saascrm_db',  # Use same db for tests
     }
+    # Extra databases for project data from DB_SHARD_HOSTS. The shard map
+    # (accounts.TenantShard) assigns tenants to them, see saasCRM/db_routers.py
+    DATABASE_SHARDS = add_shards(DATABASES)
+
+# Ids per shard: shard N (the home database is 0) hands out project ids from
+# N * SHARD_ID_BLOCK + 1, so a tenant's rows keep their ids when it moves
+SHARD_ID_BLOCK = int(os.getenv("SHARD_ID_BLOCK", 2 ** 48))
+
+# Read replicas of default from DB_REPLICA_HOSTS (see saasCRM/db_routers.py).
+# List reads go to a replica that is reachable and at most REPLICA_MAX_LAG_SECONDS
+# behind (checked every REPLICA_CHECK_INTERVAL seconds per process); a client or
+# tenant that wrote reads from the primary for REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = add_replicas(DATABASES)
+DATABASE_ROUTERS = ["saasCRM.db_routers.DBRouter"]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 5))
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 15))
+
+# Persistent connections or a psycopg 3 pool for every PostgreSQL alias,
+# from DB_CONN_MAX_AGE / DB_CONN_HEALTH_CHECKS / DB_POOL* (see saasCRM/databases.py)
+apply_connection_settings(DATABASES)
 
 
 # Password validation
@@ -284,16 +342,41 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "project.pagination.KeysetPagination",
+    # orjson in place of the stdlib json encoder/decoder; MessagePack on request
+    # via Accept: application/msgpack (see project/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "project.renderers.ORJSONRenderer",
+        "project.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "project.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", 50)),
     "DEFAULT_VERSION": "v1",
     "ALLOWED_VERSIONS": ["v1"],
 }
 
+# Keyset pagination (see project/pagination.py)
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 500))
+# Above this many rows (pg_class.reltuples), ?count=true returns a planner estimate
+PAGINATION_EXACT_COUNT_THRESHOLD = int(os.getenv("PAGINATION_EXACT_COUNT_THRESHOLD", 100000))
+
+# Full-text search (see project/search.py). Single-word queries up to this many
+# characters use the pg_trgm prefix index instead of the tsvector index.
+SEARCH_TRIGRAM_MAX_LENGTH = int(os.getenv("SEARCH_TRIGRAM_MAX_LENGTH", 3))
+
 if 'test' in sys.argv:
     CACHES = {
         'default': {
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         }
     }
+    # Live events use the in-process broker (see project/events.py)
+    EVENTS_REDIS_URL = None
 else:
     CACHES = {
         'default': {
@@ -314,6 +397,9 @@ else:
     except Exception:
         print("Warning: Redis is not running or unreachable. Caching will be disabled.")
 
+    # Pub/sub fan-out of live events across workers; empty for the in-process broker
+    EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://127.0.0.1:6379/1")
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "DjangoCRM API",
     "DESCRIPTION": """
@@ -25,7 +25,7 @@ def get_milestones(token):
         headers={"Authorization": f"Token {token}"}
     )
     if response.status_code == 200:
-        return response.json()
+        return response.json()['results']
     return []
 
 def get_tenants(token):
@@ -34,7 +34,7 @@ def get_tenants(token):
         headers={"Authorization": f"Token {token}"}
     )
     if response.status_code == 200:
-        return response.json()
+        return response.json()['results']
     return []
 
 def create_task(token, data):
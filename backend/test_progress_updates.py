@@ -24,7 +24,7 @@ def get_tasks(token):
         headers={"Authorization": f"Token {token}"}
     )
     if response.status_code == 200:
-        return response.json()
+        return response.json()['results']
     return []
 
 def get_sprints(token):
@@ -33,7 +33,7 @@ def get_sprints(token):
         headers={"Authorization": f"Token {token}"}
     )
     if response.status_code == 200:
-        return response.json()
+        return response.json()['results']
     return []
 
 def get_milestones(token):
@@ -42,7 +42,7 @@ def get_milestones(token):
         headers={"Authorization": f"Token {token}"}
     )
     if response.status_code == 200:
-        return response.json()
+        return response.json()['results']
     return []
 
 def get_projects(token):
@@ -51,7 +51,7 @@ def get_projects(token):
         headers={"Authorization": f"Token {token}"}
     )
     if response.status_code == 200:
-        return response.json()
+        return response.json()['results']
     return []
 
 def update_task_status(token, task_id, status):
@@ -24,7 +24,7 @@ def get_sprints(token):
         headers={"Authorization": f"Token {token}"}
     )
     if response.status_code == 200:
-        return response.json()
+        return response.json()['results']
     return []
 
 def get_tasks(token):
@@ -33,7 +33,7 @@ def get_tasks(token):
         headers={"Authorization": f"Token {token}"}
     )
     if response.status_code == 200:
-        return response.json()
+        return response.json()['results']
     return []
 
 def test_create_task(token, sprint_id):
@@ -1,22 +1,9 @@
 import { Client, CreateClientData, UpdateClientData, UserTenant } from './types';
 import { API_BASE } from './index';
+import { fetchAllPages } from './pagination';
 
 export async function getClients(token: string): Promise<Client[]> {
-  const response = await fetch(`${API_BASE}/clients/`, {
-    method: "GET",
-    headers: {
-      Authorization: `Token ${token}`,
-      "Content-Type": "application/json",
-    },
-  });
-
-  const data = await response.json();
-
-  if (!response.ok) {
-    throw new Error(data.error || "Failed to fetch clients");
-  }
-
-  return data;
+  return fetchAllPages<Client>(`${API_BASE}/clients/`, token, "Failed to fetch clients");
 }
 
 export async function createClient(token: string, clientData: CreateClientData): Promise<Client> {
@@ -73,20 +60,6 @@ export async function deleteClient(token: string, clientId: number): Promise<voi
 }
 
 export async function getUserTenants(token: string): Promise<UserTenant[]> {
-  const response = await fetch(`${API_BASE}/members/`, {
-    method: "GET",
-    headers: {
-      Authorization: `Token ${token}`,
-      "Content-Type": "application/json",
-    },
-  });
-
-  const data = await response.json();
-
-  if (!response.ok) {
-    throw new Error(data.error || "Failed to fetch user tenants");
-  }
-
-  return data;
+  return fetchAllPages<UserTenant>(`${API_BASE}/members/`, token, "Failed to fetch user tenants");
 }
 
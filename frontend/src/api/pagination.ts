@@ -0,0 +1,42 @@
+import { Paginated } from './types';
+
+/**
+ * GET every page of a list endpoint. List responses are cursor paginated
+ * (`PAGE_SIZE` rows each), so `next` is followed until it runs out; callers
+ * get the whole list rather than its first page.
+ */
+export async function fetchAllPages<T>(url: string, token: string, errorMessage: string): Promise<T[]> {
+  const results: T[] = [];
+  let next: string | null = url;
+
+  while (next) {
+    const response = await fetch(next, {
+      method: "GET",
+      headers: {
+        Authorization: `Token ${token}`,
+        "Content-Type": "application/json",
+      },
+    });
+
+    let data: unknown;
+    try {
+      data = await response.json();
+    } catch {
+      throw new Error(`${errorMessage}: ${response.status} ${response.statusText}`);
+    }
+
+    if (!response.ok) {
+      throw new Error((data as { error?: string }).error || errorMessage);
+    }
+
+    // Unpaginated endpoints return a bare array
+    if (Array.isArray(data)) {
+      return data as T[];
+    }
+    const page = data as Paginated<T>;
+    results.push(...page.results);
+    next = page.next;
+  }
+
+  return results;
+}
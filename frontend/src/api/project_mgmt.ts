@@ -1,9 +1,14 @@
-import { Project, Milestone, Sprint, Task } from './types';
+import { BoardEvent, Project, ProjectTree, Milestone, Sprint, Task } from './types';
 import { API_BASE } from './index';
+import { fetchAllPages } from './pagination';
 
 export async function getProjects(token: string, tenant?: number): Promise<Project[]> {
   const url = tenant ? `${API_BASE}/projects/?tenant=${tenant}` : `${API_BASE}/projects/`;
-  const response = await fetch(url, {
+  return fetchAllPages<Project>(url, token, "Failed to fetch projects");
+}
+
+export async function getProject(token: string, id: number): Promise<Project> {
+  const response = await fetch(`${API_BASE}/projects/${id}/`, {
     method: "GET",
     headers: {
       Authorization: `Token ${token}`,
@@ -14,15 +19,24 @@ export async function getProjects(token: string, tenant?: number): Promise<Proje
   const data = await response.json();
 
   if (!response.ok) {
-    throw new Error(data.error || "Failed to fetch projects");
+    throw new Error(data.error || "Failed to fetch project");
   }
 
-  // Handle paginated response
-  return data.results || data;
+  return data;
 }
 
-export async function getProject(token: string, id: number): Promise<Project> {
-  const response = await fetch(`${API_BASE}/projects/${id}/`, {
+export async function getProjectTree(
+  token: string,
+  id: number,
+  options: { depth?: number; fields?: Partial<Record<"project" | "milestone" | "sprint" | "task", string[]>> } = {}
+): Promise<ProjectTree> {
+  const params = new URLSearchParams();
+  if (options.depth !== undefined) params.set("depth", String(options.depth));
+  for (const [level, names] of Object.entries(options.fields || {})) {
+    if (names) params.set(`fields[${level}]`, names.join(","));
+  }
+  const query = params.toString();
+  const response = await fetch(`${API_BASE}/projects/${id}/tree/${query ? `?${query}` : ""}`, {
     method: "GET",
     headers: {
       Authorization: `Token ${token}`,
@@ -33,12 +47,51 @@ export async function getProject(token: string, id: number): Promise<Project> {
   const data = await response.json();
 
   if (!response.ok) {
-    throw new Error(data.error || "Failed to fetch project");
+    throw new Error(data.error || "Failed to fetch project tree");
   }
 
   return data;
 }
 
+// Live task/sprint/milestone changes over Server-Sent Events. Read with fetch
+// rather than EventSource so the token goes in the Authorization header.
+// Returns a function that closes the stream.
+export function subscribeToBoardEvents(
+  token: string,
+  onEvent: (event: BoardEvent) => void,
+  options: { project?: number; onError?: (error: unknown) => void } = {}
+): () => void {
+  const controller = new AbortController();
+  const query = options.project !== undefined ? `?project=${options.project}` : "";
+
+  (async () => {
+    const response = await fetch(`${API_BASE}/events/${query}`, {
+      headers: { Authorization: `Token ${token}`, Accept: "text/event-stream" },
+      signal: controller.signal,
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Failed to open event stream (${response.status})`);
+    }
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+      const frames = buffer.split("\n\n");
+      buffer = frames.pop() || "";
+      for (const frame of frames) {
+        const data = frame.split("\n").find((line) => line.startsWith("data: "));
+        if (data) onEvent(JSON.parse(data.slice(6)));
+      }
+    }
+  })().catch((error) => {
+    if (!controller.signal.aborted) options.onError?.(error);
+  });
+
+  return () => controller.abort();
+}
+
 export async function createProject(token: string, projectData: {
   name: string;
   client: number;
@@ -124,22 +177,7 @@ export async function getMilestones(token: string, projectId?: number, tenant?:
   if (tenant) params.append('tenant', tenant.toString());
   if (params.toString()) url += `?${params.toString()}`;
 
-  const response = await fetch(url, {
-    method: "GET",
-    headers: {
-      Authorization: `Token ${token}`,
-      "Content-Type": "application/json",
-    },
-  });
-
-  const data = await response.json();
-
-  if (!response.ok) {
-    throw new Error(data.error || "Failed to fetch milestones");
-  }
-
-  // Handle paginated response
-  return data.results || data;
+  return fetchAllPages<Milestone>(url, token, "Failed to fetch milestones");
 }
 
 export async function getMilestone(token: string, id: number): Promise<Milestone> {
@@ -236,22 +274,7 @@ export async function deleteMilestone(token: string, id: number): Promise<void>
 // Sprint API functions
 export async function getSprints(token: string, projectId?: number): Promise<Sprint[]> {
   const url = projectId ? `${API_BASE}/sprints/?milestone__project=${projectId}` : `${API_BASE}/sprints/`;
-  const response = await fetch(url, {
-    method: "GET",
-    headers: {
-      Authorization: `Token ${token}`,
-      "Content-Type": "application/json",
-    },
-  });
-
-  const data = await response.json();
-
-  if (!response.ok) {
-    throw new Error(data.error || "Failed to fetch sprints");
-  }
-
-  // Handle paginated response
-  return data.results || data;
+  return fetchAllPages<Sprint>(url, token, "Failed to fetch sprints");
 }
 
 export async function getSprint(token: string, id: number): Promise<Sprint> {
@@ -417,22 +440,7 @@ export async function getTasks(token: string, milestoneId?: number, sprintId?: n
     url += `?${params.toString()}`;
   }
 
-  const response = await fetch(url, {
-    method: "GET",
-    headers: {
-      Authorization: `Token ${token}`,
-      "Content-Type": "application/json",
-    },
-  });
-
-  const data = await response.json();
-
-  if (!response.ok) {
-    throw new Error(data.error || "Failed to fetch tasks");
-  }
-
-  // Handle paginated response
-  return data.results || data;
+  return fetchAllPages<Task>(url, token, "Failed to fetch tasks");
 }
 
 export async function getTask(token: string, id: number): Promise<Task> {
@@ -17,6 +17,13 @@ export interface SignupResponse {
   message: string;
 }
 
+// A page of a list endpoint (see fetchAllPages)
+export interface Paginated<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
 export interface Client {
   id: number;
   name: string;
@@ -135,3 +142,58 @@ export interface Task {
   created_at: string;
   updated_at: string;
 }
+
+export interface TaskNode {
+  id: number;
+  title: string;
+  description?: string;
+  status: string;
+  assignee?: number;
+  start_date?: string;
+  end_date?: string;
+  estimated_hours?: number;
+}
+
+export interface SprintNode {
+  id: number;
+  name: string;
+  status: string;
+  start_date?: string;
+  end_date?: string;
+  progress: number;
+  tasks?: TaskNode[];
+}
+
+export interface MilestoneNode {
+  id: number;
+  name: string;
+  description?: string;
+  status: string;
+  planned_start?: string;
+  actual_start?: string;
+  due_date?: string;
+  assignee?: number;
+  progress: number;
+  sprints?: SprintNode[];
+  backlog?: TaskNode[];
+}
+
+export interface ProjectTree {
+  id: number;
+  name: string;
+  description?: string;
+  status: string;
+  priority: string;
+  start_date: string;
+  end_date: string;
+  progress: number;
+  milestones?: MilestoneNode[];
+}
+
+export interface BoardEvent {
+  seq: number | null;
+  model: "task" | "sprint" | "milestone";
+  id: number;
+  action: "created" | "updated" | "deleted";
+  project: number | null;
+}
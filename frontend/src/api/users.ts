@@ -1,30 +1,12 @@
 import { User, UserTenant } from './types';
 import { API_BASE } from './index';
+import { fetchAllPages } from './pagination';
 
 export async function getUsers(token: string): Promise<User[]> {
   const url = `${API_BASE}/members/`;
-  const response = await fetch(url, {
-    method: "GET",
-    headers: {
-      Authorization: `Token ${token}`,
-      "Content-Type": "application/json",
-    },
-  });
-
-  let data: unknown;
-  try {
-    data = await response.json();
-  } catch {
-    throw new Error(`Members endpoint not available at ${url}: ${response.status} ${response.statusText}`);
-  }
-
-  if (!response.ok) {
-    const errorData = data as {error?: string};
-    throw new Error(errorData.error || `Failed to fetch members from ${url}: ${response.status} ${response.statusText}`);
-  }
-
+  const members = await fetchAllPages<UserTenant>(url, token, `Failed to fetch members from ${url}`);
   // Transform UserTenant[] to User[]
-  return (data as UserTenant[]).map((ut: UserTenant) => ({
+  return members.map((ut: UserTenant) => ({
     id: ut.user,
     email: ut.user_email,
     first_name: ut.user_first_name,
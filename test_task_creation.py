@@ -39,7 +39,7 @@ def test_task_creation():
         print(f"❌ Failed to get sprints: {sprints_response.status_code}")
         return False
 
-    sprints = sprints_response.json()
+    sprints = sprints_response.json()['results']
     if not sprints:
         print("❌ No sprints found")
         return False